@@ -0,0 +1,184 @@
+from collections import OrderedDict
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+class ResponseCache:
+
+    """
+    Caches the text generated for deterministic prompts, so identical requests don't cost a new remote generation.
+    Entries are kept in an in-memory LRU and, optionally, in a persistent SQLite tier which survives restarts.
+    Both tiers expire entries after a time to live.
+
+    Parameters:
+
+        max_entries (int) : the maximum number of entries kept in memory; the least recently used one is evicted
+        ttl (float) : time to live of an entry, in seconds; None keeps entries forever
+        path (str) : path to the persistent tier; None keeps the cache in memory only
+        max_disk_entries (int) : the maximum number of entries kept in the persistent tier
+        hits (int) : number of lookups answered by the cache
+        misses (int) : number of lookups which required a remote generation
+
+    Public methods:
+
+        make_key(model_url, prompt, parameters) -> str : builds the cache key of a request
+        get(key) -> str | None : returns the cached text, if any
+        put(key, value) -> None : stores a generated text
+        stats() -> dict : returns the hit/miss counters
+        clear() -> None : removes every entry from both tiers
+    """
+
+    def __init__(self, max_entries : int = 256, ttl : float | None = 86400, path : str | None = None,
+                 max_disk_entries : int = 5000):
+
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self.max_disk_entries = max_disk_entries
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict() # key -> (value, creation time)
+        self._lock = threading.Lock()
+        self._db = None
+
+        if path is not None:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT, created REAL)")
+            self._db.commit()
+
+    @staticmethod
+    def make_key(model_url : str, prompt : str, parameters : dict | None = None) -> str:
+
+        """
+        Builds the cache key of a request, hashing everything that affects the generated text.
+
+        Parameters:
+
+        model_url : API endpoint to the Hugging Face model
+        prompt : the full prompt sent to the model
+        parameters : the generation parameters
+
+        Returned value:
+        The hexadecimal SHA-256 digest identifying the request
+        """
+
+        content = json.dumps([model_url, prompt, parameters or {}], sort_keys=True)
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def get(self, key : str) -> str | None:
+
+        """
+        Returns the cached text of a request, looking first in memory and then in the persistent tier.
+
+        Parameters:
+
+        key : the key built by make_key()
+
+        Returned value:
+        The cached text, or None if it's missing or expired
+        """
+
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not self._expired(entry[1], now):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                del self._entries[key]
+
+            if self._db is not None:
+                row = self._db.execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+                if row is not None and not self._expired(row[1], now):
+                    self._remember(key, row[0], row[1])
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return row[0]
+
+            self.misses += 1
+            return None
+
+    def put(self, key : str, value : str) -> None:
+
+        """
+        Stores a generated text in both tiers.
+
+        Parameters:
+
+        key : the key built by make_key()
+        value : the generated text
+
+        Returned value:
+        None
+        """
+
+        now = time.time()
+
+        with self._lock:
+            self._remember(key, value, now)
+
+            if self._db is not None:
+                self._db.execute("INSERT OR REPLACE INTO responses VALUES (?, ?, ?)", (key, value, now))
+                self._db.execute("DELETE FROM responses WHERE key NOT IN "
+                                 "(SELECT key FROM responses ORDER BY created DESC LIMIT ?)", (self.max_disk_entries,))
+                self._db.commit()
+
+    def stats(self) -> dict:
+
+        """
+        Returns the cache counters.
+
+        Parameters:
+            None
+
+        Returned value:
+            A dictionary with the number of hits (and how many came from disk), misses, the hit rate and the
+            number of entries in memory
+        """
+
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+        }
+
+    def clear(self) -> None:
+
+        """
+        Removes every entry from both tiers.
+
+        Parameters:
+            None
+
+        Returned value:
+            None
+        """
+
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def _expired(self, created : float, now : float) -> bool:
+        return self.ttl is not None and now - created > self.ttl
+
+    def _remember(self, key : str, value : str, created : float) -> None:
+
+        self._entries[key] = (value, created)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
@@ -1,72 +1,30 @@
 from chat.config import Config
+from chat.client import inference_client, CancelToken, InferenceError, RequestCancelled
+from chat.history import ConversationBuffer
+from chat.retry import inference_retry
+from typing import Iterator
 import requests
-import time
 
-def _load_model(headers):
+def test_chat():
 
-    initial_payload = {
-        "inputs": "Welcome"
-    }
+    # the REPL of the headless engine, which warms the model up and keeps the history; imported here, as the
+    # engine imports this module
+    from utils.engine import ZeroEngine, run_repl
 
-    try:
-        response = requests.post(Config.API_URL_INSTRUCT, headers=headers, json=initial_payload, verify=False)
-        if response.status_code != 200 and "is currently loading" in response.text:
-            print(f"Loading conversational model. It's going to take about {response.json()['estimated_time']} seconds")
-            time.sleep(int(response.json()["estimated_time"]))
-            return ""
-        elif response.status_code == 200:
-            return ""
-        else:
-            raise Exception(response.text)
-    except Exception as e:
-        print(f"Error loading the model: {e}")
-        return "goodbye"
+    engine = ZeroEngine()
+    engine.start()
+    run_repl(engine)
+    engine.stop()
 
-def test_chat():
+def _build_prompt(user_input : str, chat_history : str | ConversationBuffer, chat_context : str) -> str:
+
+    if isinstance(chat_history, ConversationBuffer):
+        return chat_history.build_prompt(user_input, chat_context)
+
+    return chat_context + chat_history + f"<|im_start|>user\n{user_input}<|im_end|>\n<|im_start|>assistant\n"
 
-    # header configuration
-    headers = {"Authorization": f"Bearer {Config.HUGGINGFACE_INFERENCE_TOKEN}"}
-    chat_history = ""
-    user_message = "User: "
-    zero_message = "Zero: "
-
-    user_input = _load_model(headers)
-    bot_output = None
-
-    while user_input.lower() not in ["goodbye", "bye"]:
-
-        user_input = input("User: ")
-
-        # conversation payload
-        if len(chat_history) == 0:
-            chat_payload = {
-                "inputs": Config.ZERO_CONTEXT + f"<|im_start|>user\n{user_input}<|im_end|>\n<|im_start|>assistant\n"
-            }
-        else:
-            chat_payload = {
-                "inputs": Config.ZERO_CONTEXT + chat_history + f"<|im_start|>user\n{user_input}<|im_end|>\n<|im_start|>assistant\n"
-            }
-
-        # getting model's generated response
-        response = requests.post(Config.API_URL_INSTRUCT, headers=headers, json=chat_payload, verify=False)
-        if response.status_code == 200:
-            bot_output = response.json()[0]['generated_text'].split("<|im_start|>assistant")[-1]
-            chat_history += f"<|im_start|>user\n{user_input}<|im_end|>\n"
-            chat_history += f"<|im_start|>assistant\n{bot_output}<|im_end|>\n"
-        elif "is currently loading" in response.text:
-            print(f"Something happened and forced the model to reload. It's going to take about {response.json()['estimated_time']} seconds")
-            print(f"Returned error: {response.json()['error']}")
-            time.sleep(int(response.json()["estimated_time"]))
-        else:
-            print(f"Error {response.status_code}: {response.text}")
-            print("\nAn error has occurred with the model. Test chat will be finished.")
-            return None
-        
-        print("Returned bot reponse:")
-        print(bot_output)
-
-def chat(user_input : str, model_url : str = Config.API_URL_INSTRUCT, chat_history : str = "",
-         chat_context : str = Config.ZERO_CONTEXT) -> str:
+def chat(user_input : str, model_url : str = Config.API_URL_INSTRUCT, chat_history : str | ConversationBuffer = "",
+         chat_context : str = Config.ZERO_CONTEXT, use_cache : bool = False, cancel_token : CancelToken | None = None) -> str:
 
     """
     Receives the user input, and calls a Hugging Face model through Inference API.
@@ -75,45 +33,82 @@ def chat(user_input : str, model_url : str = Config.API_URL_INSTRUCT, chat_histo
 
     user_input : the text inserted by the user
     model_url : API endpoint to the Hugging Face model. Default selected model is Qwen/Qwen2.5-Coder-32B-Instruct
-    chat_history : the chat history with previous dialogues
+    chat_history : the chat history with previous dialogues. When a ConversationBuffer is given, the new
+                   exchange is added to it
     chat_context : the context passed to the chat before starting the interaction
+    use_cache : whether the response cache may answer this request. Free-form chat bypasses it by default
+    cancel_token : token which aborts the request when the turn is superseded
 
     Returned value:
-    The sentence generated by the model
+    The sentence generated by the model. Raises chat.client.RequestCancelled if the request was cancelled.
+    """
+
+    # conversation payload; only the answer comes back, so the prompt isn't echoed
+    chat_payload = {
+        "inputs": _build_prompt(user_input, chat_history, chat_context),
+        "parameters": Config.GENERATION_PROFILES["chat"]
+    }
+
+    # getting model's generated response; a reloading model or a flapping endpoint is retried with backoff,
+    # within the turn deadline
+    try:
+        answer = inference_retry.call(
+            lambda: inference_client.generate(chat_payload, model_url, use_cache=use_cache, cancel_token=cancel_token),
+            cancel_token)
+    except InferenceError as ie:
+        return f"Something's wrong with my AI. I'm getting the following error:\n{ie}"
+    except requests.RequestException as error:
+        return f"I couldn't reach my AI. I'm getting the following error:\n{error}"
+
+    if isinstance(chat_history, ConversationBuffer):
+        chat_history.add_exchange(user_input, answer)
+
+    return answer
+
+
+def chat_stream(user_input : str, model_url : str = Config.API_URL_INSTRUCT, chat_history : str | ConversationBuffer = "",
+                chat_context : str = Config.ZERO_CONTEXT, cancel_token : CancelToken | None = None) -> Iterator[str]:
+
     """
+    Streaming version of chat(). Receives the user input and calls a Hugging Face model through the
+    Inference API's server-sent events stream, yielding the answer token by token.
 
-    headers = {"Authorization": f"Bearer {Config.HUGGINGFACE_INFERENCE_TOKEN}"}
-    retry = True # in case model suddenly needs to be reloaded
-
-    # conversation payload
-    if len(chat_history) == 0:
-        chat_payload = {
-            "inputs": chat_context+ f"<|im_start|>user\n{user_input}<|im_end|>\n<|im_start|>assistant\n"
-        }
-    else:
-        chat_payload = {
-            "inputs": chat_context + chat_history + f"<|im_start|>user\n{user_input}<|im_end|>\n<|im_start|>assistant\n"
-        }
-
-    # getting model's generated response
-    while retry:
-        response = requests.post(model_url, headers=headers, json=chat_payload, verify=False)
-        if response.status_code == 200:
-            retry = False
-            answer = response.json()[0]['generated_text'].split("<|im_start|>assistant")[-1]
-            chat_history += f"<|im_start|>user\n{user_input}<|im_end|>\n"
-            chat_history += f"<|im_start|>assistant\n{answer}<|im_end|>\n"
-        elif "is currently loading" in response.text:
-            print(f"Something happened and forced the model to reload. It's going to take about {response.json()['estimated_time']} seconds")
-            print(f"Returned error: {response.json()['error']}")
-            time.sleep(int(response.json()["estimated_time"]))
-        else:
-            retry = False
-            return f"Something's wrong with my AI. I'm getting the following error:\nError {response.status_code}: {response.text}"
-        
-        return answer
+    Parameters:
 
+    user_input : the text inserted by the user
+    model_url : API endpoint to the Hugging Face model. Default selected model is Qwen/Qwen2.5-Coder-32B-Instruct
+    chat_history : the chat history with previous dialogues. When a ConversationBuffer is given, the new
+                   exchange is added to it once the stream is complete
+    chat_context : the context passed to the chat before starting the interaction
+    cancel_token : token which aborts the stream when the turn is superseded
 
+    Returned value:
+    A generator of the tokens generated by the model. On failure, the error message is yielded instead.
+    Raises chat.client.RequestCancelled if the stream was cancelled.
+    """
 
+    chat_payload = {
+        "inputs": _build_prompt(user_input, chat_history, chat_context),
+        "parameters": Config.GENERATION_PROFILES["chat"]
+    }
 
+    def open_stream():
+        # the first token is awaited inside the retry, so a refused stream is retried before anything is shown
+        stream = inference_client.stream(chat_payload, model_url, cancel_token=cancel_token)
+        return stream, next(stream, None)
 
+    try:
+        stream, first_token = inference_retry.call(open_stream, cancel_token)
+        tokens = []
+        if first_token is not None:
+            tokens.append(first_token)
+            yield first_token
+        for token in stream:
+            tokens.append(token)
+            yield token
+        if isinstance(chat_history, ConversationBuffer):
+            chat_history.add_exchange(user_input, "".join(tokens))
+    except RequestCancelled:
+        raise
+    except Exception as e:
+        yield f"Something's wrong with my AI. I'm getting the following error:\n{e}"
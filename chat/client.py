@@ -0,0 +1,478 @@
+from chat.config import Config
+from chat.cache import ResponseCache
+from collections import deque
+from dataclasses import dataclass
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+import json
+import logging
+import requests
+import socket
+import threading
+import time
+import warnings
+from typing import Callable, Iterable, Iterator
+
+warnings.filterwarnings("ignore")
+
+# connect durations and cancel tokens are kept per thread, since the pool is shared by every call site
+_request_state = threading.local()
+
+
+class _TimedConnectionMixin:
+
+    """
+    Records how long the TCP+TLS handshake took and lets the cancel token of the current request abort it.
+    """
+
+    def connect(self):
+        start = time.perf_counter()
+        super().connect()
+        _request_state.connect_duration = time.perf_counter() - start
+
+    def request(self, *args, **kwargs):
+        cancel_token = getattr(_request_state, "cancel_token", None)
+        if cancel_token is not None:
+            _request_state.abort_callback = cancel_token.add_callback(self._abort)
+        return super().request(*args, **kwargs)
+
+    def _abort(self):
+        # shutting the socket down wakes up the thread blocked on it, which then raises a connection error
+        try:
+            if self.sock is not None:
+                self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+
+class _TimedHTTPConnection(_TimedConnectionMixin, HTTPConnection):
+    pass
+
+
+class _TimedHTTPSConnection(_TimedConnectionMixin, HTTPSConnection):
+    pass
+
+
+class _TimedHTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _TimedHTTPConnection
+
+
+class _TimedHTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _TimedHTTPSConnection
+
+
+class _TimedAdapter(HTTPAdapter):
+
+    """
+    HTTPAdapter whose pooled connections record how long the TCP+TLS handshake took and can be aborted.
+    """
+
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TimedHTTPConnectionPool,
+            "https": _TimedHTTPSConnectionPool,
+        }
+
+
+@dataclass
+class RequestTimings:
+
+    """
+    Timings of a single inference request, in seconds.
+
+    Parameters:
+
+        url (str) : the requested endpoint
+        status_code (int) : the HTTP status returned by the endpoint
+        connect (float) : time spent opening the connection; 0 when a pooled connection was reused
+        ttfb (float) : time until the response headers arrived (includes connect)
+        total (float) : time until the whole response body was read
+        first_token (float) : time until the first streamed token arrived; None for non-streamed requests
+    """
+
+    url: str
+    status_code: int
+    connect: float
+    ttfb: float
+    total: float
+    first_token: float | None = None
+
+    @property
+    def reused(self) -> bool:
+        return self.connect == 0
+
+
+class CancelToken:
+
+    """
+    Cancels the requests of a turn which has been superseded. Cancelling it aborts the request in flight, if any,
+    and makes further requests sent with it raise RequestCancelled.
+
+    Parameters:
+
+        cancelled (bool) : whether the token has been cancelled
+
+    Public methods:
+
+        cancel() -> None : cancels the token, aborting the request in flight
+        raise_if_cancelled() -> None : raises RequestCancelled if the token has been cancelled
+        wait(timeout) -> bool : sleeps until the timeout expires or the token is cancelled
+        add_callback(callback) -> Callable : registers a function called on cancellation
+        remove_callback(callback) -> None : unregisters a function
+    """
+
+    def __init__(self):
+
+        self._cancelled = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self) -> None:
+
+        with self._lock:
+            self._cancelled.set()
+            callbacks, self._callbacks = self._callbacks, []
+
+        for callback in callbacks:
+            callback()
+
+    def raise_if_cancelled(self) -> None:
+
+        if self.cancelled:
+            raise RequestCancelled("The request was cancelled.")
+
+    def wait(self, timeout : float) -> bool:
+
+        # a cancellable sleep: returns True as soon as the token is cancelled
+        return self._cancelled.wait(timeout)
+
+    def add_callback(self, callback : Callable[[], None]) -> Callable[[], None]:
+
+        with self._lock:
+            if not self._cancelled.is_set():
+                self._callbacks.append(callback)
+                return callback
+
+        callback() # already cancelled
+        return callback
+
+    def remove_callback(self, callback : Callable[[], None] | None) -> None:
+
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+
+class RequestCancelled(Exception):
+
+    """
+    Raised when a request is cancelled through its CancelToken.
+    """
+
+
+class InferenceError(Exception):
+
+    """
+    Raised when the endpoint answers a request with an error.
+    """
+
+    def __init__(self, status_code : int, message : str):
+        super().__init__(f"Error {status_code}: {message}")
+        self.status_code = status_code
+        self.message = message
+
+
+class StreamError(InferenceError):
+
+    """
+    Raised when the endpoint refuses a streamed request or reports an error in the middle of the stream.
+    """
+
+
+def iter_sse_events(lines : Iterable[str]) -> Iterator[dict]:
+
+    """
+    Parses server-sent events lines into JSON objects, following the text-generation-inference format
+    (one "data:{...}" line per token, events separated by blank lines).
+
+    Parameters:
+
+    lines : the decoded lines of the response body
+
+    Returned value:
+    A generator of the decoded JSON events
+    """
+
+    data = []
+    for line in lines:
+        if line is None:
+            continue
+        if line == "":
+            if data:
+                yield json.loads("\n".join(data))
+                data = []
+        elif line.startswith("data:"):
+            data.append(line[5:].strip())
+        # other fields (event:, id:, retry:) and comments (":") carry nothing we use
+
+    if data:
+        yield json.loads("\n".join(data))
+
+
+class InferenceClient:
+
+    """
+    Shared client for the Hugging Face Inference API. It keeps a single keep-alive session with a
+    connection pool and the authorisation headers, so consecutive calls reuse the same TCP+TLS connection.
+
+    Parameters:
+
+        session (requests.Session) : the persistent session used by every request
+        cache (chat.cache.ResponseCache) : cache of generated texts used by generate(); None disables caching
+        timeout (tuple) : default (connect, read) timeout, in seconds
+        timings (collections.deque) : timings of the most recent requests
+        last_request_at (float) : time.monotonic() of the last request sent; None if no request was sent yet
+
+    Public methods:
+
+        post(payload, model_url, timeout) -> requests.Response : sends a payload to the model endpoint
+        generate(payload, model_url, timeout, use_cache) -> str : returns the text generated for a payload, using the cache
+        stream(payload, model_url, timeout) -> Iterator[str] : sends a payload and yields the generated tokens as they arrive
+        close() -> None : closes every pooled connection
+    """
+
+    def __init__(self, token : str = Config.HUGGINGFACE_INFERENCE_TOKEN, pool_maxsize : int = Config.POOL_MAXSIZE,
+                 timeout : tuple = (Config.CONNECT_TIMEOUT, Config.READ_TIMEOUT), history_size : int = 100,
+                 cache : ResponseCache | None = None):
+
+        self.timeout = timeout
+        self.cache = cache
+        self.timings = deque(maxlen=history_size)
+        self.last_request_at = None
+
+        self.session = requests.Session()
+        self.session.headers.update({"Authorization": f"Bearer {token}"})
+        self.session.verify = False
+
+        adapter = _TimedAdapter(pool_connections=2, pool_maxsize=pool_maxsize)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    @property
+    def last_timings(self) -> RequestTimings | None:
+        return self.timings[-1] if self.timings else None
+
+    def post(self, payload : dict, model_url : str = Config.API_URL_INSTRUCT, timeout = None,
+             cancel_token : CancelToken | None = None) -> requests.Response:
+
+        """
+        Sends a payload to the model endpoint through the pooled session, recording its timings.
+
+        Parameters:
+
+        payload : the JSON payload to be sent
+        model_url : API endpoint to the Hugging Face model
+        timeout : (connect, read) timeout for this call; the client default is used when not given
+        cancel_token : token which aborts the request when cancelled
+
+        Returned value:
+        The response returned by the endpoint, with its body already read.
+        Raises RequestCancelled if the request was cancelled through its token.
+        """
+
+        start = self._begin_request(cancel_token)
+
+        try:
+            # stream=True returns as soon as the headers arrive, which gives the time to first byte
+            response = self.session.post(model_url, json=payload, timeout=timeout or self.timeout, stream=True)
+            ttfb = time.perf_counter() - start
+            response.content # reads the body and releases the connection back to the pool
+            total = time.perf_counter() - start
+        except requests.RequestException as error:
+            if cancel_token is not None and cancel_token.cancelled:
+                raise RequestCancelled("The request was cancelled.") from error
+            raise
+        finally:
+            self._end_request(cancel_token)
+
+        timings = RequestTimings(model_url, response.status_code, _request_state.connect_duration, ttfb, total)
+        self.timings.append(timings)
+        logging.info(f"Inference request {response.status_code}: connect={timings.connect * 1000:.1f}ms "
+                     f"ttfb={timings.ttfb * 1000:.1f}ms total={timings.total * 1000:.1f}ms")
+
+        return response
+
+    def generate(self, payload : dict, model_url : str = Config.API_URL_INSTRUCT, timeout = None,
+                 use_cache : bool = True, cancel_token : CancelToken | None = None) -> str:
+
+        """
+        Returns the text generated by the model for a payload. Identical requests (same endpoint, prompt and
+        generation parameters) are answered by the response cache instead of the remote model.
+
+        Parameters:
+
+        payload : the JSON payload to be sent
+        model_url : API endpoint to the Hugging Face model
+        timeout : (connect, read) timeout for this call; the client default is used when not given
+        use_cache : whether the cache may answer and store this request
+        cancel_token : token which aborts the request when cancelled
+
+        Returned value:
+        The generated text. Raises InferenceError if the endpoint answers with an error or a malformed body.
+        """
+
+        key = None
+        if use_cache and self.cache is not None:
+            key = self.cache.make_key(model_url, payload["inputs"], payload.get("parameters"))
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+        response = self.post(payload, model_url, timeout, cancel_token)
+        if response.status_code != 200:
+            raise InferenceError(response.status_code, response.text)
+
+        try:
+            generated_text = response.json()[0]["generated_text"]
+        except (ValueError, KeyError, IndexError, TypeError):
+            raise InferenceError(response.status_code, f"Unexpected response format: {response.text[:200]}")
+        # the endpoint keeps the stop sequence which ended the generation
+        for stop in (payload.get("parameters") or {}).get("stop", []):
+            if generated_text.endswith(stop):
+                generated_text = generated_text[:-len(stop)]
+                break
+
+        if key is not None:
+            self.cache.put(key, generated_text)
+
+        return generated_text
+
+    def stream(self, payload : dict, model_url : str = Config.API_URL_INSTRUCT, timeout = None,
+               cancel_token : CancelToken | None = None) -> Iterator[str]:
+
+        """
+        Sends a payload to the model endpoint asking for a server-sent events stream, and yields each
+        generated token as soon as it arrives.
+
+        Parameters:
+
+        payload : the JSON payload to be sent; "stream" is set automatically
+        model_url : API endpoint to the Hugging Face model
+        timeout : (connect, read) timeout for this call; the client default is used when not given
+        cancel_token : token which aborts the stream when cancelled
+
+        Returned value:
+        A generator of token texts. Special tokens (e.g. <|im_end|>) are skipped.
+        Raises StreamError if the endpoint refuses the request or reports an error mid-stream, and
+        RequestCancelled if the stream was cancelled through its token.
+        """
+
+        start = self._begin_request(cancel_token)
+        first_token = None
+        response = None
+
+        try:
+            response = self.session.post(model_url, json={**payload, "stream": True}, timeout=timeout or self.timeout, stream=True)
+            ttfb = time.perf_counter() - start
+
+            if response.status_code != 200:
+                raise StreamError(response.status_code, response.text)
+
+            # chunk_size=None yields each chunk of the (chunked) stream as soon as it arrives, instead of
+            # waiting for a fixed amount of bytes
+            for event in iter_sse_events(response.iter_lines(chunk_size=None, decode_unicode=True)):
+                if "error" in event:
+                    raise StreamError(response.status_code, event["error"])
+
+                token = event.get("token", {})
+                if token.get("special") or not token.get("text"):
+                    continue
+
+                if first_token is None:
+                    first_token = time.perf_counter() - start
+                yield token["text"]
+
+            # an aborted stream may just look like the end of the body
+            if cancel_token is not None:
+                cancel_token.raise_if_cancelled()
+        except requests.RequestException as error:
+            if cancel_token is not None and cancel_token.cancelled:
+                raise RequestCancelled("The request was cancelled.") from error
+            raise
+        finally:
+            self._end_request(cancel_token)
+            if response is not None:
+                response.close()
+                timings = RequestTimings(model_url, response.status_code, _request_state.connect_duration, ttfb,
+                                         time.perf_counter() - start, first_token)
+                self.timings.append(timings)
+                logging.info(f"Inference stream {response.status_code}: connect={timings.connect * 1000:.1f}ms "
+                             f"ttfb={timings.ttfb * 1000:.1f}ms first_token={(first_token or 0) * 1000:.1f}ms "
+                             f"total={timings.total * 1000:.1f}ms")
+
+    def summary(self) -> dict:
+
+        """
+        Summarises the recorded timings, showing how often the handshake was saved by the pool.
+
+        Parameters:
+            None
+
+        Returned value:
+            A dictionary with the number of requests, the connection reuse ratio and the mean timings in milliseconds
+        """
+
+        count = len(self.timings)
+        if count == 0:
+            return {"requests": 0}
+
+        return {
+            "requests": count,
+            "reused_ratio": sum(t.reused for t in self.timings) / count,
+            "mean_connect_ms": 1000 * sum(t.connect for t in self.timings) / count,
+            "mean_ttfb_ms": 1000 * sum(t.ttfb for t in self.timings) / count,
+            "mean_total_ms": 1000 * sum(t.total for t in self.timings) / count,
+        }
+
+    def _begin_request(self, cancel_token : CancelToken | None) -> float:
+
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+
+        self.last_request_at = time.monotonic()
+        _request_state.connect_duration = 0.0
+        _request_state.cancel_token = cancel_token
+        _request_state.abort_callback = None
+        return time.perf_counter()
+
+    def _end_request(self, cancel_token : CancelToken | None) -> None:
+
+        if cancel_token is not None:
+            cancel_token.remove_callback(_request_state.abort_callback)
+        _request_state.cancel_token = None
+        _request_state.abort_callback = None
+
+    def close(self) -> None:
+
+        """
+        Closes every pooled connection.
+
+        Parameters:
+            None
+
+        Returned value:
+            None
+        """
+
+        self.session.close()
+
+
+# client shared by every call site
+inference_client = InferenceClient(cache=ResponseCache(Config.RESPONSE_CACHE_SIZE, Config.RESPONSE_CACHE_TTL,
+                                                       Config.RESPONSE_CACHE_PATH))
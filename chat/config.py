@@ -1,12 +1,39 @@
 import os
-from data.settings import load_secure_json
+from data.settings import load_settings
 from dotenv import load_dotenv
 
 load_dotenv()
-settings = load_secure_json("data/settings.data")["ai_settings"]
+# read when the module is imported, as Config's values are the default arguments of the chat functions; the file is
+# small and decrypted once for every module, without any network access
+settings = load_settings("ai_settings")
+
+# generation parameters per call site. Only the answer is returned (not the echoed prompt), and generation stops at
+# the end of the assistant turn; each profile can be overridden through "generation_profiles" in the settings
+GENERATION_PROFILES = {
+    "classify": {"max_new_tokens": 96, "return_full_text": False, "stop": ["<|im_end|>"], "do_sample": False},
+    "chat": {"max_new_tokens": 384, "return_full_text": False, "stop": ["<|im_end|>"], "temperature": 0.7},
+}
 
 class Config:
     #ai_settings = load_secure_json("data/ai_settings.json")
     HUGGINGFACE_INFERENCE_TOKEN = os.getenv("HUGGINGFACE_INFERENCE_TOKEN")
     API_URL_INSTRUCT = settings["api_url"]
-    ZERO_CONTEXT = settings["context"]
\ No newline at end of file
+    ZERO_CONTEXT = settings["context"]
+    CONNECT_TIMEOUT = settings.get("connect_timeout", 3.05)
+    READ_TIMEOUT = settings.get("read_timeout", 60)
+    POOL_MAXSIZE = settings.get("pool_maxsize", 4)
+    HISTORY_TOKEN_BUDGET = settings.get("history_token_budget", 1500)
+    RESPONSE_CACHE_SIZE = settings.get("response_cache_size", 256)
+    RESPONSE_CACHE_TTL = settings.get("response_cache_ttl", 86400) # seconds; None keeps entries forever
+    RESPONSE_CACHE_PATH = settings.get("response_cache_path", "data/response_cache.db") # None disables the persistent tier
+    WARMUP_MAX_WAIT = settings.get("warmup_max_wait", 600) # seconds to wait for the model before giving up
+    KEEP_WARM_INTERVAL = settings.get("keep_warm_interval", 240) # idle seconds before a keep-warm request is sent
+    WARMUP_RETRY_INTERVAL = settings.get("warmup_retry_interval", 60) # seconds between retries once the model failed to load
+    RETRY_MAX_ATTEMPTS = settings.get("retry_max_attempts", 4)
+    RETRY_BASE_DELAY = settings.get("retry_base_delay", 0.5) # seconds; doubled after every failed attempt
+    RETRY_MAX_DELAY = settings.get("retry_max_delay", 8)
+    RETRY_DEADLINE = settings.get("retry_deadline", 30) # overall seconds a turn may spend retrying
+    BREAKER_FAILURE_THRESHOLD = settings.get("breaker_failure_threshold", 3) # consecutive failures which open the circuit
+    BREAKER_RESET_TIMEOUT = settings.get("breaker_reset_timeout", 30) # seconds before a half-open probe is let through
+    GENERATION_PROFILES = {name: {**profile, **settings.get("generation_profiles", {}).get(name, {})}
+                           for name, profile in GENERATION_PROFILES.items()}
\ No newline at end of file
@@ -0,0 +1,221 @@
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable
+import re
+import threading
+
+
+def estimate_tokens(text : str) -> int:
+
+    """
+    Estimates the number of tokens of a text (about 4 characters per token for English with Qwen's tokenizer).
+
+    Parameters:
+
+    text : the text to be measured
+
+    Returned value:
+    The estimated number of tokens
+    """
+
+    return max(1, (len(text) + 3) // 4)
+
+
+@dataclass
+class Turn:
+
+    """
+    A single message of the conversation.
+
+    Parameters:
+
+        role (str) : either "user" or "assistant"
+        text (str) : the message content
+        rendered (str) : the message serialised in the chat template, computed once when the turn is added
+        tokens (int) : the estimated token count of the rendered message
+    """
+
+    role: str
+    text: str
+    rendered: str
+    tokens: int
+
+
+class ConversationBuffer:
+
+    """
+    Stores the conversation as structured turns and renders it as a prompt whose size never exceeds a token budget.
+    When the budget is exceeded, the oldest turns are evicted and, if summarising is enabled, their first sentence
+    is kept in a short summary of the earlier conversation.
+
+    Each turn is serialised once, when it's added, and the rendered history is kept up to date by appending the new
+    turn and cutting the evicted ones, so a new turn never re-serialises the whole history.
+
+    Parameters:
+
+        token_budget (int) : the maximum number of tokens of the rendered history (summary included)
+        summary_budget (int) : the maximum number of tokens of the summary of evicted turns; 0 disables summarising
+        count_tokens (Callable) : the function used to count the tokens of a text
+        turns (collections.deque) : the turns currently kept in the history
+
+    Public methods:
+
+        add(role, text) -> None : adds a new turn, evicting the oldest ones if the budget is exceeded
+        add_exchange(user_text, assistant_text) -> None : adds a user message and its answer
+        render() -> str : returns the history serialised in the chat template
+        build_prompt(user_input, chat_context) -> str : returns the full prompt for a new user message
+        clear() -> None : removes every turn and the summary
+    """
+
+    def __init__(self, token_budget : int = 1500, summary_budget : int = 150,
+                 count_tokens : Callable[[str], int] = estimate_tokens):
+
+        self.token_budget = token_budget
+        self.summary_budget = summary_budget
+        self.count_tokens = count_tokens
+
+        self.turns = deque()
+        self._turn_tokens = 0
+        self._rendered = ""
+
+        self._summary_items = deque()
+        self._summary_tokens = 0
+        self._rendered_summary = ""
+        self._rendered_summary_tokens = 0
+
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.turns)
+
+    @property
+    def tokens(self) -> int:
+
+        """
+        The estimated token count of the rendered history, summary included.
+        """
+
+        return self._turn_tokens + self._rendered_summary_tokens
+
+    def add(self, role : str, text : str) -> None:
+
+        """
+        Adds a new turn, evicting the oldest ones if the token budget is exceeded.
+
+        Parameters:
+
+        role : either "user" or "assistant"
+        text : the message content
+
+        Returned value:
+        None
+        """
+
+        text = text.strip()
+        rendered = f"<|im_start|>{role}\n{text}<|im_end|>\n"
+        turn = Turn(role, text, rendered, self.count_tokens(rendered))
+
+        with self._lock:
+            self.turns.append(turn)
+            self._turn_tokens += turn.tokens
+            self._rendered += rendered
+            self._evict()
+
+    def add_exchange(self, user_text : str, assistant_text : str) -> None:
+
+        """
+        Adds a user message and the answer given to it.
+
+        Parameters:
+
+        user_text : the user message
+        assistant_text : Zero's answer
+
+        Returned value:
+        None
+        """
+
+        self.add("user", user_text)
+        self.add("assistant", assistant_text)
+
+    def render(self) -> str:
+
+        """
+        Returns the history serialised in the chat template, preceded by the summary of evicted turns, if any.
+
+        Parameters:
+            None
+
+        Returned value:
+            The rendered history
+        """
+
+        with self._lock:
+            return self._rendered_summary + self._rendered
+
+    def build_prompt(self, user_input : str, chat_context : str = "") -> str:
+
+        """
+        Returns the full prompt for a new user message.
+
+        Parameters:
+
+        user_input : the new user message
+        chat_context : the context passed to the chat before the history
+
+        Returned value:
+        The prompt to be sent to the model
+        """
+
+        return chat_context + self.render() + f"<|im_start|>user\n{user_input}<|im_end|>\n<|im_start|>assistant\n"
+
+    def clear(self) -> None:
+
+        """
+        Removes every turn and the summary.
+
+        Parameters:
+            None
+
+        Returned value:
+            None
+        """
+
+        with self._lock:
+            self.turns.clear()
+            self._turn_tokens = 0
+            self._rendered = ""
+            self._summary_items.clear()
+            self._summary_tokens = 0
+            self._rendered_summary = ""
+            self._rendered_summary_tokens = 0
+
+    def _evict(self) -> None:
+
+        # the newest turn is always kept, even if it's larger than the budget by itself
+        while self.tokens > self.token_budget and len(self.turns) > 1:
+            turn = self.turns.popleft()
+            self._turn_tokens -= turn.tokens
+            self._rendered = self._rendered[len(turn.rendered):]
+            self._summarise(turn)
+
+    def _summarise(self, turn : Turn) -> None:
+
+        if self.summary_budget <= 0 or turn.role != "user":
+            return
+
+        # only the first sentence of what the user said is kept
+        sentence = re.split(r"(?<=[.!?])\s", turn.text, maxsplit=1)[0][:120]
+        item = (sentence, self.count_tokens(sentence) + 2)
+        self._summary_items.append(item)
+        self._summary_tokens += item[1]
+
+        while self._summary_tokens > self.summary_budget and self._summary_items:
+            self._summary_tokens -= self._summary_items.popleft()[1]
+
+        if self._summary_items:
+            topics = "; ".join(sentence for sentence, _ in self._summary_items)
+            self._rendered_summary = f"<|im_start|>system\nEarlier, the user said: {topics}<|im_end|>\n"
+        else:
+            self._rendered_summary = ""
+        self._rendered_summary_tokens = self.count_tokens(self._rendered_summary) if self._rendered_summary else 0
@@ -0,0 +1,338 @@
+from chat.config import Config
+from chat.client import CancelToken, InferenceError, RequestCancelled
+from typing import Callable, TypeVar
+import json
+import logging
+import random
+import requests
+import threading
+import time
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(InferenceError):
+
+    """
+    Raised without contacting the endpoint while the circuit breaker is open.
+    """
+
+    def __init__(self, retry_in : float):
+        super().__init__(503, f"The model endpoint is failing; requests are paused for {retry_in:.0f} more seconds.")
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+
+    """
+    Stops sending requests to an endpoint which keeps failing. After `failure_threshold` consecutive failures the
+    circuit opens and every call fails immediately; once `reset_timeout` has passed, a single half-open probe is let
+    through, which either closes the circuit again or reopens it.
+
+    Parameters:
+
+        failure_threshold (int) : consecutive failures which open the circuit
+        reset_timeout (float) : seconds the circuit stays open before a half-open probe is allowed
+        state (str) : one of "closed", "open" or "half_open"
+        opened (int) : number of times the circuit opened
+        rejected (int) : number of calls refused while the circuit was open
+
+    Public methods:
+
+        before_call() -> None : raises CircuitOpenError if the call must not be sent
+        record_success() -> None : closes the circuit
+        record_failure() -> None : counts a failure, opening the circuit when the threshold is reached
+        release() -> None : gives the half-open probe back when its call was cancelled
+        stats() -> dict : returns the breaker state and counters
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold : int = Config.BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout : float = Config.BREAKER_RESET_TIMEOUT):
+
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.state = self.CLOSED
+        self.opened = 0
+        self.rejected = 0
+
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+
+        """
+        Checks whether a call may be sent. While the circuit is open, only the first call after the reset timeout
+        goes through, as the half-open probe.
+
+        Parameters:
+            None
+
+        Returned value:
+            None. Raises CircuitOpenError if the call must not be sent.
+        """
+
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+
+            retry_in = self._opened_at + self.reset_timeout - time.monotonic()
+            if self.state == self.OPEN and retry_in <= 0:
+                self.state = self.HALF_OPEN
+                logging.info("Circuit breaker half-open: probing the endpoint.")
+                return
+
+            self.rejected += 1
+            raise CircuitOpenError(max(retry_in, 0))
+
+    def record_success(self) -> None:
+
+        """
+        Records a successful call, closing the circuit.
+
+        Parameters:
+            None
+
+        Returned value:
+            None
+        """
+
+        with self._lock:
+            if self.state != self.CLOSED:
+                logging.info("Circuit breaker closed.")
+            self.state = self.CLOSED
+            self._failures = 0
+
+    def record_failure(self) -> None:
+
+        """
+        Records a failed call. The circuit opens when the threshold is reached or when the half-open probe fails.
+
+        Parameters:
+            None
+
+        Returned value:
+            None
+        """
+
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    self.opened += 1
+                    logging.warning(f"Circuit breaker opened after {self._failures} consecutive failures.")
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+    def release(self) -> None:
+
+        """
+        Gives the half-open probe back when its call was cancelled before reaching a verdict, so the next call
+        probes the endpoint instead.
+
+        Parameters:
+            None
+
+        Returned value:
+            None
+        """
+
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self.state = self.OPEN
+
+    def stats(self) -> dict:
+
+        """
+        Returns the breaker state and counters.
+
+        Parameters:
+            None
+
+        Returned value:
+            A dictionary with the state, the consecutive failures, and how many times the circuit opened and
+            refused a call
+        """
+
+        return {
+            "state": self.state,
+            "consecutive_failures": self._failures,
+            "opened": self.opened,
+            "rejected": self.rejected,
+        }
+
+
+class RetryPolicy:
+
+    """
+    Retries transient inference failures (model loading, rate limiting, server errors, dropped connections) with
+    capped exponential backoff and jitter, within an overall deadline. Every attempt goes through a shared circuit
+    breaker, so a flapping endpoint makes callers fail fast instead of hanging.
+
+    Parameters:
+
+        max_attempts (int) : maximum number of attempts per call
+        base_delay (float) : delay before the first retry, in seconds; doubled after every failed attempt
+        max_delay (float) : maximum delay between attempts, in seconds
+        jitter (float) : fraction of each delay which is randomised, from 0 (none) to 1 (full jitter)
+        deadline (float) : overall seconds a call may spend, retries included
+        breaker (CircuitBreaker) : the circuit breaker shared by every call; None disables it
+        retries (int) : number of retries performed
+
+    Public methods:
+
+        call(function, cancel_token, deadline) -> Any : calls a function, retrying it on transient failures
+        backoff(attempt) -> float : returns the jittered delay before a retry
+        is_retryable(error) -> bool : tells whether an error is transient
+        stats() -> dict : returns the retry and breaker counters
+    """
+
+    RETRYABLE_STATUS_CODES = (429, 500, 502, 503, 504)
+
+    def __init__(self, max_attempts : int = Config.RETRY_MAX_ATTEMPTS, base_delay : float = Config.RETRY_BASE_DELAY,
+                 max_delay : float = Config.RETRY_MAX_DELAY, jitter : float = 0.5,
+                 deadline : float = Config.RETRY_DEADLINE, breaker : CircuitBreaker | None = None):
+
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.deadline = deadline
+        self.breaker = breaker
+
+        self.retries = 0
+
+    def call(self, function : Callable[[], T], cancel_token : CancelToken | None = None,
+             deadline : float | None = None) -> T:
+
+        """
+        Calls a function, retrying it on transient failures.
+
+        Parameters:
+
+        function : the function sending the request, called without arguments
+        cancel_token : token which aborts the waits between attempts when the turn is superseded
+        deadline : overall seconds the call may spend; the policy default is used when not given
+
+        Returned value:
+        The value returned by the function. The last error is raised when it isn't transient, when the attempts
+        or the deadline run out, and CircuitOpenError while the circuit is open.
+        """
+
+        end = time.monotonic() + (self.deadline if deadline is None else deadline)
+        attempt = 0
+
+        while True:
+            if self.breaker is not None:
+                self.breaker.before_call()
+
+            try:
+                result = function()
+            except RequestCancelled:
+                if self.breaker is not None:
+                    self.breaker.release()
+                raise
+            except Exception as error:
+                if not self.is_retryable(error):
+                    # an error answer from the endpoint says nothing about its health; any other error (e.g. a
+                    # malformed response) gives no verdict, so a half-open probe is given back
+                    if self.breaker is not None:
+                        if isinstance(error, InferenceError):
+                            self.breaker.record_success()
+                        else:
+                            self.breaker.release()
+                    raise
+                if self.breaker is not None:
+                    self.breaker.record_failure()
+
+                attempt += 1
+                delay = self.backoff(attempt, self._estimated_time(error))
+                circuit_open = self.breaker is not None and self.breaker.state == CircuitBreaker.OPEN
+                if attempt >= self.max_attempts or time.monotonic() + delay > end or circuit_open:
+                    logging.warning(f"Giving up after {attempt} attempts: {error}")
+                    raise
+
+                logging.info(f"Attempt {attempt} failed ({error}); retrying in {delay:.2f}s.")
+                self.retries += 1
+                if cancel_token is not None:
+                    if cancel_token.wait(delay):
+                        raise RequestCancelled("The request was cancelled.")
+                else:
+                    time.sleep(delay)
+                continue
+
+            if self.breaker is not None:
+                self.breaker.record_success()
+            return result
+
+    def backoff(self, attempt : int, estimated_time : float | None = None) -> float:
+
+        """
+        Returns the delay before a retry: exponential in the number of failed attempts, capped, and partly
+        randomised so that concurrent callers don't retry in lockstep.
+
+        Parameters:
+
+        attempt : number of failed attempts so far, starting at 1
+        estimated_time : the model's own estimated loading time; the delay never exceeds it
+
+        Returned value:
+        The delay in seconds
+        """
+
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        if estimated_time is not None:
+            delay = min(delay, estimated_time)
+        return delay * (1 - self.jitter * random.random())
+
+    def is_retryable(self, error : Exception) -> bool:
+
+        """
+        Tells whether an error is transient and worth retrying.
+
+        Parameters:
+
+        error : the error raised by the call
+
+        Returned value:
+        True for loading models, rate limiting, server errors, timeouts and dropped connections
+        """
+
+        if isinstance(error, CircuitOpenError):
+            return False
+        if isinstance(error, InferenceError):
+            return error.status_code in self.RETRYABLE_STATUS_CODES or "is currently loading" in error.message
+        return isinstance(error, (requests.ConnectionError, requests.Timeout))
+
+    def stats(self) -> dict:
+
+        """
+        Returns the retry and breaker counters.
+
+        Parameters:
+            None
+
+        Returned value:
+            A dictionary with the number of retries and the breaker stats
+        """
+
+        return {"retries": self.retries, **(self.breaker.stats() if self.breaker is not None else {})}
+
+    @staticmethod
+    def _estimated_time(error : Exception) -> float | None:
+
+        if not isinstance(error, InferenceError) or "is currently loading" not in error.message:
+            return None
+        try:
+            return float(json.loads(error.message)["estimated_time"])
+        except (ValueError, KeyError, TypeError):
+            return None
+
+
+# policy shared by every call to the inference endpoint, so they all see the same circuit
+inference_retry = RetryPolicy(breaker=CircuitBreaker())
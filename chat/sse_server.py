@@ -0,0 +1,127 @@
+"""
+Local stand-in for the Hugging Face text generation endpoint, used to test the chat (and its streaming mode)
+offline. It answers in the same formats as the Inference API:
+
+    - {"inputs": ...} returns [{"generated_text": <prompt + answer>}]; only the answer when the parameters
+      set "return_full_text" to false
+    - {"inputs": ..., "stream": true} returns a server-sent events stream, one "data:{...}" event per token
+
+Usage:
+    python -m chat.sse_server [port]
+
+The answer is cut to the "max_new_tokens" parameter, if given.
+
+Then point `model_url` (or `api_url` in the settings) to http://127.0.0.1:<port>/
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import re
+import sys
+import threading
+import time
+
+DEFAULT_ANSWER = "Hello! I'm a local stand-in for Zero's model. Every word you read is being streamed to you token by token."
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1" # keeps connections alive, like the real endpoint
+
+    def do_POST(self):
+
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        prompt = payload.get("inputs", "")
+        parameters = payload.get("parameters") or {}
+        answer = "".join(_tokenize(self.server.answer)[:parameters.get("max_new_tokens")])
+
+        if payload.get("stream"):
+            self._stream(answer)
+        else:
+            time.sleep(self.server.token_delay * len(_tokenize(answer)))
+            generated_text = answer if parameters.get("return_full_text") is False else prompt + answer
+            body = json.dumps([{"generated_text": generated_text}]).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            try:
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError): # the client cancelled the request
+                self.close_connection = True
+
+    def _stream(self, answer : str) -> None:
+
+        # the stream is sent with chunked transfer encoding, one chunk per event, as the real endpoint does
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        try:
+            tokens = _tokenize(answer)
+            for index, text in enumerate(tokens):
+                time.sleep(self.server.token_delay)
+                event = {"token": {"id": index, "text": text, "logprob": 0.0, "special": False}, "generated_text": None, "details": None}
+                self._write_chunk(f"data:{json.dumps(event)}\n\n".encode())
+
+            event = {"token": {"id": len(tokens), "text": "<|im_end|>", "logprob": 0.0, "special": True},
+                     "generated_text": answer, "details": None}
+            self._write_chunk(f"data:{json.dumps(event)}\n\n".encode())
+            self._write_chunk(b"")
+        except (BrokenPipeError, ConnectionResetError): # the client cancelled the stream
+            self.close_connection = True
+
+    def _write_chunk(self, data : bytes) -> None:
+
+        self.wfile.write(f"{len(data):X}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _tokenize(text : str) -> list[str]:
+
+    """
+    Splits a text into word-like tokens, keeping the leading whitespace as model tokenizers do.
+    """
+
+    return re.findall(r"\s*\S+", text)
+
+
+def start_server(port : int = 0, answer : str = DEFAULT_ANSWER, token_delay : float = 0.05) -> ThreadingHTTPServer:
+
+    """
+    Starts the stand-in server in a daemon thread.
+
+    Parameters:
+
+    port : the port to listen to; 0 picks a free one
+    answer : the answer given to every prompt
+    token_delay : seconds between two streamed tokens, simulating generation time
+
+    Returned value:
+    The running server. Its URL is http://127.0.0.1:<server.server_port>/ and it stops with server.shutdown()
+    """
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), _StandInHandler)
+    server.daemon_threads = True
+    server.answer = answer
+    server.token_delay = token_delay
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8765
+    server = start_server(port)
+    print(f"Stand-in generation endpoint listening on http://127.0.0.1:{server.server_port}/ (Ctrl+C to stop)")
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.shutdown()
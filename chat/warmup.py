@@ -0,0 +1,266 @@
+from chat.config import Config
+from chat.client import inference_client, InferenceClient
+from chat.retry import inference_retry, RetryPolicy
+from typing import Callable
+import logging
+import threading
+import time
+
+
+class ModelWarmer:
+
+    """
+    Warms the inference model up in a background thread, so the GUI can start while the remote model loads.
+    Readiness is polled with the retry policy's backoff (bounded by the model's own estimated loading time), and once the
+    model is ready a cheap keep-warm request is sent whenever the endpoint has been idle for a while, so it doesn't
+    cold-start in the middle of a session. A model which failed to load is retried slowly, and the state goes back to
+    ready as soon as a request succeeds.
+
+    Parameters:
+
+        client (chat.client.InferenceClient) : the client used to reach the model
+        retry_policy (chat.retry.RetryPolicy) : gives the delays between polls; its circuit breaker is closed once the
+                                               model is ready
+        keep_warm_interval (float) : idle seconds before a keep-warm request is sent; 0 disables keep-warm
+        max_wait (float) : seconds to wait for the model to load before giving up
+        retry_interval (float) : seconds between retries once the model failed to load
+        state (str) : one of "loading", "ready" or "failed"
+        warmups (int) : number of times the model had to be (re)loaded
+        keep_warm_pings (int) : number of keep-warm requests sent
+        cold_starts_avoided (int) : keep-warm requests sent after the endpoint was actually used then left idle, which
+                                    found the model loaded
+        cold_starts_detected (int) : keep-warm requests which found the model unloaded anyway
+
+    Public methods:
+
+        start() -> None : starts the warm-up thread
+        stop() -> None : stops the warm-up thread
+        add_listener(listener) -> None : registers a function called with the new state whenever it changes
+        wait_until_ready(timeout) -> bool : blocks until the model is ready
+        stats() -> dict : returns the warm-up and cold-start counters
+    """
+
+    LOADING = "loading"
+    READY = "ready"
+    FAILED = "failed"
+
+    WARMUP_PAYLOAD = {"inputs": "Welcome", "parameters": {"max_new_tokens": 1, "return_full_text": False}}
+
+    def __init__(self, client : InferenceClient = inference_client, retry_policy : RetryPolicy = inference_retry,
+                 keep_warm_interval : float = Config.KEEP_WARM_INTERVAL, max_wait : float = Config.WARMUP_MAX_WAIT,
+                 retry_interval : float = Config.WARMUP_RETRY_INTERVAL):
+
+        self.client = client
+        self.retry_policy = retry_policy
+        self.keep_warm_interval = keep_warm_interval
+        self.max_wait = max_wait
+        self.retry_interval = retry_interval
+
+        self.state = self.LOADING
+        self.warmups = 0
+        self.keep_warm_pings = 0
+        self.cold_starts_avoided = 0
+        self.cold_starts_detected = 0
+
+        self._ready = threading.Event()
+        self._stop = threading.Event()
+        self._listeners = []
+        self._thread = None
+        self._probed_at = None # client.last_request_at right after the last probe
+
+    def start(self) -> None:
+
+        """
+        Starts the warm-up thread. It returns immediately.
+
+        Parameters:
+            None
+
+        Returned value:
+            None
+        """
+
+        if self._thread is not None and self._thread.is_alive():
+            return
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="zero-warmup", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+
+        """
+        Stops the warm-up thread.
+
+        Parameters:
+            None
+
+        Returned value:
+            None
+        """
+
+        self._stop.set()
+
+    def add_listener(self, listener : Callable[[str], None]) -> None:
+
+        """
+        Registers a function called with the new state whenever it changes. It's called from the warm-up thread.
+
+        Parameters:
+            listener (Callable) : the function to be called
+
+        Returned value:
+            None
+        """
+
+        self._listeners.append(listener)
+
+    def wait_until_ready(self, timeout : float | None = None) -> bool:
+
+        """
+        Blocks until the model is ready.
+
+        Parameters:
+            timeout (float) : maximum seconds to wait; None waits until the warm-up finishes
+
+        Returned value:
+            True if the model is ready, False if it failed to load or the timeout expired
+        """
+
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self._ready.is_set() and self.state != self.FAILED:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                break
+            self._ready.wait(0.5 if remaining is None else min(0.5, remaining))
+
+        return self._ready.is_set()
+
+    def stats(self) -> dict:
+
+        """
+        Returns the warm-up and cold-start counters.
+
+        Parameters:
+            None
+
+        Returned value:
+            A dictionary with the current state and the counters
+        """
+
+        return {
+            "state": self.state,
+            "warmups": self.warmups,
+            "keep_warm_pings": self.keep_warm_pings,
+            "cold_starts_avoided": self.cold_starts_avoided,
+            "cold_starts_detected": self.cold_starts_detected,
+        }
+
+    # ===================================== private methods ===================================== #
+
+    def _run(self) -> None:
+
+        self._warm_up()
+
+        # checks the idle time a few times per interval, so a ping is sent soon after the endpoint goes idle
+        interval = self.keep_warm_interval / 4 if self.keep_warm_interval > 0 else self.retry_interval
+        while not self._stop.wait(self.retry_interval if self.state == self.FAILED else interval):
+            if self.state == self.FAILED: # the endpoint may have recovered since
+                self._keep_warm()
+            elif self.keep_warm_interval > 0:
+                last_request_at = self.client.last_request_at or 0
+                if time.monotonic() - last_request_at >= self.keep_warm_interval:
+                    self._keep_warm()
+
+    def _warm_up(self) -> None:
+
+        self.warmups += 1
+        self._set_state(self.LOADING)
+        deadline = time.monotonic() + self.max_wait
+        attempt = 0
+
+        while not self._stop.is_set():
+            attempt += 1
+            try:
+                estimated_time = self._probe()
+            except Exception as e:
+                logging.warning(f"Model warm-up request failed: {e}")
+                estimated_time = self.retry_policy.max_delay
+
+            if estimated_time is None:
+                self._set_ready()
+                return
+
+            if time.monotonic() >= deadline:
+                logging.error("The model couldn't be loaded in time.")
+                self._set_state(self.FAILED)
+                return
+
+            # never waits longer than the model's own estimate, but backs off between polls
+            logging.info(f"Loading conversational model. It's going to take about {estimated_time} seconds")
+            self._stop.wait(self.retry_policy.backoff(attempt, estimated_time))
+
+    def _keep_warm(self) -> None:
+
+        # only the first ping after the endpoint was actually used keeps a cold start from happening; the
+        # following ones keep warm a model nobody is using
+        used_since_last_probe = self.client.last_request_at != self._probed_at
+        self.keep_warm_pings += 1
+        try:
+            estimated_time = self._probe()
+        except Exception as e:
+            logging.warning(f"Keep-warm request failed: {e}")
+            return
+
+        if estimated_time is None:
+            if self.state == self.READY and used_since_last_probe:
+                self.cold_starts_avoided += 1
+            self._set_ready()
+        else:
+            self.cold_starts_detected += 1
+            self._warm_up()
+
+    def _probe(self) -> float | None:
+
+        """
+        Sends a cheap request to the model.
+
+        Returned value:
+            None if the model is ready, or its estimated loading time in seconds. Raises an exception on other errors.
+        """
+
+        try:
+            response = self.client.post(self.WARMUP_PAYLOAD)
+        finally:
+            self._probed_at = self.client.last_request_at
+        if response.status_code == 200:
+            return None
+        if "is currently loading" in response.text:
+            return float(response.json().get("estimated_time", self.retry_policy.base_delay))
+        raise Exception(f"Error {response.status_code}: {response.text}")
+
+    def _set_ready(self) -> None:
+
+        # the endpoint is healthy again, so callers don't have to wait for a half-open probe
+        if self.state != self.READY and self.retry_policy.breaker is not None:
+            self.retry_policy.breaker.record_success()
+        self._set_state(self.READY)
+
+    def _set_state(self, state : str) -> None:
+
+        if state == self.READY:
+            self._ready.set()
+        else:
+            self._ready.clear()
+
+        if state == self.state:
+            return
+
+        self.state = state
+        logging.info(f"Model state: {state}")
+        for listener in self._listeners:
+            listener(state)
+
+
+# warmer shared by the GUI and the command line chat
+model_warmer = ModelWarmer()
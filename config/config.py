@@ -1,11 +1,41 @@
 class ZeroConfig:
     ACTIVE_GIF_PATH = "img/active.gif"
+    ANIMATION_IDLE_FPS = 4 # maximum frame rate of the animation while Zero isn't speaking
+    API_HOST = "127.0.0.1" # address of the local HTTP/WebSocket API; keep it local, as commands run on this computer
+    API_PORT = 8770
     BACKGROUND_COLOUR = "#172136"
+    CALENDAR_SIGN_IN_TIMEOUT = 300 # seconds the Google sign-in waits for the user before the calendar command gives up
+    CALENDAR_WAIT_TIMEOUT = 10 # seconds a calendar command waits for the service being started by another thread
+    GIF_CACHE_PATH = "data/gif_cache" # directory keeping the decoded frames of the animated GIFs
     INACTIVE_GIF_PATH = "img/inactive.gif"
     LABEL_FONT = ('Verdana', 12)
+    MIC_CALIBRATION_DURATION = 1 # seconds of ambient noise used to calibrate the microphone
+    MIC_PAUSE_THRESHOLD = 1 # seconds of silence which end an utterance
+    MIC_PHRASE_TIME_LIMIT = 15 # maximum length of an utterance, in seconds
+    MIC_RECALIBRATION_INTERVAL = 300 # seconds between two calibrations of the microphone
+    MIC_SAMPLE_RATE = 16000 # sample rate of the captured audio; 16 kHz is what the local recognisers expect
     MICROPHONE_PATH = "img/microphone.png"
     SEND_ICON_PATH = "img/send.png"
+    STREAM_ANSWERS = True # shows the chat answer token by token while it's generated
+    STT_ENGINE = "google" # "google" (online) or "vosk" (local, needs VOSK_MODEL_PATH)
+    TRANSCRIPT_WINDOW_TURNS = 50 # turns rendered at once in the transcript, whatever the length of the session
     TTK_THEME = 'breeze-dark'
     TTK_THEME_FILE = 'themes/tkBreeze-master/breeze-dark/breeze-dark.tcl'
+    TTS_CACHE_MAX_BYTES = 50 * 1024 * 1024 # least recently used clips are evicted beyond this size
+    TTS_CACHE_PATH = "data/tts_cache" # directory keeping the synthesised audio of previous utterances
+    TTS_ENGINE = "gtts" # "gtts" (online) or "espeak" (local espeak-ng)
+    TTS_FALLBACK_COOLDOWN = 60 # seconds the engine is skipped after missing its latency budget
+    TTS_FALLBACK_ENGINE = "espeak" # used when the engine misses its latency budget; None disables the fallback
+    TTS_LANGUAGE = "en"
+    TTS_LATENCY_BUDGET = 2.0 # seconds the engine may take to synthesise a sentence
+    TTS_PIPELINE = True # synthesises the next sentence while the current one plays
+    TTS_PIPELINE_DEPTH = 2 # sentences synthesised ahead of playback
+    TURN_WORKERS = 2 # threads processing turns, shared by the window and the API clients
+    UI_REFRESH_MS = 250 # fallback interval between two drains of the event bus; events normally wake the UI up at once
+    VOSK_MODEL_PATH = "data/models/vosk-model-small-en-us-0.15" # unzipped model from https://alphacephei.com/vosk/models
+    WAKE_WORD = "zero" # saying it starts capturing a command, without pressing the microphone button
+    WAKE_WORD_COMMAND_TIMEOUT = 5 # seconds the command may take to start after the wake word
+    WAKE_WORD_CPU_BUDGET = True # only decodes audio louder than the ambient noise while waiting for the wake word
+    WAKE_WORD_ENABLED = True # needs Vosk and VOSK_MODEL_PATH; the microphone button works either way
     ZERO_FONT = ('Verdana', 10)
     ZERO_BG_COLOUR = "#468291"
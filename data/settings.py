@@ -1,5 +1,6 @@
 import os
 import json
+import functools
 from cryptography.fernet import Fernet
 from dotenv import load_dotenv
 
@@ -69,6 +70,25 @@ def load_secure_json(filename : str):
         return json.loads(decrypt_data(encrypted_data))
     return {}
 
+@functools.cache
+def _load_settings_file(filename : str) -> dict:
+
+    # decrypting is the costly part, so every module reading the settings shares a single decryption
+    return load_secure_json(filename)
+
+def load_settings(section : str, filename : str = "data/settings.data") -> dict:
+    """
+    Returns a section of the settings file, decrypting the file on the first call only.
+
+    Parameters:
+        section (str): the name of the section, e.g. "ai_settings"
+        filename (str): the name of the settings file
+
+    Returned value:
+        dict: the settings of the section
+    """
+    return _load_settings_file(filename)[section]
+
 # Example Usage
 if __name__ == "__main__":
     try:
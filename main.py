@@ -1,11 +1,26 @@
+import sys
+from utils.profiling import startup_profiler
+
+# enabled before the other imports, so they're timed too
+if "--profile-startup" in sys.argv:
+    startup_profiler.enable()
+
 import tkinter as tk
 from tkinter import ttk
-from PIL import Image, ImageTk, ImageSequence
-from mutagen.mp3 import MP3
-from chat.chat import chat
-from utils.startup import initial_load, start_calendar_service
+from PIL import Image, ImageTk
+from utils.startup import calendar_service, calendar_sign_in_needed
+from chat.warmup import model_warmer, ModelWarmer
 from utils.funcs import *
 from utils.speech import *
+from utils.pipeline import TurnPipeline
+from utils.engine import EngineEvent, ZeroEngine
+from utils.api import ZeroAPIServer
+from utils.events import EventBus
+from utils.metrics import FrameTimer
+from utils.frames import gif_frame_cache
+from utils.animation import AnimationScheduler
+from utils.transcript import TranscriptView
+from utils.lazy import prefetch
 from config.config import ZeroConfig
 import threading
 import time
@@ -23,17 +38,26 @@ class ZeroAssistant:
     Parameters:
 
         active_frame_durations (list) : holds the duration of each frame belonging to one of the animations (active state)
-        active_frames (list) : holds a collection of frames related to one of the animations (active state)
+        active_frames (utils.frames.AnimationFrames) : holds a collection of frames related to one of the animations (active state)
+        answer_turn (int) : index of Zero's answer to the latest input in the transcript; None until the answer arrives
+        animation (utils.animation.AnimationScheduler) : plays the animation of the current state, pausing it while the window is hidden
+        api (utils.api.ZeroAPIServer) : the local HTTP/WebSocket API, sharing the engine with the window; None when disabled
         bot_answer (str) : the answer given by Zero, which is either set by a rule or generated through a langauge model
-        command_caller (utils.funcs.ZeroCommands) : a ZeroCommands object which allows Zero to execute commands
-        command_type (str) : the type of command given by the user; it selects the command to be triggered
+        engine (utils.engine.ZeroEngine) : processes the turns off the Tk thread, runs the commands and speaks; the window is one of its clients
+        events (utils.events.EventBus) : carries user inputs and UI updates from any thread to the Tk thread
+        frame_timer (utils.metrics.FrameTimer) : measures the animation's frame times over the whole session
         gif: the Tkinter widget holding the animation
-        inactive (bool) : a flag which alternates the animation between inactive and active states
+        inactive (bool) : a flag which alternates the animation between inactive and active states; set by the audio player's playback events
         inactive_frame_durations (list) : holds the duration of each frame belonging to one of the animations (inactive state)
-        inactive_frames (list) : holds a collection of frames related to one of the animations (inactive state)
-        initial_speech (str) : used to trigger Zero's TTS when the class is initialised
-        speaking_duration (float) : the amount of time Zero will be speaking; used to indicate when the animation should change states
-        user_input (str) : a given user input in the text box
+        inactive_frames (utils.frames.AnimationFrames) : holds a collection of frames related to one of the animations (inactive state)
+        mapped (bool) : whether the window is shown (False while it's minimised)
+        model_state (str) : the state of the inference model, as given by chat.warmup.ModelWarmer
+        obscured (bool) : whether the animation is fully covered by other windows
+        session (str) : the window's session in the engine, whose answers are spoken
+        shown (bool) : whether the window has been shown once; the background work only starts then
+        thinking (bool) : whether Zero is waiting for an answer, shown in the window title
+        transcript (utils.transcript.TranscriptView) : shows the turns of the session in Zero's text box, rendering only the visible ones
+        turn_frame_timer (utils.metrics.FrameTimer) : measures the animation's frame times while Zero is thinking
         window (tkinter.Tk) : the Tkinter window object, which holds the GUI
 
     Public methods:
@@ -43,25 +67,24 @@ class ZeroAssistant:
     """
 
     # ======================================= constructor ======================================= #
-    def __init__(self):
+    def __init__(self, api : bool = False):
 
         """
         ZeroAssistant class constructor. Used to initalise variables.
 
         Parameters:
-            None
+            api (bool) : whether the local HTTP/WebSocket API is served next to the window
 
         Returned value:
             None
         """
 
-        self.inactive = False
-        self.user_input = ""
-        self.command_type = ""
-        self.command_caller = ZeroCommands()
+        self.inactive = True
+        self.engine = ZeroEngine()
+        self.session = "gui"
+        self.api = ZeroAPIServer(self.engine) if api else None
         self.bot_answer = "Hello! My name is Zero, and I'm your personal assistant. Let's talk!"
-        self.speaking_duration = 0
-        self.initial_speech = True
+        self.events = EventBus()
 
         self.inactive_frames = []
         self.inactive_frame_durations = []
@@ -71,6 +94,17 @@ class ZeroAssistant:
 
         self.window = None
         self.gif = None
+        self.animation = None
+        self.transcript = None
+        self.answer_turn = None
+        self.mapped = True
+        self.obscured = False
+        self.shown = False
+
+        self.model_state = model_warmer.state
+        self.thinking = False
+        self.frame_timer = FrameTimer()
+        self.turn_frame_timer = FrameTimer()
 
     # ===================================== public methods ====================================== #
 
@@ -86,11 +120,9 @@ class ZeroAssistant:
             None
         """
 
-        self._open_window()
-        self._load_gif()
-        self._load_images()
-        self._load_widgets()
-        self._configure_window()
+        for step in [self._open_window, self._load_gif, self._load_images, self._load_widgets, self._configure_window]:
+            with startup_profiler.measure(step.__name__):
+                step()
         self._window_mainloop()
 
     # ===================================== private methods ===================================== #
@@ -119,25 +151,6 @@ class ZeroAssistant:
         style.theme_use(ZeroConfig.TTK_THEME)
         logging.info("Zero Assistant window is configured")
 
-    def _load_gif_frames(self, animated_gif, frame_list, frame_durations) -> None:
-
-        """
-        Loads the gif frames into a list, and the duration of each frame to another.
-
-        Parameters:
-            animated_gif : the gif to be loaded.
-            frame_list (list) : the list which will contain the frames.
-            frame_durations (list) : the list to store the duration of each frame.
-
-        Returned value:
-            None
-        """
-
-        for frame in ImageSequence.Iterator(animated_gif):
-            frame_list.append(ImageTk.PhotoImage(frame.copy()))
-            frame_duration = animated_gif.info.get("duration", 100)
-            frame_durations.append(frame_duration)
-
     def _load_gif(self) -> None:
         
         """
@@ -150,14 +163,12 @@ class ZeroAssistant:
             None
         """
 
-        # getting images
-        inactive_gif = Image.open(ZeroConfig.INACTIVE_GIF_PATH)
-        active_gif = Image.open(ZeroConfig.ACTIVE_GIF_PATH)
+        # loading gif frames; they're decoded on the first launch only, then mapped from the frame cache
+        self.inactive_frames = gif_frame_cache.load(ZeroConfig.INACTIVE_GIF_PATH)
+        self.inactive_frame_durations = self.inactive_frames.durations
 
-        # loading gif frames
-
-        self._load_gif_frames(inactive_gif, self.inactive_frames, self.inactive_frame_durations)
-        self._load_gif_frames(active_gif, self.active_frames, self.active_frame_durations)
+        self.active_frames = gif_frame_cache.load(ZeroConfig.ACTIVE_GIF_PATH)
+        self.active_frame_durations = self.active_frames.durations
 
         ## ----------------------- widget displaying ----------------------- ##
 
@@ -169,6 +180,8 @@ class ZeroAssistant:
             self.gif = ttk.Label(self.window, image = self.active_frames[0], anchor=tk.CENTER, background= ZeroConfig.BACKGROUND_COLOUR)
             self.gif.image = self.active_frames[0]
         self.gif.grid(row=0, column=0, columnspan=4, sticky="nsew")
+        self.animation = AnimationScheduler(self.gif, {"inactive": self.inactive_frames, "active": self.active_frames},
+                                            on_frame=self._record_frame, on_pause=self._pause_frame_timers)
         logging.info("Animated GIF is loaded.")
 
     def _load_images(self) -> None:
@@ -211,7 +224,7 @@ class ZeroAssistant:
         #self.zero_text = ttk.Label(self.window, text = self.bot_answer, background=ZeroConfig.ZERO_BG_COLOUR, font=ZeroConfig.ZERO_FONT)
         self.zero_text = tk.Text(self.window, height = 5, state=tk.DISABLED, background=ZeroConfig.ZERO_BG_COLOUR, font=ZeroConfig.ZERO_FONT)
         self.zero_text.grid(row=1, column=1, sticky="nsew", columnspan=2, padx=10)
-        self.zero_text_scroll = ttk.Scrollbar(self.window, orient=tk.VERTICAL, command=self.zero_text.yview)
+        self.zero_text_scroll = ttk.Scrollbar(self.window, orient=tk.VERTICAL)
         self.zero_text_scroll.grid(row=1, column=3, sticky="nsew", padx=10)
 
         # User label
@@ -254,13 +267,15 @@ class ZeroAssistant:
         self.window.columnconfigure(1, weight=1)  # Allow the text boxes to stretch horizontally
         self.window.configure(bg=ZeroConfig.BACKGROUND_COLOUR)
 
-        self.zero_text.config(yscrollcommand=self.zero_text_scroll.set)
-        self.zero_text.config(state=tk.NORMAL)
-        self.zero_text.insert(tk.END, self.bot_answer)
-        self.zero_text.config(state=tk.DISABLED)
+        # the text box scrolls by lines, while only a window of the transcript's turns is rendered
+        self.transcript = TranscriptView(self.zero_text, self.zero_text_scroll)
+        self.transcript.add_turn("Zero", self.bot_answer)
         logging.info("Windows elements are set.")
 
         self.zero_text.bind("<Configure>", self._resize_text)
+        self.window.bind("<Map>", self._on_map)
+        self.window.bind("<Unmap>", self._on_map)
+        self.gif.bind("<Visibility>", self._on_visibility)
         self.user_text.bind("<Return>", self._on_pressing_enter)
         logging.info("Widget actions are set.")
 
@@ -276,193 +291,252 @@ class ZeroAssistant:
             None
         """
 
+        ## -------------------------- event routing ------------------------ ##
+
+        self.events.subscribe("user_input", self._on_user_input)
+        self.events.subscribe("playback", self._on_playback)
+        self.events.subscribe("model_state", self._show_model_state)
+        self.events.subscribe("ui", lambda callback: callback())
+
+        # publishing from any thread generates a virtual event, so the Tk loop drains the bus right away
+        self.window.bind("<<ZeroEvents>>", lambda event: self.events.drain())
+        self.events.wake = lambda: self.window.event_generate("<<ZeroEvents>>", when="tail")
+
         ## ------------------------- main functions ------------------------ ##
 
-        self._animate(0)
-        self._answer()
-        self._reset_gif()
-        self._tk_execute_command()
+        # the engine's events of the window's session reach it on the Tk thread, through the event bus
+        self.engine.open_session(self.session, speak=True, dispatch=lambda callback: self.events.publish("ui", callback))
+        self.engine.add_listener(self.session, self._on_engine_event)
+        model_warmer.add_listener(lambda state: self.events.publish("model_state", state))
+        self.engine.start() # the model loads in the background while the window is already usable
+        if self.api is not None:
+            self.api.start()
+        audio_player.add_listener(lambda event: self.events.publish("playback", event))
+        self._show_model_state(model_warmer.state)
+        self.animation.start("inactive" if self.inactive else "active")
+        self._drain_events()
 
         ## ---------------------- main loop function ----------------------- ##
 
         self.window.mainloop()
 
+        logging.info(f"TTS cache: {tts_cache.stats()}")
+        logging.info(f"Microphone: {microphone_listener.stats()}")
+        logging.info(f"Events: {self.events.stats()}")
+        logging.info(f"Turns: {self.engine.stats()}")
+        logging.info(f"Animation frame times: {self.frame_timer.stats()}")
+        logging.info(f"Animation: {self.animation.stats()}")
+
+    def _start_background_work(self) -> None:
+
+        """
+        Starts what isn't needed to show the window, once it's on screen: the microphone, the greeting, the speech
+        cache, and the prefetch of the heavy dependencies (speech recognition, pygame's mixer, gTTS and the
+        Google Calendar service), which are otherwise imported on their first use. The calendar service isn't
+        prefetched when the user has to sign in, which would keep it waiting for them in the background.
+
+        Parameters:
+            None
+
+        Returned value:
+            None
+        """
+
+        shown_at = startup_profiler.mark("window shown")
+        logging.info(f"Window shown {shown_at:.0f} ms after startup.")
+        if startup_profiler.enabled:
+            print(startup_profiler.report())
+            print(f"Window shown after {shown_at:.1f} ms (target: 500 ms)")
+
+        microphone_listener.start() # opens and calibrates the microphone once, before the first button press
+        threading.Thread(target=self._send_audio, name="zero-stt", daemon=True).start()
+        threading.Thread(target=self._perform_tts, daemon=True).start() # Zero's greeting
+        tts_cache.prewarm([self.bot_answer, *COMMAND_MESSAGES.values(), UNKNOWN_COMMAND_MESSAGE,
+                           "Failed to play the song. Please try again."])
+
+        # the most urgent first: the microphone needs speech_recognition, the greeting gTTS and the mixer
+        prefetch([sr, gtts, mixer] + ([] if calendar_sign_in_needed() else [calendar_service]),
+                 on_done=lambda: print(startup_profiler.report(background=True)) if startup_profiler.enabled else None)
+
 
     # ====================================== main functions ===================================== #
 
-    def _animate(self, frame_index : int) -> None:
+    def _on_user_input(self, user_input : str, command : bool = False) -> None:
 
         """
-        Updates the displayed frame of the animated GIF.
+        Sends a user input, typed or spoken, to the turn pipeline, which gets Zero's response and triggers TTS.
 
         Parameters:
-            frame_index : the index of the animation's frame.
+            user_input (str) : the text sent by the user
+            command (bool) : whether the input must be handled as a command (e.g. it followed the wake word)
 
         Returned value:
             None
         """
 
-        # updates inactive state GIF if Zero is not speaking
-        if self.inactive:
-            # update the image of the label to the current frame
-            frame = self.inactive_frames[frame_index]
-            self.gif.config(image=frame)
-            self.gif.image = frame
+        if len(user_input) > 0:
+            self.transcript.add_turn("User", user_input)
+            self.answer_turn = None
+            self.engine.submit(user_input, self.session, command=command) # supersedes the turn in flight, if any
+    
+    def _on_engine_event(self, event : EngineEvent) -> None:
 
-            # Schedule the next frame update
-            next_frame = (frame_index + 1) % len(self.inactive_frames)
-            self.window.after(self.inactive_frame_durations[frame_index], self._animate, next_frame)
+        """
+        Shows the progress of the window's turns. The engine has already dropped the events of superseded turns.
 
-        else:
-            frame = self.active_frames[frame_index]
-            self.gif.config(image=frame)
-            self.gif.image = frame
+        Parameters:
+            event (utils.engine.EngineEvent) : an event of the window's session
 
-            next_frame = (frame_index + 1) % len(self.active_frames)
-            self.window.after(self.active_frame_durations[frame_index], self._animate, next_frame)
+        Returned value:
+            None
+        """
 
+        if event.kind in [TurnPipeline.THINKING, TurnPipeline.IDLE]:
+            self._show_pipeline_state(event.kind)
+        elif event.kind == "token":
+            self._append_answer(event.text)
+        elif event.kind == "answer":
+            self._show_answer(event.text)
+        elif event.kind == "error": # a command failed; the engine speaks the reason
+            self.bot_answer = event.text
 
-    def _answer(self) -> None:
+    def _show_answer(self, answer : str) -> None:
 
         """
-        Gets Zero's response to user input, triggers TTS and assigns values to parameters to control
-        animations. Also triggers Zero's inital TTS.
+        Adds Zero's answer to the transcript, or completes the answer being streamed. The command of the answer,
+        if any, is run by the engine.
 
         Parameters:
+            answer (str) : Zero's answer
+
+        Returned value:
             None
+        """
+
+        self.bot_answer = answer
+
+        # only the answer's own turn is redrawn, never the whole transcript
+        if self.answer_turn is None:
+            self.answer_turn = self.transcript.add_turn("Zero", answer)
+        else:
+            self.transcript.set_text(self.answer_turn, answer)
+
+    def _append_answer(self, token : str) -> None:
+
+        """
+        Appends a streamed token to Zero's answer in the transcript.
+
+        Parameters:
+            token (str) : the token generated by the model
 
         Returned value:
             None
         """
 
-        # executed when Zero is started
-        if self.initial_speech:
-            threading.Thread(target=self._perform_tts).start()
-            self.initial_speech = False
-            self.speaking_duration = (len(self.bot_answer) / 7)
+        if self.answer_turn is None:
+            self.answer_turn = self.transcript.add_turn("Zero", "")
+        if len(self.transcript.store[self.answer_turn].text) == 0:
+            token = token.lstrip()
+        self.transcript.append_text(self.answer_turn, token)
 
-        # When user types or say something, Zero will automatically answer
-        if len(self.user_input) > 0:
+    def _on_playback(self, event : PlaybackEvent) -> None:
 
-            self.inactive = False
+        """
+        Switches the animation between its active and inactive states when Zero starts or stops speaking.
 
-            if self.user_input.lower().lstrip().startswith("zero,"):
-                self.bot_answer, self.command_type = self.command_caller.activate_command(self.user_input.lstrip())
-            else: # Hugging Face bot is called when no command is sent
-                self.bot_answer = chat(self.user_input)
+        Parameters:
+            event (utils.speech.PlaybackEvent) : the event published by the audio player
 
-            # sets Zero's text to display, user command, triggers TTS, set variables to control animations
-            self.zero_text.config(state=tk.NORMAL)
-            self.zero_text.delete("1.0", tk.END)
-            self.zero_text.insert(tk.END, self.bot_answer.lstrip())
-            self.zero_text.config(state=tk.DISABLED)
-            #self.zero_text.config(text=self.bot_answer.lstrip())
-            self.user_input = ""
-            threading.Thread(target=self._perform_tts).start()
-            self.speaking_duration = (len(self.bot_answer) / 7)
-        
-        self.window.after(1000, self._answer)
-    
+        Returned value:
+            None
+        """
 
-    def _resize_text(self, event) -> None:
+        if event.kind == "progress":
+            return
+
+        # the other animation starts right away, from its first frame, instead of after the current frame
+        self.inactive = event.kind == "stop"
+        self.animation.set_state("inactive" if self.inactive else "active")
+
+    def _on_map(self, event) -> None:
 
         """
-        Resizes the text to fit the grid cell.
+        Pauses the animation while the window is minimised, and resumes it when it's shown again.
 
         Parameters:
-            event : the event which triggers the function.
+            event : the <Map> or <Unmap> event
 
         Returned value:
             None
         """
-        new_width = event.width
 
-        # update the label wrap length with the new window length
-        self.zero_text.config(wrap=tk.WORD)
-    
-    # ===================================== helper functions ==================================== #
+        # the root window's bindings also receive the events of its widgets
+        if event.widget is not self.window:
+            return
+
+        self.mapped = str(event.type) == "Map"
+        self.animation.set_visible(self.mapped and not self.obscured)
+
+        if self.mapped and not self.shown:
+            self.shown = True
+            self._start_background_work()
 
-    def _execute_command(self) -> None:
+    def _on_visibility(self, event) -> None:
 
         """
-        Triggers an action depending on the selected command.
+        Pauses the animation while it's fully covered by other windows.
 
         Parameters:
+            event : the <Visibility> event of the animation
+
+        Returned value:
             None
+        """
+
+        self.obscured = event.state == "VisibilityFullyObscured"
+        self.animation.set_visible(self.mapped and not self.obscured)
+
+    def _show_model_state(self, state : str) -> None:
+
+        """
+        Shows whether the inference model is still loading in the window title.
+
+        Parameters:
+            state (str) : the model state, as given by chat.warmup.ModelWarmer
 
         Returned value:
             None
         """
-        
-        if "open_page" in self.command_type: # triggers opening web page action
-            self.command_caller.open_page(self.command_type)
-        elif "open_app" in self.command_type: # triggers opening program action
-            try:
-                app_name = re.findall(r"\((.*?)\)", self.command_type)[-1]
-                self.command_caller.open_app(app_name)
-            except Exception as e:
-                logging.error(f"Error while running open_app(): {str(e)}")
-                self.bot_answer = str(e)
-                speak(str(e))
-        elif "close_app" in self.command_type: # triggers closing program action
-            try:
-                command_input = self.command_type
-                app_name = re.findall(r"\((.*?)\)", command_input)[-1]
-                if app_name == "name":
-                    app_name = re.findall(r"e:\s.*", command_input)[-1].replace("e: ", "")
-                self.command_caller.close_app(app_name)
-            except Exception as e:
-                logging.error(f"Error while running close_app(): {str(e)}")
-                self.bot_answer = str(e)
-                speak(str(e))
-        elif "open_folder" in self.command_type: # triggers opening folder action
-            try:
-                command_input = self.command_type
-                folder_name = re.findall(r"\((.*?)\)", command_input)[-1]
-                if folder_name == "folder_name":
-                    folder_name = re.findall(r"e:\s.*", command_input)[-1].replace("e: ", "")
-                self.command_caller.open_folder(folder_name)
-            except Exception as e:
-                logging.error(f"Error while running open_folder(): {str(e)}")
-                self.bot_answer = str(e)
-                speak(str(e))
-        elif "empty_recycle_bin" in self.command_type: # triggers cleaning recycle bin action
-            self.command_caller.empty_recycle_bin()
-        elif "start_playlist" in self.command_type: # triggers playing songs from a playlist action
-            if not "default" in self.command_type:
-                self.command_caller.start_playlist(self.command_type)
-            else:
-                self.command_caller.start_playlist()
-        elif "stop_playlist" in self.command_type: # triggers stopping mixer playlist action
-            self.command_caller.stop_playlist()
-        elif "play_song" in self.command_type: # triggers playing specific song action
-            try:
-                filtered_content = (re.findall(r"\((.*?)\)", self.command_type)[-1]).split("\",")
-                if len(filtered_content) < 2 or len(filtered_content) > 3:
-                    filtered_content = (re.findall(r"s\:(.*)\s", self.command_type)[-1]).split(",")
-                    filtered_content = [item.split("`")[1].replace(" ", "").strip() for item in filtered_content]
-                else:
-                    filtered_content = [item.replace('"', "") for item in filtered_content]
-                name = filtered_content[0].replace("name=", "").strip()
-                artist = filtered_content[1].replace("artist=", "").strip()
-                print(filtered_content)
-                if len(filtered_content) == 3:
-                    self.command_caller.play_song(name, artist, playlist=filtered_content[2].replace("playlist=", "").strip())
-                else:
-                    self.command_caller.play_song(name, artist)
-            except ValueError as ve:
-                self.bot_answer = str(ve)
-                speak(str(ve))
-            except Exception as e:
-                logging.error(f"Error while running play_song(): {str(e)}")
-                self.bot_answer = "Failed to play the song. Please try again."
-                speak("Failed to play the song. Please try again.")
 
+        self.model_state = state
+        self._update_title()
 
-    def _on_pressing_enter(self, event) -> None:
+    def _show_pipeline_state(self, state : str) -> None:
 
         """
-        Triggers the _send_input() function when user presses the Enter key.
+        Shows that Zero is thinking while a turn waits for its answer. The frame times of the animation are
+        measured meanwhile, and logged once the answer arrives.
+
+        Parameters:
+            state (str) : TurnPipeline.THINKING or TurnPipeline.IDLE
+
+        Returned value:
+            None
+        """
+
+        thinking = state == TurnPipeline.THINKING
+        if thinking and not self.thinking:
+            self.turn_frame_timer.reset()
+        elif not thinking and self.thinking:
+            logging.info(f"Animation frame times while thinking: {self.turn_frame_timer.stats()}")
+
+        self.thinking = thinking
+        self._update_title()
+
+    def _update_title(self) -> None:
+
+        """
+        Shows the model and pipeline states in the window title.
 
         Parameters:
             None
@@ -471,12 +545,37 @@ class ZeroAssistant:
             None
         """
 
-        self._send_input()
+        states = []
+        if self.model_state == ModelWarmer.LOADING:
+            states.append("model loading...")
+        elif self.model_state == ModelWarmer.FAILED:
+            states.append("model unavailable")
+        if self.thinking:
+            states.append("thinking...")
 
-    def _perform_tts(self) -> None:
+        self.window.title(f"Zero Assistant ({', '.join(states)})" if states else "Zero Assistant")
+
+    def _record_frame(self, duration : int) -> None:
 
         """
-        Triggers Zero's TTS.
+        Records the frame just drawn in the frame timers.
+
+        Parameters:
+            duration (int) : milliseconds until the next frame is drawn
+
+        Returned value:
+            None
+        """
+
+        self.frame_timer.tick(duration)
+        if self.thinking:
+            self.turn_frame_timer.tick(duration)
+
+    def _pause_frame_timers(self) -> None:
+
+        """
+        Tells the frame timers that no frame is scheduled, so the time the animation spends paused isn't measured
+        as a late frame.
 
         Parameters:
             None
@@ -485,13 +584,14 @@ class ZeroAssistant:
             None
         """
 
-        speak(self.bot_answer)
+        self.frame_timer.pause()
+        self.turn_frame_timer.pause()
 
-    
-    def _reset_gif(self) -> None:
+    def _drain_events(self) -> None:
 
         """
-        Returns gif to inactive state when Zero stops speaking.
+        Drains the event bus on the Tk thread. Events normally wake the Tk loop up themselves; this slow poll
+        only catches the ones whose wake-up failed (e.g. published while the main loop wasn't running yet).
 
         Parameters:
             None
@@ -500,17 +600,31 @@ class ZeroAssistant:
             None
         """
 
-        if (self.speaking_duration <= 0):
-            self.inactive = True
-        else:
-            self.speaking_duration -= 1
+        self.events.drain()
+        self.window.after(ZeroConfig.UI_REFRESH_MS, self._drain_events)
 
-        self.window.after(1000, self._reset_gif)
+    def _resize_text(self, event) -> None:
+
+        """
+        Resizes the text to fit the grid cell.
+
+        Parameters:
+            event : the event which triggers the function.
+
+        Returned value:
+            None
+        """
+        new_width = event.width
+
+        # update the label wrap length with the new window length
+        self.zero_text.config(wrap=tk.WORD)
     
-    def _send_audio(self) -> None:
+    # ===================================== helper functions ==================================== #
+
+    def _on_pressing_enter(self, event) -> None:
 
         """
-        Sends user audio input to Zero.
+        Triggers the _send_input() function when user presses the Enter key.
 
         Parameters:
             None
@@ -519,12 +633,12 @@ class ZeroAssistant:
             None
         """
 
-        self.user_input = get_audio()
+        self._send_input()
 
-    def _send_input(self) -> None:
+    def _perform_tts(self) -> None:
 
         """
-        Sends user input to Zero and clears text box.
+        Triggers Zero's TTS.
 
         Parameters:
             None
@@ -532,14 +646,14 @@ class ZeroAssistant:
         Returned value:
             None
         """
-        
-        self.user_input = self.user_text.get("1.0",'end-1c')
-        self.user_text.delete("1.0", tk.END)
-    
-    def _tk_execute_command(self) -> None:
+
+        self.engine.speak(self.bot_answer)
+
+    def _send_audio(self) -> None:
 
         """
-        Creates a thread to allow the execution of commands.
+        Sends the utterances captured by the microphone listener to Zero, converting them to text. Utterances
+        following the wake word are submitted right away as commands. Runs in its own thread for the whole session.
 
         Parameters:
             None
@@ -548,16 +662,30 @@ class ZeroAssistant:
             None
         """
 
-        if len(self.command_type) > 0:
-            threading.Thread(target=self._execute_command, daemon=True).start()
-            self.command_type = "" # resets command_type so that a new thread is not open every second
+        while True:
+            utterance = microphone_listener.utterances.get()
+            text = recognise(utterance.audio)
+            self.events.publish("user_input", text, utterance.command and not text.startswith("Bot: "))
+
+    def _send_input(self) -> None:
+
+        """
+        Sends user input to Zero and clears text box.
+
+        Parameters:
+            None
+
+        Returned value:
+            None
+        """
+        
+        self.events.publish("user_input", self.user_text.get("1.0",'end-1c'))
+        self.user_text.delete("1.0", tk.END)
 
-        self.window.after(1000, self._tk_execute_command)
-    
     def _tk_send_audio(self):
 
         """
-        Creates a thread to allow the STT.
+        Asks the microphone listener for the next utterance, which _send_audio() converts to text.
 
         Parameters:
             None
@@ -566,7 +694,7 @@ class ZeroAssistant:
             None
         """
 
-        threading.Thread(target=self._send_audio, daemon=True).start()
+        microphone_listener.arm()
 
 
 # ===================================== main() function ===================================== #
@@ -585,10 +713,8 @@ def main() -> None:
 
     try:
 
-        initial_load() # tries to load HuggingFace inference model
-        start_calendar_service() # tries to load Google Calendar API service
-
-        zero = ZeroAssistant() # intialises Zero
+        with startup_profiler.measure("ZeroAssistant()"):
+            zero = ZeroAssistant(api="--api" in sys.argv) # intialises Zero
         zero.run()
 
     except SystemExit as se:
@@ -0,0 +1,218 @@
+from config.config import ZeroConfig
+from typing import Callable, Sequence
+import bisect
+import itertools
+import math
+import time
+
+
+class AnimationScheduler:
+
+    """
+    Plays animations on a Tk label without wasting CPU. The frame shown is chosen from the time elapsed, so the
+    animation keeps its pace whatever the rate it's redrawn at:
+
+        - while speaking, every frame is drawn, at the GIF's own frame rate
+        - otherwise (idle), the label is redrawn at most `idle_fps` times per second, skipping frames
+        - while the window is minimised or hidden, nothing is scheduled at all
+
+    The label is only reconfigured when the frame to be shown differs from the one already displayed.
+
+    Parameters:
+
+        widget (tkinter.Widget) : the label showing the frames; its after() schedules the updates
+        animations (dict) : the frames of each state, as sequences of Tk images with a `durations` attribute
+        idle_fps (float) : maximum frame rate of the idle states
+        full_rate_states (set) : the states drawn at full frame rate
+        on_frame (Callable) : called with the delay until the next update, in milliseconds, after each update
+        on_pause (Callable) : called when the scheduled update is dropped (paused, switched or still animation)
+        state (str) : the animation being played
+        visible (bool) : whether the widget can be seen
+        rendered (int) : number of frames drawn
+        skipped (int) : number of updates which didn't need to change the frame
+
+    Public methods:
+
+        start(state) -> None : starts playing an animation
+        set_state(state) -> None : switches to another animation, from its first frame
+        set_visible(visible) -> None : pauses or resumes the animation
+        stats() -> dict : returns the frame rate and CPU usage of the animation
+    """
+
+    def __init__(self, widget, animations : dict[str, Sequence], idle_fps : float = ZeroConfig.ANIMATION_IDLE_FPS,
+                 full_rate_states : set[str] = frozenset({"active"}), on_frame : Callable[[int], None] | None = None,
+                 on_pause : Callable[[], None] | None = None):
+
+        self.widget = widget
+        self.animations = animations
+        self.idle_fps = idle_fps
+        self.full_rate_states = full_rate_states
+        self.on_frame = on_frame
+        self.on_pause = on_pause
+
+        self.state = None
+        self.visible = True
+        self.rendered = 0
+        self.skipped = 0
+
+        # cumulative end time of each frame, so the frame at a given time is found by bisection
+        self._frame_ends = {name: list(itertools.accumulate(frames.durations)) for name, frames in animations.items()}
+        self._position = 0.0
+        self._last_update = None
+        self._shown = None
+        self._job = None
+
+        self._render_cpu = 0.0
+        self._started_at = None
+        self._started_cpu = None
+        self._paused_at = None
+        self._paused_for = 0.0
+
+    def start(self, state : str) -> None:
+
+        """
+        Starts playing an animation, from its first frame.
+
+        Parameters:
+            state (str) : the name of the animation
+
+        Returned value:
+            None
+        """
+
+        self._started_at = time.perf_counter()
+        self._started_cpu = time.process_time()
+        self.set_state(state)
+
+    def set_state(self, state : str) -> None:
+
+        """
+        Switches to another animation, from its first frame. The new frame is drawn right away.
+
+        Parameters:
+            state (str) : the name of the animation
+
+        Returned value:
+            None
+        """
+
+        if state == self.state:
+            return
+
+        self.state = state
+        self._position = 0.0
+        self._last_update = None
+        self._paused() # the new animation is drawn now, not when the previous one was due
+        if self.visible:
+            self._reschedule()
+
+    def set_visible(self, visible : bool) -> None:
+
+        """
+        Pauses the animation while the widget can't be seen, and resumes it where it stopped.
+
+        Parameters:
+            visible (bool) : whether the widget can be seen
+
+        Returned value:
+            None
+        """
+
+        if visible == self.visible:
+            return
+
+        self.visible = visible
+        if visible:
+            if self._paused_at is not None:
+                self._paused_for += time.perf_counter() - self._paused_at
+                self._paused_at = None
+            self._last_update = None # the time spent hidden doesn't advance the animation
+            self._reschedule()
+        else:
+            self._paused_at = time.perf_counter()
+            self._cancel()
+            self._paused()
+
+    def stats(self) -> dict:
+
+        """
+        Returns the frame rate and CPU usage of the animation.
+
+        Parameters:
+            None
+
+        Returned value:
+            A dictionary with the number of frames drawn and of updates skipped, the frames drawn per second while
+            visible, the seconds spent paused, the CPU time spent drawing, and the CPU usage of the whole process
+            (as a percentage of one core)
+        """
+
+        if self._started_at is None:
+            return {"rendered": 0, "skipped": 0, "fps": 0.0, "paused_s": 0.0, "render_cpu_ms": 0.0, "process_cpu_percent": 0.0}
+
+        now = time.perf_counter()
+        paused = self._paused_for + (now - self._paused_at if self._paused_at is not None else 0.0)
+        elapsed = now - self._started_at
+
+        return {
+            "rendered": self.rendered,
+            "skipped": self.skipped,
+            "fps": self.rendered / (elapsed - paused) if elapsed > paused else 0.0,
+            "paused_s": paused,
+            "render_cpu_ms": 1000 * self._render_cpu,
+            "process_cpu_percent": 100 * (time.process_time() - self._started_cpu) / elapsed if elapsed else 0.0,
+        }
+
+    # ===================================== private methods ===================================== #
+
+    def _paused(self) -> None:
+
+        if self.on_pause is not None:
+            self.on_pause()
+
+    def _reschedule(self) -> None:
+
+        self._cancel()
+        self._update()
+
+    def _cancel(self) -> None:
+
+        if self._job is not None:
+            self.widget.after_cancel(self._job)
+            self._job = None
+
+    def _update(self) -> None:
+
+        start = time.thread_time()
+        frames = self.animations[self.state]
+        frame_ends = self._frame_ends[self.state]
+
+        now = time.perf_counter()
+        if self._last_update is not None:
+            self._position = (self._position + 1000 * (now - self._last_update)) % frame_ends[-1]
+        self._last_update = now
+
+        index = bisect.bisect_right(frame_ends, self._position)
+        frame = frames[index]
+        if frame is not self._shown:
+            self.widget.config(image=frame)
+            self.widget.image = frame
+            self._shown = frame
+            self.rendered += 1
+        else:
+            self.skipped += 1
+
+        self._render_cpu += time.thread_time() - start
+        if len(frames) == 1: # a still image never needs redrawing
+            self._paused()
+            return
+
+        # the next update is due when the current frame ends, but not sooner than the idle rate allows
+        delay = frame_ends[index] - self._position
+        if self.state not in self.full_rate_states:
+            delay = max(delay, 1000 / self.idle_fps)
+        delay = max(math.ceil(delay), 1)
+
+        self._job = self.widget.after(delay, self._update)
+        if self.on_frame is not None:
+            self.on_frame(delay)
@@ -0,0 +1,338 @@
+"""
+Local HTTP and WebSocket API of Zero's engine, so scripts, load tests and other front-ends can talk to Zero
+without its window. Every client has its own session (history and superseding), while all of them share the
+engine's turn workers.
+
+    - POST /turns {"text": ..., "session": ..., "command": false, "timeout": 60} answers an input, waiting for
+      the answer: {"session": ..., "turn_id": ..., "answer": ..., "command": {...} | null}. Without a session, the
+      input is answered in a one-off session
+    - POST /sessions {"speak": false} opens a session: {"session": ...}
+    - DELETE /sessions/<session> closes a session
+    - GET /stats returns the engine counters and latencies
+    - GET /ws opens a WebSocket with a session of its own. Each text message is an input ({"text": ...,
+      "command": false}, or the bare text) and every event of the session is sent back as JSON ({"kind": ...,
+      "turn_id": ..., "text": ..., ...}), tokens included
+
+Commands run on this computer, so the API only listens locally, and rejects requests made by web pages of other
+origins.
+
+Usage:
+    python -m utils.api [port]
+"""
+
+from config.config import ZeroConfig
+from utils.engine import ZeroEngine
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+import base64
+import dataclasses
+import hashlib
+import json
+import logging
+import queue
+import struct
+import sys
+import threading
+import time
+
+WEBSOCKET_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+MAX_MESSAGE_BYTES = 1024 * 1024
+LOCAL_HOSTS = {"localhost", "127.0.0.1", "::1"}
+
+
+class ZeroAPIServer:
+
+    """
+    Serves the local API of an engine from a daemon thread, one thread per connection.
+
+    Parameters:
+
+        engine (utils.engine.ZeroEngine) : the engine answering the clients; it must be started
+        host (str) : the address to listen to
+        port (int) : the port to listen to; 0 picks a free one
+
+    Public methods:
+
+        start() -> None : starts serving in the background
+        stop() -> None : stops serving
+        url (property) -> str : the base URL of the API
+    """
+
+    def __init__(self, engine : ZeroEngine, host : str = ZeroConfig.API_HOST, port : int = ZeroConfig.API_PORT):
+
+        self.engine = engine
+        self.host = host
+        self.port = port
+
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self._server.server_port if self._server is not None else self.port}/"
+
+    def start(self) -> None:
+
+        """
+        Starts serving in a daemon thread. It returns immediately.
+
+        Parameters:
+            None
+
+        Returned value:
+            None
+        """
+
+        self._server = ThreadingHTTPServer((self.host, self.port), _APIHandler)
+        self._server.daemon_threads = True
+        self._server.engine = self.engine
+        self._thread = threading.Thread(target=self._server.serve_forever, name="zero-api", daemon=True)
+        self._thread.start()
+        logging.info(f"Zero's API is listening on {self.url}")
+
+    def stop(self) -> None:
+
+        """
+        Stops serving. The open WebSockets are closed when their connection ends.
+
+        Parameters:
+            None
+
+        Returned value:
+            None
+        """
+
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+
+class _APIHandler(BaseHTTPRequestHandler):
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+
+        if not self._origin_allowed():
+            return self._send_json(403, {"error": "Requests from other origins aren't allowed."})
+
+        path = urlparse(self.path).path
+        if path == "/stats":
+            self._send_json(200, self.server.engine.stats())
+        elif path == "/ws" and self.headers.get("Upgrade", "").lower() == "websocket":
+            self._serve_websocket()
+        else:
+            self._send_json(404, {"error": f"Unknown endpoint: {path}"})
+
+    def do_POST(self):
+
+        if not self._origin_allowed():
+            return self._send_json(403, {"error": "Requests from other origins aren't allowed."})
+
+        # a JSON content type can't be sent by a web page without a preflight request, which isn't answered
+        if self.headers.get("Content-Type", "").split(";")[0].strip() != "application/json":
+            return self._send_json(415, {"error": "The body must be JSON (Content-Type: application/json)."})
+
+        try:
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        except ValueError as ve:
+            return self._send_json(400, {"error": f"Invalid JSON: {ve}"})
+
+        path = urlparse(self.path).path
+        if path == "/turns":
+            self._answer_turn(payload)
+        elif path == "/sessions":
+            self._send_json(201, {"session": self.server.engine.open_session(speak=bool(payload.get("speak", False)))})
+        else:
+            self._send_json(404, {"error": f"Unknown endpoint: {path}"})
+
+    def do_DELETE(self):
+
+        if not self._origin_allowed():
+            return self._send_json(403, {"error": "Requests from other origins aren't allowed."})
+
+        path = urlparse(self.path).path
+        if path.startswith("/sessions/"):
+            self.server.engine.close_session(path[len("/sessions/"):])
+            self._send_json(200, {})
+        else:
+            self._send_json(404, {"error": f"Unknown endpoint: {path}"})
+
+    def log_message(self, format, *args):
+        logging.debug(f"API: {format % args}")
+
+    # ===================================== private methods ===================================== #
+
+    def _origin_allowed(self) -> bool:
+
+        # scripts send no Origin; browsers always do, and only the pages served from this computer are let in
+        origin = self.headers.get("Origin")
+        return origin is None or urlparse(origin).hostname in LOCAL_HOSTS
+
+    def _answer_turn(self, payload : dict) -> None:
+
+        text = payload.get("text")
+        if not isinstance(text, str) or not text.strip():
+            return self._send_json(400, {"error": "'text' must be a non-empty string."})
+
+        engine = self.server.engine
+        session_id = payload.get("session")
+        one_off = session_id is None
+        if one_off:
+            session_id = engine.open_session()
+
+        try:
+            event = engine.ask(text, session_id, command=bool(payload.get("command", False)), timeout=payload.get("timeout", 60))
+        finally:
+            if one_off:
+                engine.close_session(session_id)
+
+        if event is None:
+            return self._send_json(504, {"session": session_id, "error": "The turn was superseded, failed or timed out."})
+        self._send_json(200, {"session": session_id, "turn_id": event.turn_id, "answer": event.text,
+                              "command": _command_json(event.command)})
+
+    def _send_json(self, status : int, body : dict) -> None:
+
+        data = json.dumps(body, default=str).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        try:
+            self.wfile.write(data)
+        except (BrokenPipeError, ConnectionResetError): # the client went away
+            self.close_connection = True
+
+    def _serve_websocket(self) -> None:
+
+        key = self.headers.get("Sec-WebSocket-Key")
+        if key is None:
+            return self._send_json(400, {"error": "Missing Sec-WebSocket-Key header."})
+
+        accept = base64.b64encode(hashlib.sha1((key + WEBSOCKET_GUID).encode()).digest()).decode()
+        self.send_response(101, "Switching Protocols")
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Accept", accept)
+        self.end_headers()
+        self.close_connection = True
+
+        # events come from the worker threads, so a slow client is written to by a thread of its own
+        engine = self.server.engine
+        outgoing = queue.Queue()
+        session_id = engine.open_session()
+        engine.add_listener(session_id, lambda event: outgoing.put((0x1, json.dumps(dataclasses.asdict(event), default=str).encode())))
+        writer = threading.Thread(target=self._write_frames, args=(outgoing,), name="zero-api-ws", daemon=True)
+        writer.start()
+        outgoing.put((0x1, json.dumps({"kind": "session", "session": session_id}).encode()))
+
+        try:
+            while True:
+                frame = self._read_message()
+                if frame is None:
+                    break
+                opcode, payload = frame
+                if opcode == 0x8: # close
+                    outgoing.put((0x8, payload[:2]))
+                    break
+                if opcode == 0x9: # ping
+                    outgoing.put((0xA, payload))
+                elif opcode == 0x1:
+                    self._submit_message(session_id, payload.decode("utf-8", errors="replace"), outgoing)
+        except (ConnectionError, OSError, ValueError) as e:
+            logging.info(f"WebSocket of {session_id} closed: {e}")
+        finally:
+            engine.close_session(session_id)
+            outgoing.put(None)
+            writer.join(timeout=5)
+
+    def _submit_message(self, session_id : str, message : str, outgoing : queue.Queue) -> None:
+
+        try:
+            payload = json.loads(message)
+        except ValueError:
+            payload = {"text": message} # the bare text
+
+        text = payload.get("text") if isinstance(payload, dict) else None
+        if not isinstance(text, str) or not text.strip():
+            outgoing.put((0x1, json.dumps({"kind": "error", "session": session_id, "text": "'text' must be a non-empty string."}).encode()))
+            return
+
+        self.server.engine.submit(text, session_id, command=bool(payload.get("command", False)))
+
+    def _read_message(self) -> tuple[int, bytes] | None:
+
+        # reads a whole message, joining its fragments; control frames may come between fragments
+        opcode, fragments = None, []
+        while True:
+            header = self.rfile.read(2)
+            if len(header) < 2:
+                return None
+
+            final, frame_opcode = header[0] & 0x80, header[0] & 0x0F
+            length = header[1] & 0x7F
+            if length == 126:
+                length = struct.unpack(">H", self.rfile.read(2))[0]
+            elif length == 127:
+                length = struct.unpack(">Q", self.rfile.read(8))[0]
+            if length > MAX_MESSAGE_BYTES or sum(map(len, fragments)) + length > MAX_MESSAGE_BYTES:
+                raise ValueError("message too large")
+
+            mask = self.rfile.read(4) if header[1] & 0x80 else None
+            payload = self.rfile.read(length)
+            if mask is not None and length:
+                key = (mask * (length // 4 + 1))[:length]
+                payload = (int.from_bytes(payload, "big") ^ int.from_bytes(key, "big")).to_bytes(length, "big")
+
+            if frame_opcode >= 0x8: # control frames are never fragmented
+                return frame_opcode, payload
+            if frame_opcode != 0x0:
+                opcode = frame_opcode
+            fragments.append(payload)
+            if final:
+                return opcode, b"".join(fragments)
+
+    def _write_frames(self, outgoing : queue.Queue) -> None:
+
+        while True:
+            frame = outgoing.get()
+            if frame is None:
+                return
+            opcode, payload = frame
+            length = len(payload)
+            if length < 126:
+                header = struct.pack(">BB", 0x80 | opcode, length)
+            elif length < 65536:
+                header = struct.pack(">BBH", 0x80 | opcode, 126, length)
+            else:
+                header = struct.pack(">BBQ", 0x80 | opcode, 127, length)
+            try:
+                self.wfile.write(header + payload)
+                self.wfile.flush()
+            except OSError: # the client went away; the reader notices it too
+                return
+            if opcode == 0x8:
+                return
+
+
+def _command_json(command) -> dict | None:
+    return dataclasses.asdict(command) if command is not None else None
+
+
+# runs Zero without its window: the engine, the model warm-up and the API
+if __name__ == "__main__":
+
+    logging.basicConfig(level=logging.INFO)
+    engine = ZeroEngine()
+    engine.start()
+    server = ZeroAPIServer(engine, port=int(sys.argv[1]) if len(sys.argv) > 1 else ZeroConfig.API_PORT)
+    server.start()
+    print(f"Zero's API is listening on {server.url} (Ctrl+C to stop)")
+
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+        engine.stop()
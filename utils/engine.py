@@ -0,0 +1,544 @@
+from chat.chat import chat, chat_stream
+from chat.client import RequestCancelled
+from chat.config import Config
+from chat.history import ConversationBuffer
+from chat.warmup import model_warmer
+from config.config import ZeroConfig
+from utils.funcs import ZeroCommands
+from utils.pipeline import TurnPipeline, TurnRequest
+from utils.speech import speak
+from utils.structured import CommandCall
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Callable
+import itertools
+import logging
+import sys
+import threading
+import time
+
+
+@dataclass
+class EngineEvent:
+
+    """
+    Published by the engine to the listeners of a session while one of its turns is processed.
+
+    Parameters:
+
+        kind (str) : "thinking" when the turn starts waiting for its answer, "token" for each streamed token,
+                     "answer" once the answer is complete, "idle" once the turn has its answer (or failed), and
+                     "error" when the command of the turn couldn't be executed
+        session (str) : the session of the turn
+        turn_id (int) : the identifier of the turn
+        text (str) : the token, the answer or the error message
+        command (utils.structured.CommandCall) : the command to be executed, with an "answer"
+    """
+
+    kind: str
+    session: str
+    turn_id: int
+    text: str = ""
+    command: CommandCall | None = None
+
+
+@dataclass
+class Session:
+
+    """
+    A conversation with the engine, e.g. the window or a client of the local API.
+
+    Parameters:
+
+        session_id (str) : the identifier of the session
+        history (chat.history.ConversationBuffer) : the conversation kept between the session's turns
+        speak (bool) : whether the session's answers and errors are spoken
+        dispatch (Callable) : receives a callable and runs it where the listeners expect their events (e.g. the Tk thread)
+        listeners (list) : the functions called with every EngineEvent of the session
+    """
+
+    session_id: str
+    history: ConversationBuffer
+    speak: bool = False
+    dispatch: Callable[[Callable], None] = lambda callback: callback()
+    listeners: list = field(default_factory=list)
+
+
+class ZeroEngine:
+
+    """
+    Zero without its window: the turn pipeline, the chat, the commands and the speech. Any number of clients (the
+    Tk window, the REPL, the local HTTP/WebSocket API, benchmarks) talk to it through sessions. Each session keeps
+    its own history, and a new input only supersedes the turn in flight of its own session, while every session
+    shares the bounded pool of turn workers.
+
+    Events are delivered through the session's `dispatch`, so the window receives them on the Tk thread, while the
+    other clients receive them right away, from the worker threads.
+
+    Parameters:
+
+        command_caller (utils.funcs.ZeroCommands) : executes the commands
+        pipeline (utils.pipeline.TurnPipeline) : processes the turns off the clients' threads
+        model_url (str) : the generation endpoint of the chat
+        stream (bool) : whether chat answers are generated token by token
+        answered (int) : number of turns answered
+
+    Public methods:
+
+        start(warm_model) -> None : starts the pipeline and, optionally, the model warm-up
+        stop() -> None : cancels the turns in flight and stops the pipeline
+        open_session(session_id, speak, dispatch) -> str : starts a conversation and returns its identifier
+        close_session(session_id) -> None : cancels the session's turn in flight and forgets the session
+        add_listener(session_id, listener) -> None : registers a function called with every EngineEvent of a session
+        submit(user_input, session_id, command) -> TurnRequest : starts processing an input, superseding the session's turn in flight
+        ask(user_input, session_id, command, timeout) -> EngineEvent | None : processes an input and waits for its answer
+        execute_command(command) -> str | None : executes a command, returning the error message if it failed
+        speak(text, cancel_token) -> None : speaks a text through the speakers of this computer
+        stats() -> dict : returns the turn counters and latencies
+    """
+
+    DEFAULT_SESSION = "default"
+
+    def __init__(self, command_caller : ZeroCommands | None = None, max_workers : int = ZeroConfig.TURN_WORKERS,
+                 model_url : str = Config.API_URL_INSTRUCT, stream : bool = ZeroConfig.STREAM_ANSWERS):
+
+        self.command_caller = command_caller or ZeroCommands()
+        self.pipeline = TurnPipeline(self._process_turn, speak=speak, max_workers=max_workers)
+        self.model_url = model_url
+        self.stream = stream
+        self.answered = 0
+
+        self._sessions = {}
+        self._session_ids = itertools.count(1)
+        self._latencies = deque(maxlen=1000) # seconds from submission to answer of the latest turns
+        self._lock = threading.Lock()
+
+        self.pipeline.add_listener(self._on_pipeline_state)
+
+    def start(self, warm_model : bool = True) -> None:
+
+        """
+        Starts the pipeline and, optionally, the model warm-up, which runs in the background.
+
+        Parameters:
+            warm_model (bool) : whether chat.warmup.model_warmer is started
+
+        Returned value:
+            None
+        """
+
+        self.pipeline.start()
+        if warm_model:
+            model_warmer.start()
+
+    def stop(self) -> None:
+
+        """
+        Cancels the turns in flight and stops the pipeline.
+
+        Parameters:
+            None
+
+        Returned value:
+            None
+        """
+
+        self.pipeline.stop()
+
+    def open_session(self, session_id : str | None = None, speak : bool = False,
+                     dispatch : Callable[[Callable], None] | None = None) -> str:
+
+        """
+        Starts a conversation. Opening a session which already exists keeps its history and listeners.
+
+        Parameters:
+            session_id (str) : the identifier of the session; a new one is generated when None
+            speak (bool) : whether the session's answers are spoken through the speakers of this computer
+            dispatch (Callable) : runs the listeners' calls where they expect them; they're called right away when None
+
+        Returned value:
+            The identifier of the session
+        """
+
+        with self._lock:
+            if session_id is None:
+                session_id = f"session-{next(self._session_ids)}"
+            if session_id not in self._sessions:
+                self._sessions[session_id] = Session(session_id, ConversationBuffer(Config.HISTORY_TOKEN_BUDGET), speak)
+                if dispatch is not None:
+                    self._sessions[session_id].dispatch = dispatch
+        return session_id
+
+    def close_session(self, session_id : str) -> None:
+
+        """
+        Cancels the turn in flight of a session and forgets the session.
+
+        Parameters:
+            session_id (str) : the identifier of the session
+
+        Returned value:
+            None
+        """
+
+        with self._lock:
+            self._sessions.pop(session_id, None)
+        self.pipeline.cancel(session_id)
+
+    def add_listener(self, session_id : str, listener : Callable[[EngineEvent], None]) -> None:
+
+        """
+        Registers a function called with every EngineEvent of a session, through the session's dispatch.
+
+        Parameters:
+            session_id (str) : the identifier of the session
+            listener (Callable) : the function to be called
+
+        Returned value:
+            None
+        """
+
+        self._session(session_id).listeners.append(listener)
+
+    def submit(self, user_input : str, session_id : str = DEFAULT_SESSION, command : bool = False) -> TurnRequest:
+
+        """
+        Starts processing a user input, cancelling the turn in flight of the same session. The session is opened
+        if needed. It returns immediately; the answer arrives as EngineEvents.
+
+        Parameters:
+            user_input (str) : the text sent by the user
+            session_id (str) : the identifier of the session
+            command (bool) : whether the input must be handled as a command (e.g. it followed the wake word)
+
+        Returned value:
+            The new turn
+        """
+
+        session = self._session(session_id)
+        return self.pipeline.submit(user_input, command=command, session=session.session_id, speak=session.speak)
+
+    def ask(self, user_input : str, session_id : str = DEFAULT_SESSION, command : bool = False,
+            timeout : float | None = None) -> EngineEvent | None:
+
+        """
+        Processes a user input and waits for its answer. Meant for the clients which answer one input at a time,
+        like the REPL or an HTTP request; the session's listeners still receive every event.
+
+        Parameters:
+            user_input (str) : the text sent by the user
+            session_id (str) : the identifier of the session
+            command (bool) : whether the input must be handled as a command
+            timeout (float) : maximum seconds to wait; no limit when None
+
+        Returned value:
+            The "answer" event, or None if the turn was superseded, failed or timed out
+        """
+
+        answers = {}
+        idle = set()
+        finished = threading.Event()
+
+        # the turn's identifier is only known once it's submitted, so the events of the session are all kept
+        def on_event(event : EngineEvent):
+            if event.kind == "answer":
+                answers[event.turn_id] = event
+            elif event.kind == "idle": # without an answer before it, the turn failed
+                idle.add(event.turn_id)
+            else:
+                return
+            finished.set()
+
+        session = self._session(session_id)
+        session.listeners.append(on_event)
+        try:
+            turn = self.submit(user_input, session_id, command)
+            turn.cancel_token.add_callback(finished.set)
+
+            deadline = None if timeout is None else time.monotonic() + timeout
+            # waits for the end of the processing rather than for the answer, so asking again right away doesn't
+            # supersede a turn which is only finishing
+            while turn.turn_id not in idle and not turn.cancelled:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    break
+                finished.wait(remaining)
+                finished.clear()
+        finally:
+            session.listeners.remove(on_event)
+
+        return answers.get(turn.turn_id)
+
+    def execute_command(self, command : CommandCall) -> str | None:
+
+        """
+        Executes a command on this computer.
+
+        Parameters:
+            command (utils.structured.CommandCall) : the validated command and its arguments
+
+        Returned value:
+            The message explaining why the command failed, or None if it succeeded
+        """
+
+        arguments = command.arguments
+
+        if command.function == "open_page": # triggers opening web page action
+            self.command_caller.open_page(arguments["page"])
+        elif command.function == "open_app": # triggers opening program action
+            try:
+                self.command_caller.open_app(arguments["name"])
+            except Exception as e:
+                logging.error(f"Error while running open_app(): {str(e)}")
+                return str(e)
+        elif command.function == "close_app": # triggers closing program action
+            try:
+                self.command_caller.close_app(arguments["name"])
+            except Exception as e:
+                logging.error(f"Error while running close_app(): {str(e)}")
+                return str(e)
+        elif command.function == "open_folder": # triggers opening folder action
+            try:
+                self.command_caller.open_folder(arguments["folder_name"])
+            except Exception as e:
+                logging.error(f"Error while running open_folder(): {str(e)}")
+                return str(e)
+        elif command.function == "empty_recycle_bin": # triggers cleaning recycle bin action
+            self.command_caller.empty_recycle_bin()
+        elif command.function == "start_playlist": # triggers playing songs from a playlist action
+            self.command_caller.start_playlist(arguments["playlist"])
+        elif command.function == "stop_playlist": # triggers stopping mixer playlist action
+            self.command_caller.stop_playlist()
+        elif command.function == "play_song": # triggers playing specific song action
+            try:
+                self.command_caller.play_song(arguments["name"], arguments["artist"], playlist=arguments["playlist"])
+            except ValueError as ve:
+                return str(ve)
+            except Exception as e:
+                logging.error(f"Error while running play_song(): {str(e)}")
+                return "Failed to play the song. Please try again."
+
+        return None
+
+    def speak(self, text : str, cancel_token = None) -> None:
+
+        """
+        Speaks a text through the speakers of this computer, blocking until it has been spoken.
+
+        Parameters:
+            text (str) : the text to be spoken
+            cancel_token (chat.client.CancelToken) : stops the speech when cancelled
+
+        Returned value:
+            None
+        """
+
+        speak(text, cancel_token)
+
+    def stats(self) -> dict:
+
+        """
+        Returns the turn counters and latencies.
+
+        Parameters:
+            None
+
+        Returned value:
+            A dictionary with the pipeline counters, the number of open sessions and of answered turns, and the
+            mean and 95th percentile latency from submission to answer of the latest turns, in milliseconds
+        """
+
+        latencies = sorted(self._latencies)
+        return {
+            **self.pipeline.stats(),
+            "sessions": len(self._sessions),
+            "answered": self.answered,
+            "mean_latency_ms": 1000 * sum(latencies) / len(latencies) if latencies else 0.0,
+            "p95_latency_ms": 1000 * latencies[int(0.95 * (len(latencies) - 1))] if latencies else 0.0,
+        }
+
+    # ===================================== private methods ===================================== #
+
+    def _session(self, session_id : str) -> Session:
+
+        session = self._sessions.get(session_id)
+        return session if session is not None else self._sessions[self.open_session(session_id)]
+
+    def _process_turn(self, turn : TurnRequest) -> str:
+
+        # runs in a pipeline worker thread
+        session = self._sessions.get(turn.session)
+        if session is None: # closed while the turn waited for a worker
+            raise RequestCancelled(f"The session '{turn.session}' was closed.")
+
+        if turn.command or turn.user_input.lower().lstrip().startswith("zero,"):
+            answer, command = self.command_caller.activate_command(turn.user_input.lstrip(), turn.cancel_token)
+            self._deliver(session, turn, EngineEvent("answer", session.session_id, turn.turn_id, answer, command))
+            if command is not None and not turn.cancelled:
+                threading.Thread(target=self._run_command, args=(session, turn, command), daemon=True).start()
+        elif self.stream: # tokens are delivered as soon as they are generated
+            tokens = []
+            for token in chat_stream(turn.user_input, self.model_url, chat_history=session.history, cancel_token=turn.cancel_token):
+                tokens.append(token)
+                self._deliver(session, turn, EngineEvent("token", session.session_id, turn.turn_id, token))
+            answer = "".join(tokens)
+            self._deliver(session, turn, EngineEvent("answer", session.session_id, turn.turn_id, answer))
+        else: # Hugging Face bot is called when no command is sent
+            answer = chat(turn.user_input, self.model_url, chat_history=session.history, cancel_token=turn.cancel_token)
+            self._deliver(session, turn, EngineEvent("answer", session.session_id, turn.turn_id, answer))
+
+        with self._lock:
+            self.answered += 1
+            self._latencies.append(time.monotonic() - turn.submitted_at)
+
+        return answer
+
+    def _run_command(self, session : Session, turn : TurnRequest, command : CommandCall) -> None:
+
+        message = self.execute_command(command)
+        if message is not None:
+            self._deliver(session, turn, EngineEvent("error", session.session_id, turn.turn_id, message), cancellable=False)
+            if session.speak:
+                self.speak(message)
+
+    def _on_pipeline_state(self, turn : TurnRequest, state : str) -> None:
+
+        session = self._sessions.get(turn.session)
+        if session is not None:
+            kind = "thinking" if state == TurnPipeline.THINKING else "idle"
+            self._deliver(session, turn, EngineEvent(kind, session.session_id, turn.turn_id), cancellable=kind == "thinking")
+
+    def _deliver(self, session : Session, turn : TurnRequest, event : EngineEvent, cancellable : bool = True) -> None:
+
+        # checked where the listeners run, so an event of a superseded turn never reaches them
+        def publish():
+            if cancellable and turn.cancelled:
+                return
+            for listener in list(session.listeners):
+                try:
+                    listener(event)
+                except Exception as e:
+                    logging.error(f"Engine listener failed: {e}")
+
+        session.dispatch(publish)
+
+
+def run_repl(engine : ZeroEngine, speak : bool = False) -> None:
+
+    """
+    Chats with Zero in the terminal, printing the answers as they're generated. Inputs starting with "zero," are
+    handled as commands; "goodbye", "bye", "exit" or "quit" ends the session.
+
+    Parameters:
+        engine (ZeroEngine) : the engine, already started
+        speak (bool) : whether the answers are also spoken
+
+    Returned value:
+        None
+    """
+
+    session_id = engine.open_session("repl", speak=speak)
+    streamed = []
+
+    def on_event(event : EngineEvent):
+        if event.kind == "token":
+            print(event.text.lstrip() if not streamed else event.text, end="", flush=True)
+            streamed.append(event.text)
+        elif event.kind == "error":
+            print(f"Zero: {event.text}")
+
+    engine.add_listener(session_id, on_event)
+
+    # the model loads in the background, polled with backoff, instead of sleeping for the whole estimated time
+    print("Loading the model...")
+    if not model_warmer.wait_until_ready():
+        print(f"The model isn't ready ({model_warmer.state}); the answers may fail until it is.")
+
+    while True:
+        try:
+            user_input = input("User: ").strip()
+        except (EOFError, KeyboardInterrupt):
+            print()
+            break
+        if user_input.lower() in ["goodbye", "bye", "exit", "quit"]:
+            break
+        if not user_input:
+            continue
+
+        streamed.clear()
+        print("Zero: ", end="", flush=True)
+        answer = engine.ask(user_input, session_id)
+        if answer is None:
+            print("(no answer)")
+        elif streamed:
+            print()
+        else:
+            print(answer.text.strip())
+
+    engine.close_session(session_id)
+
+
+def benchmark(sessions : int = 8, turns : int = 5, max_workers : int = ZeroConfig.TURN_WORKERS,
+              model_url : str | None = None) -> dict:
+
+    """
+    Measures the throughput of the engine: `sessions` clients each ask `turns` questions one after the other, all
+    clients at once. Without a model URL, the turns are answered by the local stand-in of chat.sse_server, so only
+    the engine itself is measured.
+
+    Parameters:
+        sessions (int) : number of concurrent sessions
+        turns (int) : number of questions asked by each session
+        max_workers (int) : number of turn workers of the engine
+        model_url (str) : the generation endpoint; a local stand-in is started when None
+
+    Returned value:
+        A dictionary with the number of turns answered, the wall time in seconds, the throughput in turns per
+        second, and the engine stats
+    """
+
+    server = None
+    if model_url is None:
+        from chat.sse_server import start_server
+        server = start_server(token_delay=0.01)
+        model_url = f"http://127.0.0.1:{server.server_port}/"
+
+    engine = ZeroEngine(max_workers=max_workers, model_url=model_url)
+    engine.start(warm_model=False)
+
+    answered = []
+    def client(index : int):
+        session_id = engine.open_session()
+        for turn in range(turns):
+            if engine.ask(f"Question {turn} of client {index}", session_id, timeout=60) is not None:
+                answered.append(1)
+        engine.close_session(session_id)
+
+    start = time.perf_counter()
+    clients = [threading.Thread(target=client, args=(index,)) for index in range(sessions)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    stats = engine.stats()
+    engine.stop()
+    if server is not None:
+        server.shutdown()
+
+    return {"answered": len(answered), "wall_s": elapsed, "turns_per_s": len(answered) / elapsed, "engine": stats}
+
+
+# chats with Zero in the terminal (--speak also speaks the answers), or measures the engine's throughput with
+# --benchmark [sessions] [turns] [workers]
+if __name__ == "__main__":
+
+    if "--benchmark" in sys.argv:
+        arguments = [int(arg) for arg in sys.argv[sys.argv.index("--benchmark") + 1:]]
+        print(benchmark(*arguments))
+    else:
+        zero = ZeroEngine()
+        zero.start()
+        run_repl(zero, speak="--speak" in sys.argv)
+        zero.stop()
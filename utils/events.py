@@ -0,0 +1,134 @@
+from collections import defaultdict
+from typing import Callable
+import logging
+import queue
+import threading
+import time
+
+
+class EventBus:
+
+    """
+    Thread-safe message bus between the input sources (text box, speech recognition), the turn pipeline, the
+    command executor and the UI. Any thread may publish an event; the handlers run on the thread which drains
+    the bus, i.e. the Tk thread in the GUI.
+
+    Publishing calls `wake` once per batch of events, so the consumer is woken up right away instead of polling
+    (the GUI generates a virtual Tk event). Events published while a wake-up is pending are drained with it.
+
+    Parameters:
+
+        wake (Callable) : called without arguments when events are waiting to be drained; None relies on polling
+        dispatched (int) : number of events handled
+        max_latency (float) : longest time an event waited between publish() and its handlers, in seconds
+
+    Public methods:
+
+        subscribe(topic, handler) -> None : registers a function called with the arguments of every event of a topic
+        publish(topic, *args) -> None : queues an event and wakes the consumer
+        drain() -> int : runs the handlers of every queued event
+        stats() -> dict : returns the dispatch counters and latency
+    """
+
+    def __init__(self, wake : Callable[[], None] | None = None):
+
+        self.wake = wake
+
+        self.dispatched = 0
+        self.max_latency = 0.0
+
+        self._events = queue.SimpleQueue()
+        self._handlers = defaultdict(list)
+        self._wake_pending = threading.Event()
+        self._total_latency = 0.0
+
+    def subscribe(self, topic : str, handler : Callable) -> None:
+
+        """
+        Registers a function called with the arguments of every event of a topic.
+
+        Parameters:
+            topic (str) : the name of the events
+            handler (Callable) : the function to be called
+
+        Returned value:
+            None
+        """
+
+        self._handlers[topic].append(handler)
+
+    def publish(self, topic : str, *args) -> None:
+
+        """
+        Queues an event and wakes the consumer up, unless a wake-up is already pending.
+
+        Parameters:
+            topic (str) : the name of the event
+            *args : the arguments passed to the handlers
+
+        Returned value:
+            None
+        """
+
+        self._events.put((topic, args, time.perf_counter()))
+
+        if self.wake is not None and not self._wake_pending.is_set():
+            self._wake_pending.set()
+            try:
+                self.wake()
+            except Exception as e: # e.g. the window is closing; the next drain still runs the event
+                self._wake_pending.clear()
+                logging.debug(f"Couldn't wake the event consumer up: {e}")
+
+    def drain(self) -> int:
+
+        """
+        Runs the handlers of every queued event, in the order they were published.
+
+        Parameters:
+            None
+
+        Returned value:
+            The number of events handled
+        """
+
+        # cleared first, so an event published while draining wakes the consumer up again
+        self._wake_pending.clear()
+
+        handled = 0
+        while True:
+            try:
+                topic, args, published_at = self._events.get_nowait()
+            except queue.Empty:
+                return handled
+
+            latency = time.perf_counter() - published_at
+            self._total_latency += latency
+            self.max_latency = max(self.max_latency, latency)
+            self.dispatched += 1
+            handled += 1
+
+            for handler in self._handlers.get(topic, []):
+                try:
+                    handler(*args)
+                except Exception as e:
+                    logging.error(f"Error while handling the '{topic}' event: {e}")
+
+    def stats(self) -> dict:
+
+        """
+        Returns the dispatch counters.
+
+        Parameters:
+            None
+
+        Returned value:
+            A dictionary with the number of events handled and their mean and maximum latency (from publish() to
+            the handlers) in milliseconds
+        """
+
+        return {
+            "dispatched": self.dispatched,
+            "mean_latency_ms": 1000 * self._total_latency / self.dispatched if self.dispatched else 0.0,
+            "max_latency_ms": 1000 * self.max_latency,
+        }
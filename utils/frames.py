@@ -0,0 +1,275 @@
+from PIL import Image, ImageSequence, ImageTk
+from config.config import ZeroConfig
+from collections.abc import Sequence
+import glob
+import hashlib
+import json
+import mmap
+import os
+import struct
+import subprocess
+import sys
+import time
+
+
+class AnimationFrames(Sequence):
+
+    """
+    The frames of an animation, read from a memory-mapped frame cache. A frame is only turned into a Tk image the
+    first time it's shown, so opening an animation costs no decoding at all, and the pixels stay in the page
+    cache rather than in the process' own memory. Tk keeps its own copy of a frame once it has been shown, so after
+    the first cycle of an animation the memory is the same as decoding it up front, plus the reclaimable mapped
+    pages.
+
+    Parameters:
+
+        size (tuple) : width and height of the frames
+        durations (list) : the duration of each frame, in milliseconds
+
+    Public methods:
+
+        image(index) -> PIL.Image.Image : returns a frame as a PIL image, without copying its pixels
+        close() -> None : unmaps the cache file
+    """
+
+    def __init__(self, buffer : mmap.mmap, offset : int, size : tuple[int, int], durations : list[int]):
+
+        self.size = size
+        self.durations = durations
+
+        self._buffer = buffer
+        self._offset = offset
+        self._photos = [None] * len(durations)
+
+    def __len__(self) -> int:
+        return len(self.durations)
+
+    def __getitem__(self, index : int) -> ImageTk.PhotoImage:
+
+        # needs the Tk root window, like any PhotoImage
+        if self._photos[index] is None:
+            self._photos[index] = ImageTk.PhotoImage(self.image(index))
+        return self._photos[index]
+
+    def image(self, index : int) -> Image.Image:
+
+        """
+        Returns a frame as a PIL image backed by the cache file.
+
+        Parameters:
+            index (int) : the index of the frame
+
+        Returned value:
+            The RGBA image
+        """
+
+        frame_bytes = self.size[0] * self.size[1] * 4
+        start = self._offset + (index % len(self)) * frame_bytes
+        return Image.frombuffer("RGBA", self.size, memoryview(self._buffer)[start:start + frame_bytes], "raw", "RGBA", 0, 1)
+
+    def close(self) -> None:
+
+        """
+        Unmaps the cache file. The frames already converted to Tk images stay usable.
+
+        Parameters:
+            None
+
+        Returned value:
+            None
+        """
+
+        self._buffer.close()
+
+
+class GIFFrameCache:
+
+    """
+    Keeps the decoded frames of the animated GIFs on disk, so they're only decoded by PIL once. Each GIF is stored
+    as RGBA frames plus their own durations in a file named after the hash of the GIF, which is memory-mapped on
+    later startups; editing the GIF simply produces a new cache file.
+
+    File layout: a header (magic, width, height, number of frames), the duration of each frame in milliseconds,
+    then the raw RGBA pixels of each frame.
+
+    Parameters:
+
+        path (str) : directory of the cache files
+        hits (int) : number of animations loaded from the cache
+        misses (int) : number of animations which had to be decoded
+
+    Public methods:
+
+        load(gif_path) -> AnimationFrames : returns the frames of a GIF, decoding it first if it isn't cached
+    """
+
+    MAGIC = b"ZGIF"
+    HEADER = struct.Struct("<4sIII")
+
+    def __init__(self, path : str = ZeroConfig.GIF_CACHE_PATH):
+
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, gif_path : str) -> AnimationFrames:
+
+        """
+        Returns the frames of a GIF, decoding it into the cache first if needed.
+
+        Parameters:
+            gif_path (str) : path to the animated GIF
+
+        Returned value:
+            The animation frames, memory-mapped from the cache file
+        """
+
+        with open(gif_path, "rb") as file:
+            digest = hashlib.sha256(file.read()).hexdigest()[:16]
+
+        stem = os.path.splitext(os.path.basename(gif_path))[0]
+        cache_path = os.path.join(self.path, f"{stem}-{digest}.frames")
+
+        if os.path.exists(cache_path):
+            self.hits += 1
+        else:
+            self.misses += 1
+            self._build(gif_path, stem, cache_path)
+
+        with open(cache_path, "rb") as file:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, width, height, count = self.HEADER.unpack_from(buffer, 0)
+        if magic != self.MAGIC:
+            buffer.close()
+            os.remove(cache_path)
+            return self.load(gif_path)
+
+        durations = list(struct.unpack_from(f"<{count}I", buffer, self.HEADER.size))
+        return AnimationFrames(buffer, self.HEADER.size + 4 * count, (width, height), durations)
+
+    # ===================================== private methods ===================================== #
+
+    def _build(self, gif_path : str, stem : str, cache_path : str) -> None:
+
+        os.makedirs(self.path, exist_ok=True)
+
+        with Image.open(gif_path) as gif:
+            durations = []
+            pixels = []
+            for frame in ImageSequence.Iterator(gif):
+                durations.append(frame.info.get("duration", 100) or 100) # each frame has its own duration
+                pixels.append(frame.convert("RGBA").tobytes())
+            width, height = gif.size
+
+        # written aside, then renamed, so an interrupted build never leaves a truncated cache behind
+        temporary_path = cache_path + ".tmp"
+        with open(temporary_path, "wb") as file:
+            file.write(self.HEADER.pack(self.MAGIC, width, height, len(durations)))
+            file.write(struct.pack(f"<{len(durations)}I", *durations))
+            for frame_pixels in pixels:
+                file.write(frame_pixels)
+        os.replace(temporary_path, cache_path)
+
+        # the frames of a previous version of the GIF are stale
+        for stale_path in glob.glob(os.path.join(self.path, f"{stem}-*.frames")):
+            if stale_path != cache_path:
+                try:
+                    os.remove(stale_path)
+                except OSError: # e.g. still mapped by another instance on Windows
+                    pass
+
+
+gif_frame_cache = GIFFrameCache()
+
+
+def _resident_memory() -> tuple[int, int] | None:
+
+    # resident set size of the process and the part of it backed by files (e.g. mapped frame caches), which the
+    # system can reclaim, in bytes; only available where /proc is (Linux)
+    try:
+        with open("/proc/self/statm") as file:
+            pages = file.read().split()
+        return int(pages[1]) * os.sysconf("SC_PAGE_SIZE"), int(pages[2]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _measure(strategy : str, gif_paths : list[str]) -> dict:
+
+    # loads the animations the way the GUI does at startup: every frame decoded and converted to a Tk image up
+    # front (decode, as before the frame cache), or the cache mapped and only the first frame read (cache). Then
+    # shows every frame once, like one full cycle of both animations, which converts the cached frames on the Tk
+    # thread, and measures the memory in that steady state. Without a display, a retained RGBA copy of each frame
+    # stands in for Tk's own copy of it (Tk keeps 4 bytes per pixel as well)
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+        root.withdraw()
+    except Exception:
+        root = None
+
+    def tk_image(image : Image.Image):
+        return ImageTk.PhotoImage(image) if root is not None else image.convert("RGBA")
+
+    memory_before = _resident_memory()
+    start = time.perf_counter()
+
+    animations = []
+    for gif_path in gif_paths:
+        if strategy == "decode":
+            with Image.open(gif_path) as gif:
+                animations.append([tk_image(frame.copy()) for frame in ImageSequence.Iterator(gif)])
+        else:
+            animation = gif_frame_cache.load(gif_path)
+            animation.image(0).load()
+            animations.append(animation)
+
+    startup = time.perf_counter() - start
+    memory_startup = _resident_memory()
+
+    start = time.perf_counter()
+    shown = []
+    for animation in animations:
+        for index in range(len(animation)):
+            if isinstance(animation, list) or root is not None:
+                shown.append(animation[index])
+            else:
+                shown.append(tk_image(animation.image(index)))
+    first_cycle = time.perf_counter() - start
+    memory_steady = _resident_memory()
+
+    if root is not None:
+        root.destroy()
+
+    def grown(memory : tuple[int, int] | None, part : int) -> float | None:
+        return (memory[part] - memory_before[part]) / 2 ** 20 if memory_before is not None else None
+
+    return {
+        "startup_ms": 1000 * startup,
+        "startup_resident_mb": grown(memory_startup, 0),
+        "first_cycle_ms": 1000 * first_cycle,
+        "steady_resident_mb": grown(memory_steady, 0),
+        "steady_file_backed_mb": grown(memory_steady, 1),
+        "tk_images": root is not None,
+    }
+
+
+# compares decoding the GIFs against loading them from the frame cache, at startup and after one full cycle of both
+# animations. Each measurement runs in a fresh interpreter, so the resident memory isn't skewed by the previous one
+if __name__ == "__main__":
+
+    if len(sys.argv) > 2 and sys.argv[1] == "--measure":
+        print(json.dumps(_measure(sys.argv[2], [ZeroConfig.INACTIVE_GIF_PATH, ZeroConfig.ACTIVE_GIF_PATH])))
+        sys.exit(0)
+
+    def measure(strategy : str) -> dict:
+        output = subprocess.run([sys.executable, "-m", "utils.frames", "--measure", strategy],
+                                capture_output=True, text=True, check=True).stdout
+        return json.loads(output)
+
+    for gif_path in [ZeroConfig.INACTIVE_GIF_PATH, ZeroConfig.ACTIVE_GIF_PATH]:
+        gif_frame_cache.load(gif_path).close() # builds the cache files if needed
+
+    print(f"decoding every frame: {measure('decode')}")
+    print(f"frame cache: {measure('cache')}")
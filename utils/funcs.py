@@ -3,17 +3,21 @@ import re
 import winshell
 import subprocess
 from datetime import datetime, timedelta, timezone
-from pygame import mixer
 from mutagen.id3 import ID3
 from mutagen.flac import FLAC
 import os
 from chat.config import Config
-from utils.startup import start_calendar_service
-from data.settings import load_secure_json
+from config.config import ZeroConfig
+from chat.client import inference_client, CancelToken, InferenceError
+from chat.retry import inference_retry
+from utils.startup import calendar_service
+from utils.lazy import LazyModule
+from utils.intent import IntentRouter
+from utils.structured import build_command_prompt, parse_command, CommandCall, CommandSchemaError
+from data.settings import load_settings
 from dotenv import load_dotenv
-from googleapiclient.errors import HttpError
+from requests import RequestException
 import warnings
-import requests
 import json
 from types import NoneType
 from typing import Union
@@ -23,22 +27,45 @@ warnings.filterwarnings("ignore")
 # Load environment variables
 load_dotenv()
 
-data = load_secure_json("data/settings.data")["system_settings"]
+data = load_settings("system_settings") # shares the decryption done for chat.config
 
 WEB_PAGE_LIST = data["directly_accessed_links"]
 APP_LIST = data["standard_program_paths"]
 PROCESS_LIST = data["windows_default_processes"]
 FOLDER_LIST = data["windows_default_folders"]
 MUSIC_DIRECTORY = data["default_music_directory"]
-
-GOOGLE_CALENDAR_SERVICE = start_calendar_service()
+INTENT_EXAMPLES_PATH = "data/intents/examples.json"
+
+# fixed acknowledgements of activate_command; their speech is cached at startup
+COMMAND_MESSAGES = {
+    "open_page": "Right, I'm opening the page right now. If it doesn't show up, it either means the page doesn't exist or that it can't be reached.",
+    "open_app": "Opening program...",
+    "close_app": "Closing program...",
+    "open_folder": "Opening folder...",
+    "empty_recycle_bin": "Okay, I'm cleaning up the recycle bin right now. It might take a few minutes, so please be patient.",
+    "stop_playlist": "Playlist stopped.",
+    "start_playlist": "Starting playlist...",
+    "play_song": "Playing selected song...",
+}
+UNKNOWN_COMMAND_MESSAGE = "Sorry, but I cannot execute this command."
+CALENDAR_UNAVAILABLE_MESSAGE = "Sorry, I couldn't connect to your Google Calendar. Please try again later."
+
+# imported on first use, so importing this module doesn't load pygame nor the Google client libraries
+mixer = LazyModule("pygame.mixer")
+googleapiclient_errors = LazyModule("googleapiclient.errors")
 
 class ZeroCommands:
 
   def __init__(self):
-     
-    self.headers = {"Authorization": f"Bearer {Config.HUGGINGFACE_INFERENCE_TOKEN}"}
+
     self.song_info = (None, None)
+    self.intent_router = IntentRouter.from_fixture(INTENT_EXAMPLES_PATH, {
+        "pages": list(WEB_PAGE_LIST.keys()),
+        "apps": list(APP_LIST.keys()),
+        "processes": list(PROCESS_LIST.keys()),
+        "folders": list(FOLDER_LIST.keys()),
+        "playlists": list(data.get("playlist_directories", {}).keys()),
+    })
 
   def open_page(self, user_input : str, webpage_list : dict[str, str] = WEB_PAGE_LIST) -> None:
 
@@ -47,7 +74,7 @@ class ZeroCommands:
 
       Parameters:
 
-      user_input : The user input containing the page to visit
+      user_input : The page to visit, or a text containing it
 
       Returned value:
       None
@@ -150,11 +177,10 @@ class ZeroCommands:
       None
       """
 
-      if "default" in source or "(playlist)" in source:
+      if source in ["default", "playlist", ""]:
         playlist_source = MUSIC_DIRECTORY
       else:
-        ref_name = (re.findall(r"\((.*?)\)", source)[-1])
-        playlist_source = data["playlist_directories"][ref_name]
+        playlist_source = data["playlist_directories"][source]
 
       playlist = [song for song in os.listdir(playlist_source) if song.endswith("mp3") or song.endswith("flac")]
       mixer.init()
@@ -186,8 +212,8 @@ class ZeroCommands:
       None
       """
 
+      # the mixer also plays Zero's voice, so it's left initialised
       mixer.music.stop()
-      mixer.quit()
 
   def play_song(self, name : str, artist : str, playlist : str = "default") -> None:
       """
@@ -323,72 +349,38 @@ class ZeroCommands:
       
       return message
 
-    except HttpError as error:
+    except googleapiclient_errors.HttpError as error:
       print(f"An error occurred: {error}")
       return "Could not retrieve events. Please try again later."
     except ValueError as error:
       print(f"An error occurred: {error}")
       return "Sorry, I couldn't understand. Please say it again."
 
-  def _get_event_info(self, content: str) -> dict:
+  def _get_event_info(self, command: CommandCall) -> dict:
     """
-    Auxiliary function to set_new_event. It gets the arguments identified by the AI and convert them to a structured
+    Auxiliary function to set_new_event. It converts the typed arguments extracted by the AI to a structured
     format to be sent to a Google Calendar API request.
 
     Parameters:
-      content (str): the arguments identified by the AI. It always assumes the following format:
-        (arg1, arg2, arg3, arg4)
+      command (CommandCall): the validated set_new_event command, whose arguments are the event name, its
+        start date (datetime), and its duration and reminder (in minutes)
       
     Returns
       dict: a dictionary containing the structured info to be sent to API request
     """
 
-
-
     try:
-      filtered_content = (re.findall(r"\((.*?)\)", content)[-1]).split("\",")
-      if len(filtered_content) != 4:
+      arguments = command.arguments
+      if not isinstance(arguments.get("start_date"), datetime):
         raise ValueError("Not enough amount of information was retrieved.")
-      filtered_content = [item.replace('"', "") for item in filtered_content]
-      
-      # get starting date
-      prompt = f"""<|im_start|>system
-      You are an AI assistant. Your task is to get a date in the format
-      "YYYY-mm-dd HH:MM:SS" which satisfies the user input, having as reference the following date:
-      {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}<|im_end|>
-      <|im_start|>user
-      {filtered_content[1].strip()}<|im_end|>
-      <|im_start|>assistant
-      """
 
-      payload = {
-          "inputs" : prompt
-      }
-      
-      response = requests.post(Config.API_URL_INSTRUCT, headers=self.headers, json=payload, verify=False)
-      if response.status_code == 200:
-          bot_output = response.json()[0]['generated_text'].split("<|im_start|>assistant")[-1]
-          starting_date = re.findall(r"[0-9]{4}-[0-9]{2}-[0-9]{2}\s[0-9]{2}:[0-9]{2}:[0-9]{2}", bot_output)[-1]
-          starting_date = datetime.strptime(starting_date, "%Y-%m-%d %H:%M:%S")
-      # get end date
-
-      if "minute" in filtered_content[2]:
-        timestamp = 1 if "a" in filtered_content[2] else int(''.join(re.findall(r'\d', filtered_content[2])))
-      elif "hour" in filtered_content[2]:
-        timestamp = 1 if "an" in filtered_content[2] else 60 * int(''.join(re.findall(r'\d', filtered_content[2])))
-      
-      end_date = (starting_date + timedelta(minutes=timestamp)).isoformat()
+      starting_date = arguments["start_date"]
+      end_date = (starting_date + timedelta(minutes=arguments["duration"])).isoformat()
       starting_date = starting_date.isoformat()
-      
-      # get reminder
-
-      if "minute" in filtered_content[-1]:
-        timestamp = 1 if "a" in filtered_content[-1] else int(''.join(re.findall(r'\d', filtered_content[-1])))
-      elif "hour" in filtered_content[-1]:
-        timestamp = 1 if "an" in filtered_content[-1] else 60 * int(''.join(re.findall(r'\d', filtered_content[-1])))
+      timestamp = arguments["reminder"]
 
       return {
-          'summary': filtered_content[0].strip(),
+          'summary': arguments["name"],
           'location': 'Unknown',
           'description': 'Event generated through Google Calendar API',
           'start': {
@@ -417,6 +409,19 @@ class ZeroCommands:
       print(str(e))
       return {"error": "Unexpected error caught. Please try again later."}
 
+  def _get_calendar_service(self):
+    """
+    Auxiliary function to the calendar commands. The service is created on its first use (or prefetched at
+    startup), so a missing token or an unreachable API is only reported when a calendar command is given.
+
+    """
+
+    try:
+      return calendar_service.get(timeout=ZeroConfig.CALENDAR_WAIT_TIMEOUT)
+    except Exception as e:
+      print(f"Couldn't start the Google Calendar service: {e}")
+      return None
+
   def set_new_event(self, service, event_info:dict) -> str:
 
     """
@@ -439,92 +444,69 @@ class ZeroCommands:
       print(f"Event created: {event.get('htmlLink')}")
       return "A new event was added to your Google Calendar successfully."
 
-    except HttpError as error:
+    except googleapiclient_errors.HttpError as error:
       print(f"An error occurred: {error}")
       return "Could not create event. Please try again later."
 
 
-  def activate_command(self, user_input : str) -> tuple[str, str]:
+  def activate_command(self, user_input : str, cancel_token : CancelToken | None = None) -> tuple[str, CommandCall | None]:
 
       """
-      Triggers one of the predefined commands in Zero Assistant.
+      Triggers one of the predefined commands in Zero Assistant. The command and its typed arguments are either
+      decided locally or extracted by the AI in a single generation.
 
       Parameters:
 
       user_input : The given user input
+      cancel_token : token which aborts the requests when the turn is superseded
 
       Returned value:
-      A tuple of the format (str, str), containing both bot answer and command type to start a specific action
+      A tuple of the format (str, CommandCall), containing both bot answer and the command to start a specific
+      action (None if no command was understood)
       """
 
-      # sub functions
-
-      prompt = f"""<|im_start|>system
-      You are an AI assistant. Analyze the user's input and determine which function to call: 
-      - "open_page(page)" to open a web page.
-      - "open_app(name)" to open a program.
-      - "close_app(name)" to close a program.
-      - "open_folder(folder_name)" to open a folder.
-      - "empty_recycle_bin()" to clear the recycle bin.
-      - "get_current_time()" to get the current time and date.
-      - "get_next_events(period, number_of_events)" to get the next events in the calendar over a period of time.
-      - "set_new_event(name, start_date, duration, reminder)" to set a new task, as well as its start date, duration and reminder.
-      - "stop_playlist()" to stop current playlist.
-      - "start_playlist(playlist)" to start a playlist.
-      - "play_song(name, artist, playlist)" to find a song in a playlist by its name and artist and play it.
-      - "get_song_info()" to get the info of song being played.<|im_end|>
-      <|im_start|>user
-      {user_input}<|im_end|>
-      <|im_start|>assistant
-      """
-      bot_output = ""
+      # commands which can be decided locally skip the language model
+      command = self.intent_router.route(user_input)
 
-      headers = {"Authorization": f"Bearer {Config.HUGGINGFACE_INFERENCE_TOKEN}"}
+      if command is None:
 
-      payload = {
-          "inputs" : prompt
-      }
+        # the command is a short JSON object, so the generation is greedy and bounded
+        payload = {
+            "inputs" : build_command_prompt(user_input),
+            "parameters" : Config.GENERATION_PROFILES["classify"]
+        }
 
-      response = requests.post(Config.API_URL_INSTRUCT, headers=headers, json=payload, verify=False)
-      if response.status_code == 200:
-          bot_output = response.json()[0]['generated_text'].split("<|im_start|>assistant")[-1]
+        try:
+            bot_output = inference_retry.call(lambda: inference_client.generate(payload, cancel_token=cancel_token),
+                                              cancel_token)
+            command = parse_command(bot_output)
+        except (InferenceError, RequestException) as ie:
+            print(f"Error while classifying the command: {ie}")
+        except CommandSchemaError as cse:
+            print(f"Invalid command returned by the model: {cse}")
 
       message = ""
-      command = bot_output
-
-      if "open_page" in bot_output:
-          message = "Right, I'm opening the page right now. If it doesn't show up, it either means the page doesn't exist or that it can't be reached."
-      elif "open_app" in bot_output:
-          message = "Opening program..."
-      elif "close_app" in bot_output:
-          message = "Closing program..."
-      elif "open_folder" in bot_output:
-          message = "Opening folder..."
-      elif "empty_recycle_bin" in bot_output:
-          message = "Okay, I'm cleaning up the recycle bin right now. It might take a few minutes, so please be patient."
-      elif "get_current_time" in bot_output:
+      function = command.function if command is not None else ""
+
+      if function in COMMAND_MESSAGES:
+          message = COMMAND_MESSAGES[function]
+      elif function == "get_current_time":
           current_time = datetime.today().strftime("%H:%M:%S")
           current_date = datetime.today().strftime("%d-%m-%Y")
           message = f"It's {current_time} of the day {current_date}"
-      elif "get_next_events" in bot_output:
-          freq = "week" if "week" in bot_output else "day"
-          top = ''.join(re.findall(r'\d', bot_output))
-          top = int(top) if len(top) >= 1 else None
-          message = self.get_next_events(GOOGLE_CALENDAR_SERVICE, freq=freq, top=top)
-      elif "set_new_event" in bot_output:
-          event_info = self._get_event_info(bot_output)
-          message = self.set_new_event(GOOGLE_CALENDAR_SERVICE, event_info)
-      elif "stop_playlist" in bot_output:
-          message = "Playlist stopped."
-      elif "start_playlist" in bot_output:
-          message = "Starting playlist..."
-      elif "play_song" in bot_output:
-          message = "Playing selected song..."
-      elif "get_song_info" in bot_output:
+      elif function == "get_next_events":
+          service = self._get_calendar_service()
+          message = CALENDAR_UNAVAILABLE_MESSAGE if service is None else \
+                    self.get_next_events(service, freq=command.arguments["period"], top=command.arguments["number_of_events"])
+      elif function == "set_new_event":
+          event_info = self._get_event_info(command)
+          service = self._get_calendar_service()
+          message = CALENDAR_UNAVAILABLE_MESSAGE if service is None else self.set_new_event(service, event_info)
+      elif function == "get_song_info":
           message = self.get_song_info()
       else:
-          message = "Sorry, but I cannot execute this command."
+          message = UNKNOWN_COMMAND_MESSAGE
 
-      print("Message:", message)
+      print("Message:", message, "| Command:", command)
       
-      return message, command
\ No newline at end of file
+      return message, command
@@ -0,0 +1,450 @@
+from utils.structured import COMMAND_SCHEMA, CommandCall
+from collections import Counter
+import json
+import math
+import re
+import sys
+import time
+
+FUNCTION_NAMES = list(COMMAND_SCHEMA)
+
+# functions whose arguments are free text (titles, dates, durations); they are always left to the language model
+LLM_ONLY_FUNCTIONS = ["set_new_event", "play_song"]
+
+# high-confidence keyword rules; a rule only routes an input when no other rule matches it
+INTENT_RULES = {
+    "get_current_time": r"\b(what time is it|what time it is|what's the time|what is the time|current time|tell me the time|what day is (it|today)|today's date|what's the date|what is the date)\b",
+    "empty_recycle_bin": r"\b(empty|clear|clean|wipe)\b.*\b(recycle bin|recycling bin|trash)\b",
+    "stop_playlist": r"\b(stop|pause|turn off)\b.*\b(music|playlist|songs?|playing)\b",
+    "get_song_info": r"\b(what|which)\b.*\b(song|track|music)\b.*\b(playing|this|on)\b|\bwho sings\b",
+    "start_playlist": r"\b(start|play|put on|shuffle)\b.*\b(playlist|music|songs)\b",
+    "get_next_events": r"\b(events?|calendar|agenda|schedule|appointments?|meetings?)\b",
+    "set_new_event": r"\b(add|create|set|schedule|remind me|new)\b.*\b(events?|meetings?|reminder|appointments?|tasks?)\b|\bremind me\b",
+    "play_song": r"\bplay\b.*\bby\b",
+    "open": r"^(open|launch|start|run|go to|take me to|bring up|pull up|fire up|show me)\b\s*(the\s+)?(?P<target>.+)$",
+    "close": r"^(close|quit|exit|kill|shut down|stop)\b\s*(the\s+)?(?P<target>.+)$",
+}
+
+# the fast path never answers a negated command ("don't open youtube"); the language model reads it whole
+NEGATION = re.compile(r"\b(not|no|never|don't|dont|doesn't|won't|shouldn't|can't|cannot)\b")
+
+# the commands only know the current day and week, so other days ("is there any meeting tomorrow", "what day is it
+# on monday") are left to the language model
+RELATIVE_DAY = re.compile(r"\b(tomorrow|yesterday|tonight|weekend|monday|tuesday|wednesday|thursday|friday|saturday|sunday|"
+                          r"(next|last|previous|coming|following) (week|month|year|days?)|in \w+ (days|weeks))\b")
+
+# asking the time of something else ("what time does the meeting start") isn't asking the current time
+TIME_OF_SOMETHING = re.compile(r"\bwhat time (do|does|did|will|would|should|was|are|is (?!it\b))")
+
+# what the questions are about; a question about one intent which also mentions another one's entities is left to
+# the language model ("what time is my meeting")
+QUESTION = re.compile(r"^(what|what's|which|who|when|where|how|is|are|do|does|did|can|could|will)\b")
+QUESTION_ENTITIES = {
+    "get_current_time": re.compile(r"\b(time|date|clock)\b"),
+    "get_next_events": re.compile(r"\b(events?|meetings?|calendar|agenda|schedule|appointments?)\b"),
+    "get_song_info": re.compile(r"\b(songs?|music|tracks?|playlists?|album)\b"),
+}
+
+# polite words around a target, which can be left out of it ("can you open the calculator for me")
+POLITE_PREFIX = re.compile(r"^((please|can you|could you|would you|will you|kindly)\s+)+")
+TARGET_FILLERS = {"the", "my", "a", "an", "please", "for", "me", "now", "up", "in", "on", "app", "application",
+                  "program", "page", "website", "site", "web", "browser", "folder", "directory"}
+
+_WORD = re.compile(r"[a-z0-9']+")
+
+
+def normalise(text : str) -> str:
+
+    """
+    Lowercases a command and removes the "zero," prefix and punctuation at its ends.
+
+    Parameters:
+
+    text : the command typed or said by the user
+
+    Returned value:
+    The normalised command
+    """
+
+    text = text.lower().strip()
+    if text.startswith("zero"):
+        text = text[4:].lstrip(" ,")
+    return text.strip(" .!?")
+
+
+def _features(text : str) -> Counter:
+
+    words = _WORD.findall(text)
+    features = Counter(words)
+    features.update(f"{first} {second}" for first, second in zip(words, words[1:]))
+    for word in words: # character trigrams make the classifier tolerant to typos and transcription errors
+        padded = f"#{word}#"
+        features.update(f"#{padded[i:i + 3]}" for i in range(len(padded) - 2))
+    return features
+
+
+class TfidfClassifier:
+
+    """
+    Small TF-IDF nearest-centroid classifier over word unigrams, bigrams and character trigrams.
+
+    Parameters:
+
+        idf (dict) : inverse document frequency of each feature
+        centroids (dict) : normalised TF-IDF centroid of each intent
+
+    Public methods:
+
+        fit(examples) -> TfidfClassifier : trains the classifier from {intent: [examples]}
+        predict(text) -> tuple[str, float, float] : returns the best intent, its score and the margin to the second one
+    """
+
+    def __init__(self):
+
+        self.idf = {}
+        self.centroids = {}
+
+    def fit(self, examples : dict[str, list[str]]) -> "TfidfClassifier":
+
+        """
+        Trains the classifier.
+
+        Parameters:
+
+        examples : a dictionary mapping each intent to a list of example commands
+
+        Returned value:
+        The trained classifier
+        """
+
+        documents = [(intent, _features(normalise(text))) for intent, texts in examples.items() for text in texts]
+        document_frequency = Counter(feature for _, features in documents for feature in features)
+        self.idf = {feature: math.log((1 + len(documents)) / (1 + count)) + 1 for feature, count in document_frequency.items()}
+
+        self.centroids = {}
+        for intent in examples:
+            centroid = Counter()
+            for document_intent, features in documents:
+                if document_intent == intent:
+                    centroid.update(self._vector(features))
+            self.centroids[intent] = self._normalised(centroid)
+
+        return self
+
+    def predict(self, text : str) -> tuple[str | None, float, float]:
+
+        """
+        Returns the intent whose centroid is the most similar to the text.
+
+        Parameters:
+
+        text : the command to be classified
+
+        Returned value:
+        A tuple (intent, score, margin), where score is the cosine similarity and margin is the difference to the
+        second best intent
+        """
+
+        vector = self._normalised(self._vector(_features(normalise(text))))
+        scores = sorted(((sum(weight * centroid.get(feature, 0.0) for feature, weight in vector.items()), intent)
+                         for intent, centroid in self.centroids.items()), reverse=True)
+
+        if not scores:
+            return None, 0.0, 0.0
+
+        second = scores[1][0] if len(scores) > 1 else 0.0
+        return scores[0][1], scores[0][0], scores[0][0] - second
+
+    def _vector(self, features : Counter) -> dict:
+        return {feature: (1 + math.log(count)) * self.idf[feature] for feature, count in features.items() if feature in self.idf}
+
+    @staticmethod
+    def _normalised(vector : dict) -> dict:
+        norm = math.sqrt(sum(weight * weight for weight in vector.values()))
+        return {feature: weight / norm for feature, weight in vector.items()} if norm else {}
+
+
+class IntentRouter:
+
+    """
+    Local fast path placed before the language model classifier in ZeroCommands.activate_command(). It answers
+    high-confidence commands in microseconds, using keyword rules first and the TF-IDF classifier second, and returns
+    None when the command is ambiguous or needs free-text arguments, so that the language model handles it. Negated
+    commands, commands about another day than today, targets with words the vocabulary doesn't explain and questions
+    mixing several subjects are ambiguous.
+
+    The routed command is a utils.structured.CommandCall, the same validated command built from the language
+    model's output, so it can be consumed by the same code.
+
+    Parameters:
+
+        classifier (TfidfClassifier) : the trained classifier; None disables the second stage
+        vocabulary (dict) : known names for each argument kind: "pages", "apps", "processes", "folders" and "playlists"
+        min_score (float) : minimum classifier similarity to take the fast path
+        min_margin (float) : minimum difference between the best and second best intents to take the fast path
+        routed_by_rules (int) : number of commands answered by the rules
+        routed_by_classifier (int) : number of commands answered by the classifier
+        fallbacks (int) : number of commands left to the language model
+
+    Public methods:
+
+        from_fixture(path, vocabulary) -> IntentRouter : builds a router whose classifier is trained from a JSON file
+        route(user_input) -> CommandCall | None : returns the command to be executed, or None to fall back to the language model
+        stats() -> dict : returns how often the fast path was taken
+        evaluate(cases) -> dict : measures coverage and accuracy of the fast path against labelled commands
+    """
+
+    def __init__(self, classifier : TfidfClassifier | None = None, vocabulary : dict[str, list[str]] | None = None,
+                 min_score : float = 0.35, min_margin : float = 0.15):
+
+        self.classifier = classifier
+        self.vocabulary = {kind: [name.lower() for name in names] for kind, names in (vocabulary or {}).items()}
+        self.min_score = min_score
+        self.min_margin = min_margin
+
+        self.rules = {intent: re.compile(pattern) for intent, pattern in INTENT_RULES.items()}
+
+        self.routed_by_rules = 0
+        self.routed_by_classifier = 0
+        self.fallbacks = 0
+
+    @classmethod
+    def from_fixture(cls, path : str, vocabulary : dict[str, list[str]] | None = None, **kwargs) -> "IntentRouter":
+
+        """
+        Builds a router whose classifier is trained from a JSON file mapping each function name to example commands.
+
+        Parameters:
+
+        path : path to the JSON file
+        vocabulary : known names for each argument kind
+
+        Returned value:
+        The router
+        """
+
+        with open(path, "r", encoding="utf-8") as f:
+            examples = json.load(f)
+
+        unknown = set(examples) - set(FUNCTION_NAMES)
+        if unknown:
+            raise ValueError(f"Unknown functions in {path}: {', '.join(sorted(unknown))}")
+
+        return cls(TfidfClassifier().fit(examples), vocabulary, **kwargs)
+
+    def route(self, user_input : str) -> CommandCall | None:
+
+        """
+        Returns the command for a user input when it can be decided locally.
+
+        Parameters:
+
+        user_input : the command typed or said by the user
+
+        Returned value:
+        The command to be executed, or None to fall back to the language model
+        """
+
+        text = normalise(user_input)
+        if NEGATION.search(text) or RELATIVE_DAY.search(text):
+            self.fallbacks += 1
+            return None
+
+        command = self._route_by_rules(text)
+        if command is not None:
+            self.routed_by_rules += 1
+            return command
+
+        command = self._route_by_classifier(text)
+        if command is not None:
+            self.routed_by_classifier += 1
+            return command
+
+        self.fallbacks += 1
+        return None
+
+    def stats(self) -> dict:
+
+        """
+        Returns how often the fast path was taken.
+
+        Parameters:
+            None
+
+        Returned value:
+            A dictionary with the number of commands answered by rules, by the classifier, left to the language
+            model, and the fast path ratio
+        """
+
+        total = self.routed_by_rules + self.routed_by_classifier + self.fallbacks
+        return {
+            "rules": self.routed_by_rules,
+            "classifier": self.routed_by_classifier,
+            "fallbacks": self.fallbacks,
+            "fast_path_ratio": (self.routed_by_rules + self.routed_by_classifier) / total if total else 0.0,
+        }
+
+    def evaluate(self, cases : list[dict]) -> dict:
+
+        """
+        Measures the fast path against labelled commands. A routed command is correct when it calls the labelled
+        function; commands left to the language model count towards coverage only. Commands labelled with a null
+        intent must be left to the language model, and routing them is an error.
+
+        Parameters:
+
+        cases : a list of {"text": command, "intent": function name or None}
+
+        Returned value:
+        A dictionary with the coverage (fraction of the labelled commands routed locally), the accuracy of the routed
+        commands, the fraction of the null-labelled commands left to the language model, the mean routing time in
+        microseconds and the misrouted commands
+        """
+
+        routed = correct = deferred = 0
+        elapsed = 0.0
+        errors = []
+        labelled = [case for case in cases if case["intent"] is not None]
+
+        for case in cases:
+            start = time.perf_counter()
+            command = self.route(case["text"])
+            elapsed += time.perf_counter() - start
+
+            if case["intent"] is None:
+                if command is None:
+                    deferred += 1
+                else:
+                    errors.append((case["text"], None, command))
+                continue
+            if command is None:
+                continue
+            routed += 1
+            if command.function == case["intent"]:
+                correct += 1
+            else:
+                errors.append((case["text"], case["intent"], command))
+
+        return {
+            "cases": len(cases),
+            "coverage": routed / len(labelled) if labelled else 0.0,
+            "accuracy": correct / routed if routed else 0.0,
+            "deferral": deferred / (len(cases) - len(labelled)) if len(cases) > len(labelled) else 1.0,
+            "mean_route_us": 1e6 * elapsed / len(cases) if cases else 0.0,
+            "errors": errors,
+        }
+
+    # ===================================== private methods ===================================== #
+
+    def _route_by_rules(self, text : str) -> CommandCall | None:
+
+        matches = [intent for intent, rule in self.rules.items() if rule.search(text)]
+
+        # "stop the music" also looks like closing a program called "the music"
+        if "stop_playlist" in matches and "close" in matches:
+            matches.remove("close")
+        # a new event also mentions events
+        if "set_new_event" in matches and "get_next_events" in matches:
+            matches.remove("get_next_events")
+        # "start my playlist" also looks like opening a program
+        if "start_playlist" in matches and "open" in matches:
+            matches.remove("open")
+
+        if len(matches) != 1:
+            return None
+
+        return self._build_command(matches[0], text)
+
+    def _route_by_classifier(self, text : str) -> CommandCall | None:
+
+        if self.classifier is None:
+            return None
+
+        intent, score, margin = self.classifier.predict(text)
+        if intent is None or score < self.min_score or margin < self.min_margin:
+            return None
+
+        if intent in ["open_page", "open_app", "open_folder"]:
+            intent = "open"
+        elif intent == "close_app":
+            intent = "close"
+
+        return self._build_command(intent, text)
+
+    def _build_command(self, intent : str, text : str) -> CommandCall | None:
+
+        if intent in LLM_ONLY_FUNCTIONS:
+            return None
+
+        if intent in QUESTION_ENTITIES and QUESTION.search(text):
+            if any(entities.search(text) for other, entities in QUESTION_ENTITIES.items() if other != intent):
+                return None
+        if intent == "get_current_time" and TIME_OF_SOMETHING.search(text):
+            return None
+
+        if intent == "open":
+            target = self._target(text, "open")
+            for kind, function, argument in [("pages", "open_page", "page"), ("apps", "open_app", "name"),
+                                             ("folders", "open_folder", "folder_name")]:
+                name = self._find_name(target, kind)
+                if name is not None:
+                    return CommandCall(function, {argument: name}) if self._only_name(target, name) else None
+            return None
+
+        if intent == "close":
+            target = self._target(text, "close")
+            name = self._find_name(target, "processes")
+            return CommandCall("close_app", {"name": name}) if name is not None and self._only_name(target, name) else None
+
+        if intent == "start_playlist":
+            return CommandCall("start_playlist", {"playlist": self._find_name(text, "playlists") or "default"})
+
+        if intent == "get_next_events":
+            # only a number of events is read here; any other number ("the next 3 days") is left to the model
+            number = re.search(r"\b(\d+)\s+(\w+\s+)?(events?|meetings?|appointments?)\b", text)
+            if number is None and re.search(r"\d", text):
+                return None
+            return CommandCall("get_next_events", {"period": "week" if "week" in text else "day",
+                                                   "number_of_events": int(number.group(1)) if number else None})
+
+        return CommandCall(intent)
+
+    def _target(self, text : str, rule : str) -> str:
+
+        text = POLITE_PREFIX.sub("", text)
+        match = self.rules[rule].search(text)
+        return match.group("target") if match else text
+
+    def _only_name(self, target : str, name : str) -> bool:
+
+        # "open google drive" names something else than "google": the target may only hold the name and fillers
+        words = f" {' '.join(_WORD.findall(target))} ".replace(f" {name} ", " ", 1).split()
+        return all(word in TARGET_FILLERS for word in words)
+
+    def _find_name(self, text : str, kind : str) -> str | None:
+
+        # the longest known name wins, so "google drive" beats "google"
+        words = f" {' '.join(_WORD.findall(text))} "
+        names = [name for name in self.vocabulary.get(kind, []) if f" {name} " in words]
+        return max(names, key=len) if names else None
+
+
+# evaluates the router against the labelled test set
+if __name__ == "__main__":
+
+    examples_path = sys.argv[1] if len(sys.argv) > 1 else "data/intents/examples.json"
+    test_path = sys.argv[2] if len(sys.argv) > 2 else "data/intents/test_set.json"
+
+    with open(test_path, "r", encoding="utf-8") as f:
+        test_set = json.load(f)
+
+    router = IntentRouter.from_fixture(examples_path, test_set["vocabulary"])
+    report = router.evaluate(test_set["cases"])
+
+    print(f"Cases: {report['cases']}")
+    print(f"Fast path coverage: {100 * report['coverage']:.1f}%")
+    print(f"Fast path accuracy: {100 * report['accuracy']:.1f}%")
+    print(f"Ambiguous commands left to the language model: {100 * report['deferral']:.1f}%")
+    print(f"Mean routing time: {report['mean_route_us']:.1f} us")
+    for text, expected, command in report["errors"]:
+        print(f"  misrouted: '{text}' -> {command} (expected {expected or 'the language model'})")
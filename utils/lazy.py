@@ -0,0 +1,138 @@
+from utils.profiling import startup_profiler
+from typing import Any, Callable, Iterable
+import importlib
+import logging
+import sys
+import threading
+
+
+class LazyModule:
+
+    """
+    Stands for a module which is only imported the first time one of its attributes is used, so importing Zero's
+    own modules doesn't pay for heavy dependencies before the window is shown, e.g. `mixer =
+    LazyModule("pygame.mixer")` then `mixer.init()`. Only attribute access is deferred: annotations using the module
+    need `from __future__ import annotations`.
+
+    Parameters:
+
+        name (str) : the full name of the module
+
+    Public methods:
+
+        None; the attributes of the module are read through the object
+    """
+
+    def __init__(self, name : str):
+
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attribute : str) -> Any:
+        return getattr(self._load(), attribute)
+
+    def __repr__(self) -> str:
+        return f"<lazy module '{self._name}'{' (loaded)' if self._module is not None else ''}>"
+
+    # ===================================== private methods ===================================== #
+
+    def _load(self):
+
+        # the import lock of the module makes concurrent first uses safe
+        if self._module is None:
+            if self._name in sys.modules:
+                self._module = sys.modules[self._name]
+            else:
+                with startup_profiler.measure(f"import {self._name}"):
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+
+class LazyResource:
+
+    """
+    A resource created on its first use, e.g. a service needing a heavy client library and a network round-trip.
+    A failed creation isn't kept, so the next use tries again.
+
+    Parameters:
+
+        name (str) : the name of the resource, used in the startup profile and the logs
+        factory (Callable) : creates the resource
+
+    Public methods:
+
+        get() -> Any : returns the resource, creating it first if needed
+    """
+
+    def __init__(self, name : str, factory : Callable[[], Any]):
+
+        self.name = name
+        self.factory = factory
+
+        self._value = None
+        self._created = False
+        self._lock = threading.Lock()
+
+    @property
+    def created(self) -> bool:
+        return self._created
+
+    def __repr__(self) -> str:
+        return f"<lazy resource '{self.name}'{' (created)' if self._created else ''}>"
+
+    def get(self, timeout : float | None = None) -> Any:
+
+        """
+        Returns the resource, creating it first if needed. A use concurrent with a prefetch waits for it rather
+        than creating the resource twice.
+
+        Parameters:
+            timeout (float) : maximum seconds to wait for another thread creating the resource; None waits as long
+                              as it takes
+
+        Returned value:
+            The resource; any exception raised by the factory is passed on, and TimeoutError is raised when the
+            resource is still being created by another thread after the timeout
+        """
+
+        if not self._lock.acquire(timeout=-1 if timeout is None else timeout):
+            raise TimeoutError(f"The {self.name} is still being started.")
+        try:
+            if not self._created:
+                with startup_profiler.measure(self.name):
+                    self._value = self.factory()
+                self._created = True
+        finally:
+            self._lock.release()
+        return self._value
+
+
+def prefetch(items : Iterable[LazyModule | LazyResource], on_done : Callable[[], None] | None = None) -> threading.Thread:
+
+    """
+    Loads lazy modules and resources one after the other in a background thread, so they're ready by their first
+    use. Failures are only logged: the first use will try again and report the error where it's handled.
+
+    Parameters:
+        items (Iterable) : the LazyModule and LazyResource objects, the most urgent first
+        on_done (Callable) : called from the background thread once every item has been loaded
+
+    Returned value:
+        The started thread
+    """
+
+    def run():
+        for item in items:
+            try:
+                if isinstance(item, LazyModule):
+                    item._load()
+                else:
+                    item.get()
+            except Exception as e:
+                logging.warning(f"Couldn't prefetch {item!r}: {e}")
+        if on_done is not None:
+            on_done()
+
+    thread = threading.Thread(target=run, name="zero-prefetch", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,323 @@
+from __future__ import annotations
+from config.config import ZeroConfig
+from utils.wakeword import WakeWordDetector
+from utils.lazy import LazyModule
+from dataclasses import dataclass
+from typing import Callable
+import logging
+import queue
+import sys
+import threading
+import time
+
+sr = LazyModule("speech_recognition")
+
+
+@dataclass
+class Utterance:
+
+    """
+    An utterance captured by the microphone listener.
+
+    Parameters:
+
+        audio (sr.AudioData) : the captured audio
+        command (bool) : whether the utterance followed the wake word, and so must be handled as a command
+    """
+
+    audio: sr.AudioData
+    command: bool = False
+
+
+class MicrophoneListener:
+
+    """
+    Long-lived microphone listener. The device is opened and calibrated once, then audio is captured in a
+    background thread, where the recogniser's energy-based voice activity detection splits it into utterances.
+    The ambient noise is recalibrated periodically, only while nobody is speaking.
+
+    Finished utterances are pushed to `utterances` when the listener is armed (the next utterance after arm())
+    or continuous. Any audio source can be used instead of the microphone, e.g. sr.AudioFile to replay WAV fixtures.
+
+    With a wake word detector, the audio is streamed to the detector while the listener isn't armed, and only the
+    utterance following the wake word is captured, tagged as a command.
+
+    Parameters:
+
+        source_factory (Callable) : returns the audio source to be opened; the default microphone by default
+        recognizer (sr.Recognizer) : the recogniser detecting the utterances
+        continuous (bool) : whether every utterance is queued, rather than only the one following arm()
+        calibration_duration (float) : seconds of ambient noise used to calibrate the energy threshold
+        recalibration_interval (float) : seconds between two calibrations; 0 only calibrates when the device opens
+        phrase_time_limit (float) : maximum length of an utterance, in seconds
+        wake_word_detector (utils.wakeword.WakeWordDetector) : spots the wake word between utterances; None disables it
+        utterances (queue.Queue) : the finished utterances (Utterance), consumed by the assistant
+        calibrations (int) : number of calibrations performed
+        captured (int) : number of utterances queued
+        dropped (int) : number of utterances ignored because the listener wasn't armed
+
+    Public methods:
+
+        start() -> None : opens the source and starts capturing in the background
+        stop() -> None : stops capturing and closes the source
+        arm() -> None : queues the next finished utterance
+        listen_once(timeout) -> Utterance | None : arms the listener and waits for the next utterance
+        wait_until_ready(timeout) -> bool : blocks until the source is open and calibrated
+        stats() -> dict : returns the listener counters
+    """
+
+    def __init__(self, source_factory : Callable[[], sr.AudioSource] | None = None, recognizer : sr.Recognizer | None = None,
+                 continuous : bool = False, calibration_duration : float = ZeroConfig.MIC_CALIBRATION_DURATION,
+                 recalibration_interval : float = ZeroConfig.MIC_RECALIBRATION_INTERVAL,
+                 phrase_time_limit : float = ZeroConfig.MIC_PHRASE_TIME_LIMIT,
+                 wake_word_detector : WakeWordDetector | None = None):
+
+        self.source_factory = source_factory or (lambda: sr.Microphone(sample_rate=ZeroConfig.MIC_SAMPLE_RATE))
+        self._recognizer = recognizer # created on first use, importing speech_recognition
+        if recognizer is not None:
+            recognizer.pause_threshold = ZeroConfig.MIC_PAUSE_THRESHOLD
+        self.continuous = continuous
+        self.calibration_duration = calibration_duration
+        self.recalibration_interval = recalibration_interval
+        self.phrase_time_limit = phrase_time_limit
+        self.wake_word_detector = wake_word_detector
+
+        self.utterances = queue.Queue()
+        self.calibrations = 0
+        self.captured = 0
+        self.dropped = 0
+
+        self._armed = threading.Event()
+        self._stop = threading.Event()
+        self._ready = threading.Event()
+        self._thread = None
+        self._calibrated_at = 0.0
+
+    @property
+    def recognizer(self) -> sr.Recognizer:
+        if self._recognizer is None:
+            self._recognizer = sr.Recognizer()
+            self._recognizer.pause_threshold = ZeroConfig.MIC_PAUSE_THRESHOLD
+        return self._recognizer
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+
+        """
+        Opens the source and starts capturing in the background. It returns immediately; the source is calibrated
+        by the capture thread.
+
+        Parameters:
+            None
+
+        Returned value:
+            None
+        """
+
+        if self.running:
+            return
+
+        self._stop.clear()
+        self._ready.clear()
+        self._thread = threading.Thread(target=self._run, name="zero-microphone", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+
+        """
+        Stops capturing and closes the source, once the utterance being captured, if any, is finished.
+
+        Parameters:
+            None
+
+        Returned value:
+            None
+        """
+
+        self._stop.set()
+
+    def arm(self) -> None:
+
+        """
+        Queues the next finished utterance. Starts the listener if needed.
+
+        Parameters:
+            None
+
+        Returned value:
+            None
+        """
+
+        self._armed.set()
+        self.start()
+
+    def listen_once(self, timeout : float | None = None) -> Utterance | None:
+
+        """
+        Arms the listener and waits for the next finished utterance.
+
+        Parameters:
+            timeout (float) : maximum seconds to wait; None waits until an utterance is captured
+
+        Returned value:
+            The captured utterance, or None if the timeout expired or the source ended
+        """
+
+        self.arm()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return None
+            try:
+                return self.utterances.get(timeout=0.5 if remaining is None else min(0.5, remaining))
+            except queue.Empty:
+                if not self.running:
+                    return None
+
+    def wait_until_ready(self, timeout : float | None = None) -> bool:
+
+        """
+        Blocks until the source is open and calibrated.
+
+        Parameters:
+            timeout (float) : maximum seconds to wait
+
+        Returned value:
+            True if the listener is ready
+        """
+
+        return self._ready.wait(timeout)
+
+    def stats(self) -> dict:
+
+        """
+        Returns the listener counters.
+
+        Parameters:
+            None
+
+        Returned value:
+            A dictionary with the number of calibrations, of queued utterances and of utterances ignored while
+            disarmed, the current energy threshold, and the wake word detector stats
+        """
+
+        stats = {
+            "calibrations": self.calibrations,
+            "captured": self.captured,
+            "dropped": self.dropped,
+            "energy_threshold": self.recognizer.energy_threshold,
+        }
+        if self.wake_word_detector is not None:
+            stats["wake_word"] = self.wake_word_detector.stats()
+        return stats
+
+    # ===================================== private methods ===================================== #
+
+    def _run(self) -> None:
+
+        try:
+            with self.source_factory() as source:
+                self._calibrate(source)
+                self._ready.set()
+
+                while not self._stop.is_set():
+                    if self._recalibration_due():
+                        self._calibrate(source)
+
+                    command = False
+                    if self.wake_word_detector is not None and not self._armed.is_set():
+                        detected = self._wait_for_wake_word(source)
+                        if detected is None: # the source has ended
+                            break
+                        if not detected:
+                            continue
+                        command = True
+
+                    try:
+                        # the timeout only bounds the wait for speech to start, so stop() is noticed regularly
+                        audio = self.recognizer.listen(source, timeout=ZeroConfig.WAKE_WORD_COMMAND_TIMEOUT if command else 1,
+                                                       phrase_time_limit=self.phrase_time_limit)
+                    except sr.WaitTimeoutError:
+                        continue
+                    finally:
+                        if command:
+                            self.wake_word_detector.reset()
+
+                    if len(audio.frame_data) == 0: # the source has ended (e.g. a WAV fixture)
+                        break
+
+                    # the end of a source may return a bit of trailing noise, shorter than any phrase
+                    duration = len(audio.frame_data) / (audio.sample_rate * audio.sample_width)
+                    if duration >= self.recognizer.phrase_threshold:
+                        self._deliver(Utterance(audio, command))
+        except Exception as e:
+            logging.error(f"The microphone listener stopped: {e}")
+        finally:
+            self._ready.set() # releases the threads waiting for a source which couldn't be opened
+
+    def _recalibration_due(self) -> bool:
+
+        return bool(self.recalibration_interval) and time.monotonic() - self._calibrated_at >= self.recalibration_interval
+
+    def _wait_for_wake_word(self, source : sr.AudioSource) -> bool | None:
+
+        # returns True once the wake word is heard, False when the listener is armed, stopped or due for a
+        # recalibration, and None when the source has ended
+        detector = self.wake_word_detector
+        while not (self._stop.is_set() or self._armed.is_set() or self._recalibration_due()):
+            chunk = source.stream.read(source.CHUNK)
+            if len(chunk) == 0:
+                return None
+
+            try:
+                if detector.process(chunk, source.SAMPLE_RATE, source.SAMPLE_WIDTH, self.recognizer.energy_threshold):
+                    logging.info("Wake word detected.")
+                    return True
+            except sr.RequestError as e:
+                logging.warning(f"Wake word detection disabled: {e}")
+                self.wake_word_detector = None
+                return False
+
+        return False
+
+    def _calibrate(self, source : sr.AudioSource) -> None:
+
+        self.recognizer.adjust_for_ambient_noise(source, duration=self.calibration_duration)
+        self._calibrated_at = time.monotonic()
+        self.calibrations += 1
+        logging.info(f"Microphone calibrated: energy threshold {self.recognizer.energy_threshold:.0f}")
+
+    def _deliver(self, utterance : Utterance) -> None:
+
+        if self.continuous or utterance.command or self._armed.is_set():
+            if not utterance.command:
+                self._armed.clear()
+            self.captured += 1
+            self.utterances.put(utterance)
+        else:
+            self.dropped += 1
+
+
+# listener shared by the GUI and the command line; the microphone is only opened when it's first used
+microphone_listener = MicrophoneListener(wake_word_detector=WakeWordDetector() if ZeroConfig.WAKE_WORD_ENABLED else None)
+
+
+# replays WAV fixtures through the listener, printing the utterances it detects. The first second of each fixture
+# is used for calibration, so it should be silence or background noise. With --wake-word, only the utterances
+# following the wake word are kept
+if __name__ == "__main__":
+
+    wake_word = "--wake-word" in sys.argv
+    for path in [arg for arg in sys.argv[1:] if arg != "--wake-word"]:
+        listener = MicrophoneListener(lambda: sr.AudioFile(path), continuous=not wake_word, recalibration_interval=0,
+                                      wake_word_detector=WakeWordDetector() if wake_word else None)
+        listener.start()
+        listener._thread.join()
+        while not listener.utterances.empty():
+            audio = listener.utterances.get().audio
+            print(f"{path}: utterance of {len(audio.frame_data) / (audio.sample_rate * audio.sample_width):.2f}s")
+        print(f"{path}: {listener.stats()}")
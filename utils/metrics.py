@@ -0,0 +1,120 @@
+from collections import deque
+import time
+
+
+class FrameTimer:
+
+    """
+    Measures how regularly an animation is actually drawn. Each frame records when it ran and when it was meant
+    to run; a frame is late when the Tk loop was busy past its scheduled time, which is what a blocking call on
+    the Tk thread looks like. A pause (nothing scheduled on purpose) isn't measured as a late frame.
+
+    Parameters:
+
+        late_threshold (float) : milliseconds past its schedule after which a frame counts as late
+        history_size (int) : number of recent delays kept for the 95th percentile; the mean and maximum cover every frame
+        frames (int) : number of frames drawn
+        late_frames (int) : number of frames drawn later than the threshold
+
+    Public methods:
+
+        tick(expected_delay) -> None : records a frame, scheduling the next one after `expected_delay` milliseconds
+        pause() -> None : forgets the scheduled frame, as none will be drawn until the next tick
+        reset() -> None : starts a new measurement
+        stats() -> dict : returns the frame counters and delays
+    """
+
+    def __init__(self, late_threshold : float = 50, history_size : int = 1000):
+
+        self.late_threshold = late_threshold
+        self.history_size = history_size
+        self.reset()
+
+    def tick(self, expected_delay : float) -> None:
+
+        """
+        Records a frame. Call it when the frame is drawn, with the delay the next frame is scheduled after.
+
+        Parameters:
+            expected_delay (float) : milliseconds until the next frame should be drawn
+
+        Returned value:
+            None
+        """
+
+        now = time.perf_counter()
+        if self._expected_at is not None:
+            lateness = max(1000 * (now - self._expected_at), 0.0)
+            self._lateness.append(lateness)
+            self._lateness_sum += lateness
+            self._lateness_count += 1
+            self._lateness_max = max(self._lateness_max, lateness)
+            self.late_frames += lateness > self.late_threshold
+        if self._first_at is None:
+            self._first_at = now
+
+        self.frames += 1
+        self._last_at = now
+        self._expected_at = now + expected_delay / 1000
+
+    def pause(self) -> None:
+
+        """
+        Forgets the scheduled frame, when the animation is paused or switched: the next tick starts a new schedule
+        rather than being measured as late.
+
+        Parameters:
+            None
+
+        Returned value:
+            None
+        """
+
+        self._expected_at = None
+
+    def reset(self) -> None:
+
+        """
+        Starts a new measurement.
+
+        Parameters:
+            None
+
+        Returned value:
+            None
+        """
+
+        self.frames = 0
+        self.late_frames = 0
+        self._lateness = deque(maxlen=self.history_size)
+        self._lateness_sum = 0.0
+        self._lateness_count = 0
+        self._lateness_max = 0.0
+        self._first_at = None
+        self._last_at = None
+        self._expected_at = None
+
+    def stats(self) -> dict:
+
+        """
+        Returns the frame counters.
+
+        Parameters:
+            None
+
+        Returned value:
+            A dictionary with the number of frames, the frame rate, the mean, 95th percentile (of the recent frames)
+            and maximum delay of the frames past their schedule in milliseconds, and the number of late frames
+        """
+
+        lateness = sorted(self._lateness)
+        elapsed = (self._last_at - self._first_at) if self.frames > 1 else 0.0
+
+        return {
+            "frames": self.frames,
+            "fps": (self.frames - 1) / elapsed if elapsed else 0.0,
+            "mean_delay_ms": self._lateness_sum / self._lateness_count if self._lateness_count else 0.0,
+            "p95_delay_ms": lateness[int(0.95 * (len(lateness) - 1))] if lateness else 0.0,
+            "max_delay_ms": self._lateness_max,
+            "late_frames": self.late_frames,
+        }
@@ -0,0 +1,307 @@
+from chat.client import CancelToken, RequestCancelled
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable
+import asyncio
+import itertools
+import logging
+import threading
+import time
+
+
+@dataclass
+class TurnRequest:
+
+    """
+    A user input being processed by the pipeline.
+
+    Parameters:
+
+        turn_id (int) : sequential identifier of the turn
+        user_input (str) : the text sent by the user
+        command (bool) : whether the input must be handled as a command (e.g. it followed the wake word)
+        session (str) : the conversation the turn belongs to; a turn only supersedes the turns of its own session
+        speak (bool) : whether the answer is spoken once it's ready
+        cancel_token (chat.client.CancelToken) : cancelled when a newer turn supersedes this one
+        submitted_at (float) : time.monotonic() value at which the turn was submitted
+    """
+
+    turn_id: int
+    user_input: str
+    command: bool = False
+    session: str = "default"
+    speak: bool = True
+    cancel_token: CancelToken = field(default_factory=CancelToken)
+    submitted_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_token.cancelled
+
+
+class TurnPipeline:
+
+    """
+    Processes user turns on an asyncio event loop running in its own thread, next to the Tk main loop. Only the
+    latest turn of a session matters: submitting a new input cancels the session's turn in flight, aborting its
+    HTTP requests and dropping its pending TTS, so a stale answer never overwrites a newer one. Sessions (e.g. the
+    window and each client of the local API) don't supersede each other's turns, but share the same pool.
+
+    Blocking work (inference, TTS) runs in a small thread pool; results reach the UI through `dispatch`, which must
+    schedule a callable on the Tk thread. The pool is bounded with back-pressure: a job is only handed to it when a
+    worker is free, and a worker stays taken until its job really returns, even if the turn was cancelled
+    meanwhile. Turns waiting for a worker are simply dropped when they're superseded, so the pool's queue never
+    grows however fast the inputs come.
+
+    Parameters:
+
+        process_turn (Callable) : receives a TurnRequest and returns the answer to be spoken; runs in a worker thread
+        speak (Callable) : receives the answer and the turn's cancel token, and speaks it; None disables TTS
+        dispatch (Callable) : receives a callable and runs it on the UI thread
+        max_workers (int) : number of worker threads
+        submitted (int) : number of turns submitted
+        superseded (int) : number of turns cancelled by a newer one
+        throttled (int) : number of jobs which had to wait for a free worker
+
+    Public methods:
+
+        start() -> None : starts the event loop thread
+        submit(user_input, command, session, speak) -> TurnRequest : starts processing an input, cancelling the session's previous turn
+        deliver(turn, callback, *args) -> None : runs a callback on the UI thread, unless the turn was cancelled
+        add_listener(listener) -> None : registers a function called on the UI thread when a session starts or stops thinking
+        cancel(session) -> None : cancels the turn in flight of a session, or of every session
+        stop() -> None : cancels the turns in flight and stops the event loop
+        stats() -> dict : returns the pipeline counters
+    """
+
+    THINKING = "thinking"
+    IDLE = "idle"
+
+    def __init__(self, process_turn : Callable[[TurnRequest], str], speak : Callable[[str, CancelToken], None] | None = None,
+                 dispatch : Callable[[Callable], None] | None = None, max_workers : int = 2):
+
+        self.process_turn = process_turn
+        self.speak = speak
+        self.dispatch = dispatch or (lambda callback: callback())
+        self.max_workers = max_workers
+
+        self.submitted = 0
+        self.superseded = 0
+        self.throttled = 0
+
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="zero-turn")
+        self._workers = None
+        self._listeners = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._latest = {} # latest turn of each session
+        self._tasks = {} # task processing the latest turn of each session
+        self._loop = None
+        self._thread = None
+
+    def start(self) -> None:
+
+        """
+        Starts the event loop thread.
+
+        Parameters:
+            None
+
+        Returned value:
+            None
+        """
+
+        self._loop = asyncio.new_event_loop()
+        self._workers = asyncio.Semaphore(self.max_workers)
+        self._thread = threading.Thread(target=self._loop.run_forever, name="zero-pipeline", daemon=True)
+        self._thread.start()
+
+    def submit(self, user_input : str, command : bool = False, session : str = "default", speak : bool = True) -> TurnRequest:
+
+        """
+        Starts processing a user input, cancelling the turn in flight of the same session.
+
+        Parameters:
+            user_input (str) : the text sent by the user
+            command (bool) : whether the input must be handled as a command
+            session (str) : the conversation the input belongs to
+            speak (bool) : whether the answer is spoken
+
+        Returned value:
+            The new turn
+        """
+
+        turn = TurnRequest(next(self._ids), user_input, command, session, speak)
+
+        with self._lock:
+            previous = self._latest.get(session)
+            self._latest[session] = turn
+            self.submitted += 1
+
+        # cancelling here aborts the superseded request right away, before the loop even sees the new turn
+        if previous is not None and not previous.cancelled:
+            previous.cancel_token.cancel()
+            self.superseded += 1
+
+        self._loop.call_soon_threadsafe(self._start_turn, turn)
+        return turn
+
+    def deliver(self, turn : TurnRequest, callback : Callable, *args) -> None:
+
+        """
+        Runs a callback on the UI thread, unless the turn has been cancelled by the time it runs.
+
+        Parameters:
+            turn (TurnRequest) : the turn the result belongs to
+            callback (Callable) : the function updating the UI
+            *args : the arguments passed to the callback
+
+        Returned value:
+            None
+        """
+
+        def run_if_current():
+            if not turn.cancelled:
+                callback(*args)
+
+        self.dispatch(run_if_current)
+
+    def add_listener(self, listener : Callable[[str], None]) -> None:
+
+        """
+        Registers a function called on the UI thread with the turn and TurnPipeline.THINKING when a turn starts
+        being processed, then TurnPipeline.IDLE once it has its answer (or failed), before it's spoken. Only the
+        latest turn of each session is reported.
+
+        Parameters:
+            listener (Callable) : the function to be called with the turn and the state
+
+        Returned value:
+            None
+        """
+
+        self._listeners.append(listener)
+
+    def cancel(self, session : str | None = None) -> None:
+
+        """
+        Cancels the turn in flight of a session, if any, and forgets the session.
+
+        Parameters:
+            session (str) : the session; every session when None
+
+        Returned value:
+            None
+        """
+
+        with self._lock:
+            if session is None:
+                turns = list(self._latest.values())
+                self._latest.clear()
+            else:
+                turns = [self._latest.pop(session)] if session in self._latest else []
+
+        for turn in turns:
+            turn.cancel_token.cancel()
+            self._loop.call_soon_threadsafe(self._cancel_task, turn.session)
+
+    def stop(self) -> None:
+
+        """
+        Cancels the turns in flight and stops the event loop.
+
+        Parameters:
+            None
+
+        Returned value:
+            None
+        """
+
+        self.cancel()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+
+        """
+        Returns the pipeline counters.
+
+        Parameters:
+            None
+
+        Returned value:
+            A dictionary with the number of submitted and superseded turns, and of jobs which waited for a worker
+        """
+
+        return {
+            "submitted": self.submitted,
+            "superseded": self.superseded,
+            "throttled": self.throttled,
+        }
+
+    # ===================================== private methods ===================================== #
+
+    def _start_turn(self, turn : TurnRequest) -> None:
+
+        self._cancel_task(turn.session)
+        if not turn.cancelled:
+            task = self._loop.create_task(self._run_turn(turn))
+            self._tasks[turn.session] = task
+            task.add_done_callback(lambda _: self._tasks.pop(turn.session) if self._tasks.get(turn.session) is task else None)
+
+    def _cancel_task(self, session : str) -> None:
+
+        task = self._tasks.get(session)
+        if task is not None and not task.done():
+            task.cancel()
+
+    async def _run_turn(self, turn : TurnRequest) -> None:
+
+        self._notify(turn, self.THINKING)
+        try:
+            try:
+                answer = await self._run_in_worker(self.process_turn, turn)
+            finally:
+                self._notify(turn, self.IDLE)
+
+            # a superseded turn never reaches the speakers
+            if self.speak is not None and turn.speak and answer and not turn.cancelled:
+                await self._run_in_worker(self.speak, answer, turn.cancel_token)
+
+        except (asyncio.CancelledError, RequestCancelled):
+            logging.info(f"Turn {turn.turn_id} was superseded and cancelled.")
+        except Exception as e:
+            logging.error(f"Unexpected error while processing turn {turn.turn_id}: {e}")
+        finally:
+            # a finished turn is forgotten, so the session's next turn isn't counted as superseding it
+            with self._lock:
+                if self._latest.get(turn.session) is turn:
+                    del self._latest[turn.session]
+
+    async def _run_in_worker(self, function : Callable, *args):
+
+        if self._workers.locked():
+            self.throttled += 1
+        await self._workers.acquire()
+
+        # the worker is given back when the job returns, not when the turn is cancelled: a cancelled job keeps
+        # running until it notices its cancel token, and the pool mustn't queue more work behind it meanwhile
+        future = self._executor.submit(function, *args)
+        future.add_done_callback(lambda _: self._loop.call_soon_threadsafe(self._workers.release))
+        job = asyncio.wrap_future(future, loop=self._loop)
+        try:
+            return await asyncio.shield(job)
+        except asyncio.CancelledError:
+            job.add_done_callback(lambda done: done.cancelled() or done.exception()) # an abandoned job's error is moot
+            raise
+
+    def _notify(self, turn : TurnRequest, state : str) -> None:
+
+        # only the latest turn drives the state, so a superseded turn can't end the newer one's thinking
+        def notify_if_latest():
+            if self._latest.get(turn.session, turn) is turn:
+                for listener in self._listeners:
+                    listener(turn, state)
+
+        if self._listeners:
+            self.dispatch(notify_if_latest)
@@ -0,0 +1,153 @@
+import builtins
+import contextlib
+import sys
+import threading
+import time
+
+
+class StartupProfiler:
+
+    """
+    Breaks Zero's startup time down into module imports and initialisation steps. Imports are timed by wrapping
+    the import statement, like `python -X importtime`: each module gets its cumulative time (including the modules
+    it imports) and its own time. What runs in background threads is reported apart, since it's off the path to
+    the window.
+
+    Parameters:
+
+        enabled (bool) : whether imports are being timed
+        started_at (float) : the time.perf_counter() value every time is relative to
+        imports (list) : (module, cumulative ms, own ms, thread name) of every timed import
+        steps (list) : (step, start ms, duration ms, thread name) of every measured initialisation step
+        marks (dict) : milliseconds since the start at which each milestone (e.g. "window shown") was reached
+
+    Public methods:
+
+        enable() -> None : starts timing the modules imported from now on
+        measure(name) -> contextmanager : times an initialisation step
+        mark(name) -> float : records a milestone, returning its time in milliseconds
+        report(background, top) -> str : formats the breakdown of the main thread, or of the background threads
+    """
+
+    def __init__(self):
+
+        self.enabled = False
+        self.started_at = time.perf_counter()
+        self.imports = []
+        self.steps = []
+        self.marks = {}
+
+        self._import = builtins.__import__
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def enable(self) -> None:
+
+        """
+        Starts timing the modules imported from now on. The modules already imported aren't reported.
+
+        Parameters:
+            None
+
+        Returned value:
+            None
+        """
+
+        if not self.enabled:
+            self.enabled = True
+            builtins.__import__ = self._timed_import
+
+    @contextlib.contextmanager
+    def measure(self, name : str):
+
+        """
+        Times an initialisation step; used as `with startup_profiler.measure("calendar service"): ...`. Steps are
+        always recorded, being cheap to measure.
+
+        Parameters:
+            name (str) : the name of the step
+
+        Returned value:
+            A context manager
+        """
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            with self._lock:
+                self.steps.append((name, 1000 * (start - self.started_at), 1000 * (end - start),
+                                   threading.current_thread().name))
+
+    def mark(self, name : str) -> float:
+
+        """
+        Records a milestone of the startup, the first time it's reached.
+
+        Parameters:
+            name (str) : the name of the milestone
+
+        Returned value:
+            Milliseconds from the start to the milestone
+        """
+
+        return self.marks.setdefault(name, 1000 * (time.perf_counter() - self.started_at))
+
+    def report(self, background : bool = False, top : int = 20) -> str:
+
+        """
+        Formats the breakdown of the startup.
+
+        Parameters:
+            background (bool) : reports the background threads instead of the main thread
+            top (int) : maximum number of imports listed, the slowest first
+
+        Returned value:
+            The report, ready to be printed
+        """
+
+        main = threading.main_thread().name
+        with self._lock:
+            imports = [entry for entry in self.imports if (entry[3] != main) == background]
+            steps = [entry for entry in self.steps if (entry[3] != main) == background]
+
+        lines = [f"--- startup profile ({'background threads' if background else 'main thread'}) ---"]
+        if imports:
+            lines.append(f"{'import':<40} {'cumulative':>12} {'own':>10}")
+            for module, cumulative, own, _ in sorted(imports, key=lambda entry: entry[1], reverse=True)[:top]:
+                lines.append(f"{module:<40} {cumulative:>9.1f} ms {own:>7.1f} ms")
+            lines.append(f"{len(imports)} modules imported, {sum(entry[2] for entry in imports):.1f} ms in total")
+        if steps:
+            lines.append(f"{'initialisation':<40} {'at':>12} {'duration':>10}")
+            for name, start, duration, _ in steps:
+                lines.append(f"{name:<40} {start:>9.1f} ms {duration:>7.1f} ms")
+        if not background:
+            for name, at in self.marks.items():
+                lines.append(f"{name:<40} {at:>9.1f} ms")
+        return "\n".join(lines)
+
+    # ===================================== private methods ===================================== #
+
+    def _timed_import(self, name, globals=None, locals=None, fromlist=(), level=0):
+
+        # only the first, absolute import of a module does any work; the others are passed straight through
+        if level != 0 or name in sys.modules:
+            return self._import(name, globals, locals, fromlist, level)
+
+        stack = self._local.__dict__.setdefault("stack", [])
+        stack.append(0.0) # time spent in the modules imported by this one
+        start = time.perf_counter()
+        try:
+            return self._import(name, globals, locals, fromlist, level)
+        finally:
+            cumulative = time.perf_counter() - start
+            nested = stack.pop()
+            if stack:
+                stack[-1] += cumulative
+            with self._lock:
+                self.imports.append((name, 1000 * cumulative, 1000 * (cumulative - nested),
+                                     threading.current_thread().name))
+
+
+startup_profiler = StartupProfiler()
@@ -1,13 +1,587 @@
-import speech_recognition as sr
-from gtts import gTTS
+from __future__ import annotations
+from collections import OrderedDict
+from config.config import ZeroConfig
+from utils.lazy import LazyModule
+from utils.listener import microphone_listener
+from utils.stt import STT_ENGINES
+from dataclasses import dataclass
+from typing import Callable, Iterable, Iterator
+import hashlib
+import io
+import logging
 import os
-import playsound
+import queue
+import re
+import shutil
+import subprocess
+import threading
+import time
 
+# imported on first use, so the window doesn't wait for them
+sr = LazyModule("speech_recognition")
+gtts = LazyModule("gtts")
+mixer = LazyModule("pygame.mixer")
+
+
+class TTSEngine:
+
+    """
+    Interface of the speech synthesisers. An engine turns a text into encoded audio, kept in memory.
+
+    Parameters:
+
+        name (str) : the name used to select the engine in the settings
+        extension (str) : the file extension of the audio it produces
+
+    Public methods:
+
+        synthesise(text, lang) -> bytes : returns the encoded audio of a text
+        available() -> bool : whether the engine can be used on this machine
+    """
+
+    name = ""
+    extension = ""
+
+    def available(self) -> bool:
+
+        """
+        Tells whether the engine can be used on this machine, e.g. whether its executable is installed.
+
+        Parameters:
+            None
+
+        Returned value:
+            True if the engine can synthesise speech
+        """
+
+        return True
+
+    def synthesise(self, text : str, lang : str) -> bytes:
+
+        """
+        Returns the encoded audio of a text.
+
+        Parameters:
+
+        text : the text to be spoken
+        lang : the language of the speech, as an ISO 639-1 code
+
+        Returned value:
+        The encoded audio. Raises an exception if the engine fails.
+        """
+
+        raise NotImplementedError
+
+
+class GoogleTTSEngine(TTSEngine):
+
+    """
+    Google Translate's speech (gTTS). Natural voice, but every synthesis is a network round-trip.
+    """
+
+    name = "gtts"
+    extension = ".mp3"
+
+    def synthesise(self, text : str, lang : str) -> bytes:
+
+        audio = io.BytesIO()
+        gtts.gTTS(text=text, lang=lang).write_to_fp(audio)
+        return audio.getvalue()
+
+
+class EspeakTTSEngine(TTSEngine):
+
+    """
+    Local speech through espeak-ng (or espeak), which writes a WAV stream to its standard output. Robotic voice,
+    but it works offline and in a few milliseconds.
+
+    Parameters:
+
+        executable (str) : path to the espeak-ng executable; looked up in the PATH when not given
+    """
+
+    name = "espeak"
+    extension = ".wav"
+
+    def __init__(self, executable : str | None = None):
+        self.executable = executable or shutil.which("espeak-ng") or shutil.which("espeak")
+
+    def available(self) -> bool:
+        return self.executable is not None
+
+    def synthesise(self, text : str, lang : str) -> bytes:
+
+        if self.executable is None:
+            raise RuntimeError("espeak-ng is not installed.")
+
+        # the text goes through stdin, so it's never parsed as options
+        flags = subprocess.CREATE_NO_WINDOW if os.name == "nt" else 0
+        result = subprocess.run([self.executable, "-v", lang, "--stdout"], input=text.encode(), capture_output=True,
+                                check=True, creationflags=flags)
+        return result.stdout
+
+
+TTS_ENGINES = {engine.name: engine for engine in [GoogleTTSEngine(), EspeakTTSEngine()]}
+
+
+class TTSCache:
+
+    """
+    Content-addressed cache of synthesised speech. The encoded audio of each utterance is stored under `path`,
+    named after the hash of (text, language, engine), so repeated sentences (acknowledgements, the greeting,
+    error messages) play without a new synthesis round-trip. The directory is bounded in size, evicting the
+    least recently used clips.
+
+    When the engine takes longer than `latency_budget` (or fails), the utterance is synthesised by the fallback
+    engine instead, and the engine is skipped for `fallback_cooldown` seconds. Its late clip is still cached.
+
+    Parameters:
+
+        path (str) : the directory keeping the audio files
+        max_bytes (int) : the maximum size of the directory; the least recently used clips are evicted beyond it
+        engine (str) : the name of the engine in TTS_ENGINES
+        fallback_engine (str) : the name of the local engine used when the engine is too slow; None disables it
+        latency_budget (float) : seconds the engine may take before the fallback engine is used
+        fallback_cooldown (float) : seconds the engine is skipped after missing its budget
+        hits (int) : number of utterances served from the cache
+        misses (int) : number of utterances which had to be synthesised
+        fallbacks (int) : number of utterances synthesised by the fallback engine
+
+    Public methods:
+
+        make_key(text, lang, engine) -> str : builds the cache key of an utterance
+        get(text, lang, engine) -> bytes : returns the encoded audio of an utterance, synthesising it if needed
+        prewarm(texts, lang, engine) -> threading.Thread : synthesises missing utterances in a background thread
+        stats() -> dict : returns the hit rate and the time saved
+    """
+
+    def __init__(self, path : str = ZeroConfig.TTS_CACHE_PATH, max_bytes : int = ZeroConfig.TTS_CACHE_MAX_BYTES,
+                 engine : str = ZeroConfig.TTS_ENGINE, fallback_engine : str | None = ZeroConfig.TTS_FALLBACK_ENGINE,
+                 latency_budget : float = ZeroConfig.TTS_LATENCY_BUDGET,
+                 fallback_cooldown : float = ZeroConfig.TTS_FALLBACK_COOLDOWN):
+
+        self.path = path
+        self.max_bytes = max_bytes
+        self.engine = engine
+        self.fallback_engine = fallback_engine if fallback_engine != engine else None
+        self.latency_budget = latency_budget
+        self.fallback_cooldown = fallback_cooldown
+
+        self.hits = 0
+        self.misses = 0
+        self.fallbacks = 0
+        self._synthesis_seconds = 0.0
+        self._hit_seconds = 0.0
+        self._skip_engine_until = 0.0
+
+        self._entries = OrderedDict() # key -> size in bytes, least recently used first
+        self._lock = threading.Lock()
+
+        os.makedirs(path, exist_ok=True)
+        extensions = tuple(engine.extension for engine in TTS_ENGINES.values())
+        files = [entry for entry in os.scandir(path) if entry.name.endswith(extensions)]
+        for entry in sorted(files, key=lambda entry: entry.stat().st_mtime):
+            self._entries[entry.name] = entry.stat().st_size
+
+    @staticmethod
+    def make_key(text : str, lang : str = ZeroConfig.TTS_LANGUAGE, engine : str = ZeroConfig.TTS_ENGINE) -> str:
+
+        """
+        Builds the cache key of an utterance.
+
+        Parameters:
+
+        text : the text to be spoken
+        lang : the language of the speech
+        engine : the engine synthesising the speech
+
+        Returned value:
+        The file name of the clip: the hexadecimal SHA-256 digest identifying the utterance, plus the engine's
+        file extension
+        """
+
+        return hashlib.sha256(f"{engine}\0{lang}\0{text}".encode()).hexdigest() + TTS_ENGINES[engine].extension
+
+    def get(self, text : str, lang : str = ZeroConfig.TTS_LANGUAGE, engine : str | None = None) -> bytes:
+
+        """
+        Returns the encoded audio of an utterance, synthesising it on a miss. New clips are written to the cache
+        in the background, so a miss never waits for the disk.
+
+        Parameters:
+
+        text : the text to be spoken
+        lang : the language of the speech
+        engine : the engine synthesising the speech; the cache's engine is used when not given
+
+        Returned value:
+        The encoded audio
+        """
+
+        start = time.perf_counter()
+        engine = engine or self.engine
+        audio = self._load(self.make_key(text, lang, engine))
+
+        if audio is not None:
+            with self._lock:
+                self.hits += 1
+                self._hit_seconds += time.perf_counter() - start
+            return audio
+
+        audio = self._synthesise(text, lang, engine)
+
+        with self._lock:
+            self.misses += 1
+            self._synthesis_seconds += time.perf_counter() - start
+        return audio
+
+    def prewarm(self, texts : Iterable[str], lang : str = ZeroConfig.TTS_LANGUAGE, engine : str | None = None) -> threading.Thread:
+
+        """
+        Synthesises the utterances missing from the cache in a background thread. If the engine fails (most likely
+        offline), the remaining utterances are synthesised by the fallback engine. Pre-warming doesn't count in the
+        hit rate.
+
+        Parameters:
+
+        texts : the utterances to be cached
+        lang : the language of the speech
+        engine : the engine synthesising the speech; the cache's engine is used when not given
+
+        Returned value:
+        The started thread
+        """
+
+        def run(engine):
+            for text in dict.fromkeys(texts):
+                while engine is not None:
+                    key = self.make_key(text, lang, engine)
+                    if key in self._entries:
+                        break
+                    try:
+                        self._store(key, TTS_ENGINES[engine].synthesise(text, lang))
+                        break
+                    except Exception as e:
+                        logging.warning(f"Couldn't pre-warm the speech of '{text}' with {engine}: {e}")
+                        engine = self.fallback_engine if engine != self.fallback_engine else None
+
+        thread = threading.Thread(target=run, args=(engine or self.engine,), name="zero-tts-prewarm", daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self) -> dict:
+
+        """
+        Returns the cache counters.
+
+        Parameters:
+            None
+
+        Returned value:
+            A dictionary with the number of hits, misses and fallbacks, the hit rate, the number of cached clips,
+            their size, and the milliseconds saved by the hits (the mean synthesis time minus the mean lookup time,
+            per hit)
+        """
+
+        lookups = self.hits + self.misses
+        mean_synthesis = self._synthesis_seconds / self.misses if self.misses else 0.0
+        mean_hit = self._hit_seconds / self.hits if self.hits else 0.0
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "fallbacks": self.fallbacks,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": len(self._entries),
+            "bytes": sum(self._entries.values()),
+            "saved_ms": 1000 * self.hits * max(mean_synthesis - mean_hit, 0.0),
+        }
+
+    # ===================================== private methods ===================================== #
+
+    def _filename(self, key : str) -> str:
+        return os.path.join(self.path, key)
+
+    def _load(self, key : str) -> bytes | None:
+
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+
+        try:
+            with open(self._filename(key), "rb") as file:
+                audio = file.read()
+            os.utime(self._filename(key)) # keeps the LRU order across restarts
+            return audio
+        except OSError: # evicted or removed in the meantime
+            with self._lock:
+                self._entries.pop(key, None)
+            return None
+
+    def _synthesise(self, text : str, lang : str, engine : str) -> bytes:
+
+        key = self.make_key(text, lang, engine)
+        result = {}
+        finished = None
+
+        # without a usable fallback there is nothing to switch to, so the engine is never skipped
+        if self.fallback_engine is None or engine == self.fallback_engine or not TTS_ENGINES[self.fallback_engine].available():
+            audio = TTS_ENGINES[engine].synthesise(text, lang)
+            threading.Thread(target=self._store, args=(key, audio), name="zero-tts-store", daemon=True).start()
+            return audio
+
+        if time.monotonic() >= self._skip_engine_until:
+            finished = threading.Event()
+
+            # the synthesis keeps running past the budget, so its clip is cached for the next time
+            def run():
+                try:
+                    result["audio"] = TTS_ENGINES[engine].synthesise(text, lang)
+                except Exception as e:
+                    result["error"] = e
+                finished.set()
+                if "audio" in result:
+                    self._store(key, result["audio"])
+
+            threading.Thread(target=run, name="zero-tts-synthesis", daemon=True).start()
+            if finished.wait(self.latency_budget) and "audio" in result:
+                return result["audio"]
+
+            self._skip_engine_until = time.monotonic() + self.fallback_cooldown
+            logging.warning(f"{engine} missed its {self.latency_budget}s budget ({result.get('error', 'timed out')}); "
+                            f"using {self.fallback_engine} for the next {self.fallback_cooldown}s.")
+
+        with self._lock:
+            self.fallbacks += 1
+        try:
+            return self._load(self.make_key(text, lang, self.fallback_engine)) or self._synthesise(text, lang, self.fallback_engine)
+        except Exception as e:
+            # without a working fallback, the late clip is still better than silence
+            if finished is not None:
+                if finished.wait() and "audio" in result:
+                    return result["audio"]
+                raise
+
+            # the engine was skipped during its cooldown: it's tried again rather than staying silent
+            logging.warning(f"{self.fallback_engine} failed ({e}); using {engine} again.")
+            self._skip_engine_until = 0.0
+            return self._synthesise(text, lang, engine)
+
+    def _store(self, key : str, audio : bytes) -> None:
+
+        # the clip is only registered once it's completely written, so it's never read half-written
+        try:
+            with open(self._filename(key), "wb") as file:
+                file.write(audio)
+        except OSError as e:
+            logging.warning(f"Couldn't cache a speech clip: {e}")
+            return
+
+        with self._lock:
+            self._entries[key] = len(audio)
+            self._entries.move_to_end(key)
+            evicted = []
+            while sum(self._entries.values()) > self.max_bytes and len(self._entries) > 1:
+                evicted.append(self._entries.popitem(last=False)[0])
+
+        for old_key in evicted:
+            try:
+                os.remove(self._filename(old_key))
+            except OSError:
+                pass
+
+
+@dataclass
+class PlaybackEvent:
+
+    """
+    Published by the audio player while Zero speaks.
+
+    Parameters:
+
+        kind (str) : "start" when a clip starts, "progress" while it plays, "stop" once nothing is left to play
+        position (float) : seconds of the clip played so far
+        duration (float) : length of the clip in seconds, read from the decoded audio
+    """
+
+    kind: str
+    position: float = 0.0
+    duration: float = 0.0
+
+
+class AudioPlayer:
+
+    """
+    Plays encoded audio straight from memory through pygame's mixer. Clips are played one at a time from a
+    queue by a single thread, so overlapping speak() calls (e.g. the greeting and an error message) are spoken
+    one after the other instead of competing for the speakers.
+
+    Listeners receive a PlaybackEvent when a clip starts, regularly while it plays, and when playback stops.
+    Clips queued back to back (the sentences of a pipelined answer) don't publish a stop between them.
+
+    Parameters:
+
+        progress_interval (float) : seconds between two progress events
+
+    Public methods:
+
+        play(audio, cancel_token) -> None : plays a clip after the ones already queued, blocking until it ends
+        stop() -> None : stops the clip being played
+        add_listener(listener) -> None : registers a function called with every PlaybackEvent
+    """
+
+    def __init__(self, progress_interval : float = 0.25):
+
+        self.progress_interval = progress_interval
+
+        self._clips = queue.Queue()
+        self._channel = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._listeners = []
+        self._playing = False
+
+    def play(self, audio : bytes, cancel_token = None) -> None:
+
+        """
+        Plays a clip after the ones already queued, blocking until it has been played.
+
+        Parameters:
+
+        audio : the encoded audio (MP3, OGG or WAV)
+        cancel_token : chat.client.CancelToken which skips or interrupts the clip when cancelled
+
+        Returned value:
+        None
+        """
+
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="zero-audio", daemon=True)
+                self._thread.start()
+
+        done = threading.Event()
+        self._clips.put((audio, cancel_token, done))
+        done.wait()
+
+    def stop(self) -> None:
+
+        """
+        Stops the clip being played, if any.
+
+        Parameters:
+            None
+
+        Returned value:
+            None
+        """
+
+        channel = self._channel
+        if channel is not None:
+            channel.stop()
+
+    def add_listener(self, listener : Callable[[PlaybackEvent], None]) -> None:
+
+        """
+        Registers a function called with every PlaybackEvent. It's called from the audio thread.
+
+        Parameters:
+            listener (Callable) : the function to be called
+
+        Returned value:
+            None
+        """
+
+        self._listeners.append(listener)
+
+    # ===================================== private methods ===================================== #
+
+    def _run(self) -> None:
+
+        while True:
+            audio, cancel_token, done = self._clips.get()
+            try:
+                if cancel_token is None or not cancel_token.cancelled:
+                    self._play(audio, cancel_token)
+            except Exception as e:
+                print(f"Unexpected error caught: {e}")
+            finally:
+                done.set()
+
+            # the next sentence of a pipelined answer may still be synthesising, so a short gap isn't a stop
+            if self._playing and self._clips.empty():
+                time.sleep(0.05)
+            if self._playing and self._clips.empty():
+                self._playing = False
+                self._publish(PlaybackEvent("stop"))
+
+    def _play(self, audio : bytes, cancel_token) -> None:
+
+        # the music player may have closed the mixer
+        if mixer.get_init() is None:
+            mixer.init()
+
+        sound = mixer.Sound(file=io.BytesIO(audio))
+        duration = sound.get_length()
+        self._channel = sound.play()
+        start = time.monotonic()
+        self._playing = True
+        self._publish(PlaybackEvent("start", 0.0, duration))
+
+        next_progress = start + self.progress_interval
+        while self._channel is not None and self._channel.get_busy():
+            if cancel_token is not None and cancel_token.cancelled:
+                self._channel.stop()
+                break
+            time.sleep(0.01)
+            now = time.monotonic()
+            if now >= next_progress:
+                self._publish(PlaybackEvent("progress", min(now - start, duration), duration))
+                next_progress = now + self.progress_interval
+        self._channel = None
+
+    def _publish(self, event : PlaybackEvent) -> None:
+
+        for listener in self._listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                logging.error(f"Playback listener failed: {e}")
+
+
+tts_cache = TTSCache()
+audio_player = AudioPlayer()
+
+
+def recognise(audio : sr.AudioData) -> str:
+
+    """
+    Converts an utterance to text (STT), with the engine selected in the settings. The utterance is finished, so
+    only the final transcript is computed; the engines' stream() isn't used here.
+
+    Parameters:
+
+    audio : the utterance captured by the microphone listener
+
+    Returned value:
+    String containing the detected speech
+    """
+
+    user_speech = ""
+    try:
+        user_speech = STT_ENGINES[ZeroConfig.STT_ENGINE].transcribe(audio)
+        print(user_speech)
+    except sr.UnknownValueError:
+        return "Bot: Sorry, I did not get that."
+    except sr.RequestError:
+        return "Bot: Sorry, the service is not available"
+    return user_speech.lower()
 
 def get_audio() -> str:
 
     """
-    Gets audio from microphone and converts to text (STT)
+    Gets audio from microphone and converts to text (STT). The microphone is opened and calibrated once, by the
+    shared listener, so only the first call waits for the calibration.
 
     Parameters:
     None
@@ -16,49 +590,163 @@ def get_audio() -> str:
     String containing the detected speech
     """
 
-    r = sr.Recognizer()
-    with sr.Microphone() as source:
-        r.pause_threshold = 1
-        # wait for a second to let the recognizer adjust the
-        # energy threshold based on the surrounding noise level
-        r.adjust_for_ambient_noise(source, duration=1)
-        audio = r.listen(source)
-        user_speech = ""
+    utterance = microphone_listener.listen_once()
+    if utterance is None:
+        return "Bot: Sorry, the microphone is not available"
+    return recognise(utterance.audio)
+
+def split_sentences(text : str, min_length : int = 20) -> list[str]:
+
+    """
+    Splits a text into sentences to be synthesised one by one. Fragments shorter than `min_length` are joined to
+    the following sentence, so short interjections don't cost a synthesis round-trip of their own.
+
+    Parameters:
+
+    text : the text to be split
+    min_length : the minimum length of a chunk, in characters
+
+    Returned value:
+    The list of chunks, in order
+    """
+
+    chunks = []
+    pending = ""
+    for sentence in re.split(r"(?<=[.!?;:])\s+|\n+", text.strip()):
+        pending = f"{pending} {sentence}".strip() if pending else sentence.strip()
+        if len(pending) >= min_length:
+            chunks.append(pending)
+            pending = ""
+
+    if pending:
+        if chunks and len(pending) < min_length:
+            chunks[-1] = f"{chunks[-1]} {pending}"
+        else:
+            chunks.append(pending)
+
+    return chunks
+
+
+def synthesise_ahead(chunks : Iterable[str], depth : int = ZeroConfig.TTS_PIPELINE_DEPTH,
+                     cancel_token = None) -> Iterator[str]:
+
+    """
+    Synthesises text chunks in a producer thread, at most `depth` chunks ahead of the consumer, so chunk N+1 is
+    synthesised while chunk N plays.
+
+    Parameters:
+
+    chunks : the texts to be synthesised, in order
+    depth : the size of the queue between synthesis and playback
+    cancel_token : chat.client.CancelToken which stops the synthesis when the turn is superseded
+
+    Returned value:
+    A generator of the synthesised clips, in order. Synthesis errors are raised by the generator.
+    """
+
+    clips = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+    done = object()
+
+    def send(item):
+        # the queue is bounded, so this waits while playback catches up, and gives up once the consumer has stopped
+        while not stop.is_set():
+            try:
+                clips.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def produce():
         try:
-            user_speech = r.recognize_google(audio)
-            print(user_speech)
-        except sr.UnknownValueError:
-            return "Bot: Sorry, I did not get that."
-        except sr.RequestError:
-            return "Bot: Sorry, the service is not available"
-    return user_speech.lower()
+            for chunk in chunks:
+                if stop.is_set() or (cancel_token is not None and cancel_token.cancelled):
+                    break
+                send(tts_cache.get(chunk))
+        except Exception as e:
+            send(e)
+        send(done)
+
+    threading.Thread(target=produce, name="zero-tts-producer", daemon=True).start()
+
+    try:
+        while (clip := clips.get()) is not done:
+            if isinstance(clip, Exception):
+                raise clip
+            yield clip
+    finally:
+        stop.set()
+
 
 #speak converted audio to text
-def speak(text) -> None:
+def speak(text, cancel_token = None) -> None:
 
     """
-    Gets a text and converts it to an audio file (TTS)
+    Gets a text and converts it to audio (TTS). In pipelined mode the text is spoken sentence by sentence, the
+    next sentence being synthesised while the current one plays, so the first sound comes after a single
+    sentence's synthesis whatever the length of the answer.
 
     Parameters:
 
     text : text to be converted to audio
+    cancel_token : chat.client.CancelToken which stops the speech when the turn is superseded
 
     Returned value:
     None
     """
 
-    tts = gTTS(text=text, lang='en')
-    filename = "data/voice.mp3"
-    try:
-        os.remove(filename)
-    except OSError:
-        pass
-    tts.save(filename)
-    try:
-        playsound.playsound(os.path.join(os.getcwd(), filename))
-    except playsound.PlaysoundException as pe:
-        print(f"Unexpected error caught: {pe}")
-        playsound.playsound(os.path.join(os.getcwd(), filename)) # retry playing audio if it fails to read it
+    # sentences already spoken before are played from the cache, without a new synthesis round-trip
+    if not ZeroConfig.TTS_PIPELINE:
+        audio_player.play(tts_cache.get(text), cancel_token)
+        return
+
+    for audio in synthesise_ahead(split_sentences(text), cancel_token=cancel_token):
+        if cancel_token is not None and cancel_token.cancelled:
+            break
+        audio_player.play(audio, cancel_token)
+
+
+def benchmark_engines(texts : list[str], lang : str = ZeroConfig.TTS_LANGUAGE) -> dict:
+
+    """
+    Measures the synthesis latency of every engine, bypassing the cache.
+
+    Parameters:
+
+    texts : the sentences to be synthesised by each engine
+    lang : the language of the speech
+
+    Returned value:
+    A dictionary with, for each engine, the mean latency per sentence and per character in milliseconds, and
+    the number of failed syntheses
+    """
+
+    results = {}
+
+    for name, engine in TTS_ENGINES.items():
+        elapsed = 0.0
+        sentences = 0
+        characters = 0
+        errors = 0
+        for text in texts:
+            start = time.perf_counter()
+            try:
+                engine.synthesise(text, lang)
+            except Exception as e:
+                logging.warning(f"{name} failed to synthesise '{text}': {e}")
+                errors += 1
+                continue
+            elapsed += time.perf_counter() - start
+            sentences += 1
+            characters += len(text)
+
+        results[name] = {
+            "ms_per_sentence": 1000 * elapsed / sentences if sentences else None,
+            "ms_per_char": 1000 * elapsed / characters if characters else None,
+            "errors": errors,
+        }
+
+    return results
 
 
 # testing TTS and STT
@@ -67,7 +755,7 @@ if __name__ == "__main__":
     keep = True
 
     while keep:
-        option = input("Select an option:\n1 - TTS\n2 - STT\n0 - Exit\nAnswer: ")
+        option = input("Select an option:\n1 - TTS\n2 - STT\n3 - Benchmark TTS engines\n0 - Exit\nAnswer: ")
 
         if option == "1":
             text = input("Type something...: ")
@@ -75,7 +763,14 @@ if __name__ == "__main__":
         elif option == "2":
             text = get_audio()
             print(f"Extracted text: {text}")
+        elif option == "3":
+            sentences = ["Opening program...", "Playlist stopped.",
+                         "Hello! My name is Zero, and I'm your personal assistant. Let's talk!",
+                         "Right, I'm opening the page right now. If it doesn't show up, it either means the page doesn't exist or that it can't be reached."]
+            for name, result in benchmark_engines(sentences).items():
+                print(f"{name}: {result}")
         elif option == "0":
             keep = False
+            print(f"TTS cache: {tts_cache.stats()}")
         else:
             print("Invalid option")
@@ -1,18 +1,17 @@
-from chat.chat import Config
-import requests
-import time
+from chat.warmup import model_warmer
+from config.config import ZeroConfig
+from utils.lazy import LazyResource
+import json
 import os
-from google.auth.transport.requests import Request
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 
 SCOPES = ["https://www.googleapis.com/auth/calendar"]
+TOKEN_PATH = "utils/token.json"
 
 def initial_load() -> None:
 
     """
-    Loads the initial configurations for the model.
+    Loads the initial configurations for the model, blocking until it's ready. The GUI doesn't need it, as it
+    starts chat.warmup.model_warmer in the background instead.
 
     Parameters:
     None
@@ -21,38 +20,27 @@ def initial_load() -> None:
     None
     """
 
-    headers = {"Authorization": f"Bearer {Config.HUGGINGFACE_INFERENCE_TOKEN}"}
-
-    initial_payload = {
-        "inputs": "Welcome"
-    }
-
-    try:
-        response = requests.post(Config.API_URL_INSTRUCT, headers=headers, json=initial_payload, verify=False)
-        if response.status_code != 200 and "is currently loading" in response.text:
-            print(f"Loading conversational model. It's going to take about {response.json()['estimated_time']} seconds")
-            loading_time = float(response.json()["estimated_time"])
-            start_time = time.time()
-            end_time = start_time
-            while end_time - start_time < loading_time:
-                print(f"Loading model... {int(100 * (end_time - start_time) / loading_time)}%")
-        elif response.status_code == 200:
-            print("Model is already loaded.\n")
-        else:
-            raise Exception(response.text)
-    except Exception as e:
-        raise SystemExit(f"Fatal: The model couldn't be loaded.\nError info: {e}")
+    model_warmer.start()
+    if not model_warmer.wait_until_ready():
+        raise SystemExit(f"Fatal: The model couldn't be loaded.\nModel state: {model_warmer.state}")
+    print("Model is loaded.\n")
     
 def start_calendar_service():
   """
-  Starts the Google Calendar API, returning the service object.
+  Starts the Google Calendar API, returning the service object. The Google client libraries take a few hundred
+  milliseconds to import, so they're only imported here; use calendar_service rather than calling it directly.
   """
+  from google.auth.transport.requests import Request
+  from google.oauth2.credentials import Credentials
+  from google_auth_oauthlib.flow import InstalledAppFlow
+  from googleapiclient.discovery import build
+
   creds = None
   # The file token.json stores the user's access and refresh tokens, and is
   # created automatically when the authorization flow completes for the first
   # time.
-  if os.path.exists("utils/token.json"):
-    creds = Credentials.from_authorized_user_file("utils/token.json", SCOPES)
+  if os.path.exists(TOKEN_PATH):
+    creds = Credentials.from_authorized_user_file(TOKEN_PATH, SCOPES)
   # If there are no (valid) credentials available, let the user log in.
   if not creds or not creds.valid:
     if creds and creds.expired and creds.refresh_token:
@@ -61,10 +49,28 @@ def start_calendar_service():
       flow = InstalledAppFlow.from_client_secrets_file(
           "utils/credentials.json", SCOPES
       )
-      creds = flow.run_local_server(port=0)
+      # the sign-in page gives up after a while, so a calendar command never waits for it forever
+      creds = flow.run_local_server(port=0, timeout_seconds=ZeroConfig.CALENDAR_SIGN_IN_TIMEOUT)
     # Save the credentials for the next run
-    with open("utils/token.json", "w") as token:
+    with open(TOKEN_PATH, "w") as token:
       token.write(creds.to_json())
 
   
-  return build("calendar", "v3", credentials=creds)
\ No newline at end of file
+  return build("calendar", "v3", credentials=creds)
+
+
+def calendar_sign_in_needed() -> bool:
+  """
+  Tells whether starting the Google Calendar service would need the user to sign in, i.e. there's no saved token
+  which can be refreshed without them. It only reads the token file, without importing the Google libraries.
+  """
+  try:
+    with open(TOKEN_PATH, "r") as token:
+      return not json.load(token).get("refresh_token")
+  except (OSError, ValueError):
+    return True
+
+
+# created on its first use, or prefetched in the background once the window is shown (unless the user has to sign
+# in, which waits for the first calendar command)
+calendar_service = LazyResource("calendar service", start_calendar_service)
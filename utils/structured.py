@@ -0,0 +1,399 @@
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any
+import ast
+import json
+import re
+
+
+class CommandSchemaError(ValueError):
+
+    """
+    Raised when the model's output cannot be turned into a valid command, even after repairing it.
+    """
+
+
+@dataclass(frozen=True)
+class Argument:
+
+    """
+    An argument of a command.
+
+    Parameters:
+
+        name (str) : the argument name, as shown to the model
+        kind (str) : one of "text", "integer", "minutes" (a duration), "datetime" or "choice"
+        required (bool) : whether the command is rejected when the argument is missing
+        default (Any) : the value used when an optional argument is missing
+        choices (tuple) : the accepted values of a "choice" argument
+    """
+
+    name: str
+    kind: str = "text"
+    required: bool = True
+    default: Any = None
+    choices: tuple = ()
+
+
+@dataclass(frozen=True)
+class CommandSpec:
+
+    """
+    A command Zero can execute.
+
+    Parameters:
+
+        description (str) : what the command does, as shown to the model
+        arguments (tuple) : the command arguments, in positional order
+    """
+
+    description: str
+    arguments: tuple = ()
+
+
+@dataclass
+class CommandCall:
+
+    """
+    A validated command, ready to be executed.
+
+    Parameters:
+
+        function (str) : the command name
+        arguments (dict) : the typed arguments, with defaults filled in
+    """
+
+    function: str
+    arguments: dict = field(default_factory=dict)
+
+    def __str__(self) -> str:
+        return f"{self.function}({', '.join(f'{name}={value!r}' for name, value in self.arguments.items())})"
+
+
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+# the words _to_minutes() understands in a duration, in minutes per unit
+DURATION_UNITS = {**dict.fromkeys(["m", "min", "mins", "minute", "minutes"], 1),
+                  **dict.fromkeys(["h", "hr", "hrs", "hour", "hours"], 60),
+                  **dict.fromkeys(["d", "day", "days"], 24 * 60)}
+DURATION_NUMBERS = {"one": 1, "two": 2, "three": 3, "four": 4, "five": 5, "six": 6, "seven": 7, "eight": 8, "nine": 9,
+                    "ten": 10, "fifteen": 15, "twenty": 20, "thirty": 30, "forty": 40, "fifty": 50, "sixty": 60,
+                    "ninety": 90}
+DURATION_FRACTIONS = {"half": 0.5, "quarter": 0.25}
+
+# inputs mentioning a date or a time of day need the current date to be resolved; the current time is only needed
+# by the ones counting from now
+RELATIVE_DATE = re.compile(r"\b(?:today|tonight|tomorrow|yesterday|weekend|next|this (?:week|month|morning|afternoon|evening)|"
+                           r"monday|tuesday|wednesday|thursday|friday|saturday|sunday|noon|midnight|o'clock|[ap]\.?m\b|"
+                           r"remind|schedule|event|meeting|appointment|task|at \d|on the \d|in (?:a|\d+|\w+) (?:days?|weeks?))",
+                           re.IGNORECASE)
+RELATIVE_TIME = re.compile(r"\b(?:in|within) (?:an?|half an|\d+(?:\.\d+)?|\w+) (?:minutes?|mins?|hours?|hrs?)\b|\bnow\b",
+                           re.IGNORECASE)
+
+COMMAND_SCHEMA = {
+    "open_page": CommandSpec("open a web page", (Argument("page"),)),
+    "open_app": CommandSpec("open a program", (Argument("name"),)),
+    "close_app": CommandSpec("close a program", (Argument("name"),)),
+    "open_folder": CommandSpec("open a folder", (Argument("folder_name"),)),
+    "empty_recycle_bin": CommandSpec("clear the recycle bin"),
+    "get_current_time": CommandSpec("get the current time and date"),
+    "get_next_events": CommandSpec("get the next events in the calendar over a period of time", (
+        Argument("period", "choice", required=False, default="day", choices=("day", "week")),
+        Argument("number_of_events", "integer", required=False),
+    )),
+    "set_new_event": CommandSpec("set a new task, as well as its start date, duration and reminder", (
+        Argument("name"),
+        Argument("start_date", "datetime"),
+        Argument("duration", "minutes", required=False, default=60),
+        Argument("reminder", "minutes", required=False, default=10),
+    )),
+    "stop_playlist": CommandSpec("stop current playlist"),
+    "start_playlist": CommandSpec("start a playlist", (Argument("playlist", required=False, default="default"),)),
+    "play_song": CommandSpec("find a song in a playlist by its name and artist and play it", (
+        Argument("name"),
+        Argument("artist"),
+        Argument("playlist", required=False, default="default"),
+    )),
+    "get_song_info": CommandSpec("get the info of song being played"),
+}
+
+_KIND_HINTS = {
+    "text": "string",
+    "integer": "integer or null",
+    "minutes": "duration in minutes",
+    "datetime": '"YYYY-mm-dd HH:MM:SS"',
+}
+
+
+def build_command_prompt(user_input : str, now : datetime | None = None) -> str:
+
+    """
+    Builds the prompt asking the model to choose a command and fill in its typed arguments, as a single JSON object.
+
+    Parameters:
+
+    user_input : the command typed or said by the user
+    now : the reference date for relative dates; the current time is used when not given. It's only part of the
+          prompt when the input needs it
+
+    Returned value:
+    The prompt to be sent to the model
+    """
+
+    function_list = []
+    for function, spec in COMMAND_SCHEMA.items():
+        arguments = ", ".join(f'"{argument.name}": {" | ".join(map(json.dumps, argument.choices)) or _KIND_HINTS[argument.kind]}'
+                              for argument in spec.arguments)
+        function_list.append(f'- "{function}" {{{arguments}}} to {spec.description}.')
+    function_list = "\n".join(function_list)
+
+    # the prompt is the key of the response cache, so the reference date is left out when the input doesn't need
+    # it, and only has the time of day when the input counts from now
+    reference_date = ""
+    if RELATIVE_TIME.search(user_input):
+        reference_date = (now or datetime.now()).strftime("%A, %Y-%m-%d %H:%M")
+    elif RELATIVE_DATE.search(user_input):
+        reference_date = (now or datetime.now()).strftime("%A, %Y-%m-%d")
+    if reference_date:
+        reference_date = f"\nThe current date is {reference_date}; resolve relative dates against it."
+
+    return f"""<|im_start|>system
+You are an AI assistant. Analyze the user's input and determine which function to call. Answer only with a JSON object
+in the format {{"function": "<name>", "arguments": {{...}}}}, without any other text.{reference_date}
+Functions:
+{function_list}<|im_end|>
+<|im_start|>user
+{user_input}<|im_end|>
+<|im_start|>assistant
+"""
+
+
+def parse_command(output : str) -> CommandCall:
+
+    """
+    Parses and validates the command chosen by the model. Common defects are repaired: code fences and text around
+    the JSON object, single quotes, trailing commas, and the legacy `function(arg1, arg2)` format; argument values
+    are converted to their types and defaults are filled in.
+
+    Parameters:
+
+    output : the text generated by the model
+
+    Returned value:
+    The validated command. Raises CommandSchemaError if the output can't be repaired.
+    """
+
+    raw = _load_json(output)
+    if raw is None:
+        raw = _load_call(output)
+    if raw is None:
+        raise CommandSchemaError(f"No command found in the model's output: {output.strip()[:200]}")
+
+    return validate_command(raw.get("function"), raw.get("arguments"))
+
+
+def validate_command(function : str, arguments : dict | list | None) -> CommandCall:
+
+    """
+    Validates a command against COMMAND_SCHEMA, converting its arguments to their types.
+
+    Parameters:
+
+    function : the command name
+    arguments : the arguments, either by name or in positional order; a single value is taken as the first argument
+
+    Returned value:
+    The validated command. Raises CommandSchemaError if the command is unknown or a required argument is invalid.
+    """
+
+    function = str(function or "").strip().strip("()").lower()
+    spec = COMMAND_SCHEMA.get(function)
+    if spec is None:
+        raise CommandSchemaError(f"Unknown command: '{function}'.")
+
+    if isinstance(arguments, (str, int, float)):
+        arguments = [arguments]
+    if isinstance(arguments, (list, tuple)):
+        arguments = dict(zip((argument.name for argument in spec.arguments), arguments))
+    elif not isinstance(arguments, dict) and arguments is not None:
+        raise CommandSchemaError(f"Invalid arguments for {function}: {arguments!r}")
+    arguments = {str(name).lower(): value for name, value in (arguments or {}).items()}
+
+    values = {}
+    for argument in spec.arguments:
+        try:
+            value = _convert(argument, arguments.get(argument.name))
+        except (TypeError, ValueError) as e:
+            raise CommandSchemaError(f"Invalid value for '{argument.name}' in {function}: {e}")
+
+        if value is None and argument.required:
+            raise CommandSchemaError(f"Missing required argument '{argument.name}' in {function}.")
+        values[argument.name] = argument.default if value is None else value
+
+    return CommandCall(function, values)
+
+
+# ===================================== private functions ===================================== #
+
+def _load_json(output : str) -> dict | None:
+
+    start = output.find("{")
+    end = output.rfind("}")
+    if start == -1 or end < start:
+        return None
+
+    text = output[start:end + 1]
+    for load in [json.loads, lambda text: json.loads(_relax_json(text)), _load_literal]:
+        try:
+            loaded = load(text)
+            return loaded if isinstance(loaded, dict) else None
+        except (ValueError, SyntaxError):
+            continue
+
+    return None
+
+
+def _relax_json(text : str) -> str:
+
+    text = re.sub(r",\s*([}\]])", r"\1", text) # trailing commas
+    return re.sub(r"\bNone\b", "null", text)
+
+
+def _load_literal(text : str) -> Any:
+
+    # Python-style objects ('single quotes', True, None), as models often write them; the quotes are parsed rather
+    # than swapped, so apostrophes inside the values survive
+    return _literal(ast.parse(text.strip(), mode="eval").body)
+
+
+def _literal(node : ast.AST, bare_names : bool = False) -> Any:
+
+    # JSON's null, true and false are accepted as names; other names are only accepted (as strings) when
+    # `bare_names` is set, e.g. for the unquoted arguments of `open_app(notepad)`
+    names = {"null": None, "none": None, "true": True, "false": False}
+
+    if isinstance(node, ast.Dict):
+        return {_literal(key): _literal(value) for key, value in zip(node.keys, node.values)}
+    if isinstance(node, (ast.List, ast.Tuple)):
+        return [_literal(element) for element in node.elts]
+    if isinstance(node, ast.Constant):
+        return node.value
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub) and isinstance(node.operand, ast.Constant):
+        return -node.operand.value
+    if isinstance(node, ast.Name) and node.id.lower() in names:
+        return names[node.id.lower()]
+    if isinstance(node, ast.Name) and bare_names:
+        return node.id
+    raise ValueError(f"unexpected {type(node).__name__} in the command")
+
+
+def _load_call(output : str) -> dict | None:
+
+    functions = "|".join(COMMAND_SCHEMA)
+    match = re.search(rf"\b({functions})\s*\((.*?)\)", output, re.DOTALL)
+    if match is None:
+        return None
+
+    # parsed as a Python call, ending at the first closing parenthesis which completes it, so quoted values may hold
+    # commas and parentheses
+    end = output.find(")", match.start(2))
+    while end != -1:
+        try:
+            call = ast.parse(output[match.start(1):end + 1], mode="eval").body
+        except SyntaxError:
+            end = output.find(")", end + 1)
+            continue
+        try:
+            names = [argument.name for argument in COMMAND_SCHEMA[match.group(1)].arguments]
+            arguments = dict(zip(names, (_literal(value, bare_names=True) for value in call.args)))
+            arguments.update((keyword.arg, _literal(keyword.value, bare_names=True)) for keyword in call.keywords)
+            return {"function": match.group(1), "arguments": arguments}
+        except (ValueError, TypeError):
+            break
+
+    # unquoted text, e.g. `play_song(Hey Jude, The Beatles)`, split on the commas
+    arguments = []
+    for value in re.findall(r'"[^"]*"|\'[^\']*\'|[^,]+', match.group(2)):
+        value = value.strip().strip("\"'")
+        value = value.split("=", 1)[1].strip().strip("\"'") if re.match(r"^\w+\s*=", value) else value
+        arguments.append(value)
+
+    return {"function": match.group(1), "arguments": arguments}
+
+
+def _convert(argument : Argument, value : Any) -> Any:
+
+    if value is None or (isinstance(value, str) and value.strip().lower() in ["", "null", "none", argument.name]):
+        return None
+
+    if argument.kind == "text":
+        return str(value).strip()
+
+    if argument.kind == "integer":
+        if isinstance(value, (int, float)):
+            return int(value)
+        digits = re.findall(r"\d+", str(value))
+        return int(digits[0]) if digits else None
+
+    if argument.kind == "choice":
+        # whole words only (plurals included), so e.g. "weekday" isn't taken for "day"
+        value = str(value).strip().lower()
+        matches = [choice for choice in argument.choices if re.search(rf"\b{re.escape(choice)}s?\b", value)]
+        if len(matches) != 1:
+            raise ValueError(f"expected one of {', '.join(argument.choices)}, got '{value}'")
+        return matches[0]
+
+    if argument.kind == "minutes":
+        return _to_minutes(value)
+
+    if argument.kind == "datetime":
+        text = str(value).strip().replace("T", " ")
+        for date_format in [DATE_FORMAT, "%Y-%m-%d %H:%M", "%Y-%m-%d"]:
+            try:
+                return datetime.strptime(text[:19], date_format)
+            except ValueError:
+                continue
+        raise ValueError(f"expected a date in the format YYYY-mm-dd HH:MM:SS, got '{value}'")
+
+    raise ValueError(f"unknown argument kind '{argument.kind}'")
+
+
+def _to_minutes(value : Any) -> int:
+
+    # reads durations such as "90", "1.5 h", "1h30", "half an hour", "an hour and a half" or "2 hours 15 minutes":
+    # each quantity is multiplied by the unit which follows it, and a quantity with no unit counts as minutes
+    if isinstance(value, (int, float)):
+        return int(value)
+
+    text = str(value).strip().lower()
+    clock = re.fullmatch(r"(\d+):(\d{2})", text)
+    if clock:
+        return int(clock.group(1)) * 60 + int(clock.group(2))
+
+    total, amount, unit, after_and, found = 0.0, None, None, False, False
+    for token in re.findall(r"\d+(?:\.\d+)?|[a-z]+", text):
+        fraction = DURATION_FRACTIONS.get(token.rstrip("s"))
+        if re.fullmatch(r"\d+(?:\.\d+)?", token) or token in DURATION_NUMBERS:
+            if amount is not None: # consecutive numbers add up, e.g. "twenty five"
+                total += amount
+            amount = float(token) if token[0].isdigit() else DURATION_NUMBERS[token]
+        elif fraction is not None:
+            if after_and and amount is not None: # "one and a half hours"
+                amount += fraction
+            elif after_and and unit is not None: # "an hour and a half"
+                total += fraction * unit
+            else: # "half an hour", "three quarters of an hour"
+                amount = fraction * (amount if amount is not None else 1)
+            after_and = False
+        elif token in DURATION_UNITS:
+            total += (amount if amount is not None else 1) * DURATION_UNITS[token]
+            amount, unit, after_and = None, DURATION_UNITS[token], False
+        elif token == "and":
+            after_and = True
+        else: # articles and filler words ("a", "an", "of", "for"...)
+            continue
+        found = True
+
+    if not found:
+        raise ValueError(f"expected a duration, got '{value}'")
+    return int(round(total + (amount or 0)))
@@ -0,0 +1,267 @@
+from __future__ import annotations
+from config.config import ZeroConfig
+from typing import Iterable, Iterator
+from utils.lazy import LazyModule
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import wave
+
+sr = LazyModule("speech_recognition") # imported on first use, so the window doesn't wait for it
+
+
+class STTEngine:
+
+    """
+    Interface of the speech recognisers. An engine converts an utterance to text, and may also transcribe audio
+    while it's being captured, giving partial transcripts.
+
+    Parameters:
+
+        name (str) : the name used to select the engine in the settings
+
+    Public methods:
+
+        transcribe(audio) -> str : returns the transcript of an utterance
+        stream(chunks, sample_rate, sample_width) -> Iterator[tuple[str, bool]] : transcribes audio as it arrives
+    """
+
+    name = ""
+
+    def transcribe(self, audio : sr.AudioData) -> str:
+
+        """
+        Returns the transcript of an utterance.
+
+        Parameters:
+
+        audio : the utterance
+
+        Returned value:
+        The transcript. Raises sr.UnknownValueError if no speech was understood, and sr.RequestError if the engine
+        is unavailable.
+        """
+
+        raise NotImplementedError
+
+    def stream(self, chunks : Iterable[bytes], sample_rate : int, sample_width : int) -> Iterator[tuple[str, bool]]:
+
+        """
+        Transcribes audio as it arrives. Engines without partial results only yield the final transcript.
+        The assistant doesn't use it yet: the microphone listener only delivers finished utterances, which go
+        through transcribe(), so no partial transcript is shown while the user speaks.
+
+        Parameters:
+
+        chunks : the raw audio chunks (mono PCM), in order
+        sample_rate : the sample rate of the audio
+        sample_width : the number of bytes per sample
+
+        Returned value:
+        A generator of (transcript, final) tuples: partial transcripts while the audio arrives, then the final one
+        """
+
+        yield self.transcribe(sr.AudioData(b"".join(chunks), sample_rate, sample_width)), True
+
+
+class GoogleSTTEngine(STTEngine):
+
+    """
+    Google's web speech API. Accurate, but every utterance is a network round-trip, and it doesn't work offline.
+    """
+
+    name = "google"
+
+    def transcribe(self, audio : sr.AudioData) -> str:
+        return sr.Recognizer().recognize_google(audio)
+
+
+class VoskSTTEngine(STTEngine):
+
+    """
+    Local speech recognition on the CPU with Vosk (https://alphacephei.com/vosk/models). The model is loaded once,
+    the first time it's needed, and the engine streams partial transcripts.
+
+    Parameters:
+
+        model_path (str) : path to the unzipped Vosk model
+        sample_rate (int) : the sample rate the audio is converted to
+
+    Public methods:
+
+        create_recognizer(grammar) -> vosk.KaldiRecognizer : creates a recogniser sharing the loaded model
+    """
+
+    name = "vosk"
+
+    def __init__(self, model_path : str = ZeroConfig.VOSK_MODEL_PATH, sample_rate : int = 16000):
+
+        self.model_path = model_path
+        self.sample_rate = sample_rate
+        self._model = None
+        self._lock = threading.Lock()
+
+    def transcribe(self, audio : sr.AudioData) -> str:
+
+        recognizer = self.create_recognizer()
+        recognizer.AcceptWaveform(audio.get_raw_data(convert_rate=self.sample_rate, convert_width=2))
+        return self._text(recognizer.FinalResult())
+
+    def stream(self, chunks : Iterable[bytes], sample_rate : int, sample_width : int) -> Iterator[tuple[str, bool]]:
+
+        recognizer = self.create_recognizer()
+        last_partial = ""
+        for chunk in chunks:
+            chunk = sr.AudioData(chunk, sample_rate, sample_width).get_raw_data(convert_rate=self.sample_rate, convert_width=2)
+            if not recognizer.AcceptWaveform(chunk):
+                partial = json.loads(recognizer.PartialResult()).get("partial", "")
+                if partial and partial != last_partial:
+                    last_partial = partial
+                    yield partial, False
+
+        yield self._text(recognizer.FinalResult()), True
+
+    def create_recognizer(self, grammar : list[str] | None = None):
+
+        """
+        Creates a Vosk recogniser, loading the model the first time.
+
+        Parameters:
+
+        grammar : the only phrases the recogniser may output ("[unk]" standing for anything else); a small grammar
+                  makes decoding much cheaper. None recognises free speech
+
+        Returned value:
+        The vosk.KaldiRecognizer. Raises sr.RequestError if Vosk or the model is missing.
+        """
+
+        with self._lock:
+            if self._model is None:
+                try:
+                    from vosk import Model, SetLogLevel
+                except ImportError:
+                    raise sr.RequestError("Vosk is not installed (pip install vosk).")
+                if not os.path.isdir(self.model_path):
+                    raise sr.RequestError(f"No Vosk model found in '{self.model_path}'.")
+                SetLogLevel(-1)
+                try:
+                    self._model = Model(self.model_path)
+                except Exception as e: # e.g. a folder without the model files
+                    raise sr.RequestError(f"The Vosk model in '{self.model_path}' couldn't be loaded: {e}")
+
+        from vosk import KaldiRecognizer
+        if grammar is None:
+            return KaldiRecognizer(self._model, self.sample_rate)
+        return KaldiRecognizer(self._model, self.sample_rate, json.dumps(grammar))
+
+    @staticmethod
+    def _text(result : str) -> str:
+
+        text = json.loads(result).get("text", "")
+        if not text:
+            raise sr.UnknownValueError()
+        return text
+
+
+STT_ENGINES = {engine.name: engine for engine in [GoogleSTTEngine(), VoskSTTEngine()]}
+
+
+def word_error_rate(reference : str, hypothesis : str) -> tuple[int, int]:
+
+    """
+    Counts the word-level edits (substitutions, insertions and deletions) turning a transcript into its reference.
+
+    Parameters:
+
+    reference : the expected transcript
+    hypothesis : the transcript given by an engine
+
+    Returned value:
+    A tuple (number of edits, number of reference words); their ratio is the word error rate
+    """
+
+    reference = reference.lower().split()
+    hypothesis = hypothesis.lower().split()
+
+    # Levenshtein distance over words, keeping a single row
+    row = list(range(len(hypothesis) + 1))
+    for i, word in enumerate(reference, 1):
+        previous, row[0] = row[0], i
+        for j, other in enumerate(hypothesis, 1):
+            previous, row[j] = row[j], min(row[j] + 1, row[j - 1] + 1, previous + (word != other))
+
+    return row[-1], len(reference)
+
+
+def benchmark_engines(directory : str, engines : Iterable[str] | None = None) -> dict:
+
+    """
+    Runs every WAV fixture of a directory through the engines. Each fixture `name.wav` needs its reference
+    transcript in `name.txt`.
+
+    Parameters:
+
+    directory : the directory of fixtures
+    engines : the names of the engines to be compared; every engine by default
+
+    Returned value:
+    A dictionary with, for each engine, the real-time factor (processing time over audio duration; below 1 is
+    faster than real time), the word error rate, and the number of fixtures it failed to transcribe
+    """
+
+    fixtures = []
+    for filename in sorted(os.listdir(directory)):
+        name, extension = os.path.splitext(filename)
+        if extension.lower() == ".wav" and os.path.exists(os.path.join(directory, name + ".txt")):
+            with open(os.path.join(directory, name + ".txt"), encoding="utf-8") as file:
+                fixtures.append((os.path.join(directory, filename), file.read().strip()))
+
+    results = {}
+    for name in engines or STT_ENGINES:
+        engine = STT_ENGINES[name]
+        processing = duration = 0.0
+        edits = words = failures = 0
+
+        for path, reference in fixtures:
+            with sr.AudioFile(path) as source:
+                audio = sr.Recognizer().record(source)
+            with wave.open(path) as fixture:
+                duration += fixture.getnframes() / fixture.getframerate()
+
+            start = time.perf_counter()
+            try:
+                transcript = engine.transcribe(audio)
+            except sr.UnknownValueError:
+                transcript = ""
+            except sr.RequestError as e:
+                logging.warning(f"{name} failed on {path}: {e}")
+                transcript = ""
+                failures += 1
+            processing += time.perf_counter() - start
+
+            fixture_edits, fixture_words = word_error_rate(reference, transcript)
+            edits += fixture_edits
+            words += fixture_words
+
+        results[name] = {
+            "fixtures": len(fixtures),
+            "real_time_factor": processing / duration if duration else None,
+            "word_error_rate": edits / words if words else None,
+            "failures": failures,
+        }
+
+    return results
+
+
+# compares the engines on a directory of fixtures
+if __name__ == "__main__":
+
+    if len(sys.argv) < 2:
+        print("Usage: python -m utils.stt <fixtures directory> [engine ...]")
+        sys.exit(1)
+
+    for engine_name, result in benchmark_engines(sys.argv[1], sys.argv[2:] or None).items():
+        print(f"{engine_name}: {result}")
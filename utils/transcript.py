@@ -0,0 +1,518 @@
+import tkinter as tk
+from tkinter import ttk
+from config.config import ZeroConfig
+from dataclasses import dataclass
+import random
+import sys
+import time
+
+
+@dataclass
+class Turn:
+
+    """
+    A message of the conversation.
+
+    Parameters:
+
+        speaker (str) : who sent the message ("User" or "Zero")
+        text (str) : the message, which grows while an answer is streamed
+    """
+
+    speaker: str
+    text: str
+
+
+class TurnStore:
+
+    """
+    Keeps every turn of the session, in order. Turns are only appended, or edited while they're the answer being
+    streamed, so a list gives constant-time appends and random access by index.
+
+    Public methods:
+
+        append(speaker, text) -> int : adds a turn and returns its index
+        set_text(index, text) -> None : replaces the text of a turn
+        append_text(index, text) -> None : appends text to a turn
+    """
+
+    def __init__(self):
+        self._turns = []
+
+    def __len__(self) -> int:
+        return len(self._turns)
+
+    def __getitem__(self, index):
+        return self._turns[index]
+
+    def append(self, speaker : str, text : str) -> int:
+
+        """
+        Adds a turn at the end of the transcript.
+
+        Parameters:
+            speaker (str) : who sent the message
+            text (str) : the message
+
+        Returned value:
+            The index of the new turn
+        """
+
+        self._turns.append(Turn(speaker, text))
+        return len(self._turns) - 1
+
+    def set_text(self, index : int, text : str) -> None:
+
+        """
+        Replaces the text of a turn.
+
+        Parameters:
+            index (int) : the index of the turn
+            text (str) : the new text
+
+        Returned value:
+            None
+        """
+
+        self._turns[index].text = text
+
+    def append_text(self, index : int, text : str) -> None:
+
+        """
+        Appends text to a turn, e.g. a streamed token.
+
+        Parameters:
+            index (int) : the index of the turn
+            text (str) : the text to be appended
+
+        Returned value:
+            None
+        """
+
+        self._turns[index].text += text
+
+
+class TranscriptView:
+
+    """
+    Shows a TurnStore in a Tk Text widget, rendering only a window of `window_size` turns whatever the length of
+    the session. While the view follows the conversation, new turns and streamed tokens are inserted at the end of
+    the widget and the oldest rendered turn is dropped once the window is full, so the widget is never rewritten
+    as a whole. The widget scrolls by lines within the rendered turns, as a plain Text does; the window only moves
+    through the store when scrolling reaches its top or bottom edge, keeping the view on the same text. Scrolling
+    back to the end follows the conversation again.
+
+    Parameters:
+
+        text (tk.Text) : the widget showing the turns; it's kept read-only
+        scrollbar (ttk.Scrollbar) : the vertical scrollbar of the transcript
+        store (TurnStore) : the turns to be shown
+        window_size (int) : maximum number of turns rendered at once
+        first (int) : index of the first rendered turn
+        follow (bool) : whether the view sticks to the latest turn
+
+    Public methods:
+
+        add_turn(speaker, text) -> int : adds a turn to the store and shows it if the rendered window reaches the end
+        set_text(index, text) -> None : replaces the text of a turn
+        append_text(index, text) -> None : appends text to a turn
+        yview(*args) -> None : scrolls the transcript; used as the scrollbar command
+        scroll(lines) -> None : scrolls the transcript by a number of lines
+    """
+
+    def __init__(self, text : tk.Text, scrollbar : ttk.Scrollbar, store : TurnStore | None = None,
+                 window_size : int = ZeroConfig.TRANSCRIPT_WINDOW_TURNS):
+
+        self.text = text
+        self.scrollbar = scrollbar
+        self.store = store if store is not None else TurnStore()
+        self.window_size = window_size
+
+        self.first = 0
+        self.follow = True
+        self._rendered = 0 # number of turns in the widget, from `first`
+
+        self.text.tag_configure("speaker", font=(*ZeroConfig.ZERO_FONT[:2], "bold"))
+        self.text.config(yscrollcommand=self._on_text_scroll)
+        self.scrollbar.config(command=self.yview)
+        for sequence in ["<MouseWheel>", "<Button-4>", "<Button-5>"]:
+            self.text.bind(sequence, self._on_wheel)
+
+    def add_turn(self, speaker : str, text : str) -> int:
+
+        """
+        Adds a turn to the store, and shows it if the rendered window reaches the end of the conversation. While the
+        view doesn't follow the conversation, the window grows up to `window_size` turns, so the text being read
+        doesn't move.
+
+        Parameters:
+            speaker (str) : who sent the message
+            text (str) : the message
+
+        Returned value:
+            The index of the new turn
+        """
+
+        index = self.store.append(speaker, text)
+
+        if self.first + self._rendered == index and (self.follow or self._rendered < self.window_size):
+            self._edit(self._insert_turn, index)
+            if self.follow:
+                if self._rendered > self.window_size:
+                    self._edit(self._drop_first_turn)
+                self.text.see(tk.END)
+
+        self._update_scrollbar()
+        return index
+
+    def set_text(self, index : int, text : str) -> None:
+
+        """
+        Replaces the text of a turn. Only that turn is redrawn when it's the last one shown.
+
+        Parameters:
+            index (int) : the index of the turn
+            text (str) : the new text
+
+        Returned value:
+            None
+        """
+
+        self.store.set_text(index, text)
+
+        if index == self.first + self._rendered - 1:
+            self._edit(self.text.delete, f"turn{index}", tk.END)
+            self._edit(self._insert_turn, index, False)
+            if self.follow:
+                self.text.see(tk.END)
+        elif self.first <= index < self.first + self._rendered:
+            self._render(self.first)
+
+    def append_text(self, index : int, text : str) -> None:
+
+        """
+        Appends text to a turn, e.g. a streamed token.
+
+        Parameters:
+            index (int) : the index of the turn
+            text (str) : the text to be appended
+
+        Returned value:
+            None
+        """
+
+        self.store.append_text(index, text)
+
+        if index == self.first + self._rendered - 1:
+            self._edit(self.text.insert, tk.END, text)
+            if self.follow:
+                self.text.see(tk.END)
+        elif self.first <= index < self.first + self._rendered:
+            self._render(self.first)
+
+    def yview(self, *args) -> None:
+
+        """
+        Scrolls the transcript. Takes the arguments of a scrollbar command: ("moveto", fraction), where the fraction
+        is relative to the whole session, or ("scroll", number, "units" | "pages"), which scrolls the widget and
+        moves the window at its edges.
+
+        Parameters:
+            *args : the scrollbar command
+
+        Returned value:
+            None
+        """
+
+        if not args:
+            return
+
+        if args[0] == "moveto":
+            self._move_to(float(args[1]))
+        elif args[0] == "scroll":
+            self._move_at_edge(int(args[1]))
+            self.text.yview_scroll(int(args[1]), args[2])
+            self._update_follow()
+
+    def scroll(self, lines : int) -> None:
+
+        """
+        Scrolls the transcript by a number of lines; negative values scroll up.
+
+        Parameters:
+            lines (int) : the number of lines
+
+        Returned value:
+            None
+        """
+
+        self.yview("scroll", lines, "units")
+
+    # ===================================== private methods ===================================== #
+
+    def _edit(self, function, *args) -> None:
+
+        self.text.config(state=tk.NORMAL)
+        try:
+            function(*args)
+        finally:
+            self.text.config(state=tk.DISABLED)
+
+    def _insert_turn(self, index : int, new : bool = True) -> None:
+
+        # a turn starts on its own line; its mark keeps its position, so it can be replaced or dropped later
+        turn = self.store[index]
+        if new:
+            self.text.mark_set(f"turn{index}", tk.END)
+            self.text.mark_gravity(f"turn{index}", tk.LEFT)
+            self._rendered += 1
+        if index != self.first:
+            self.text.insert(tk.END, "\n")
+        self.text.insert(tk.END, f"{turn.speaker}: ", "speaker")
+        self.text.insert(tk.END, turn.text.lstrip())
+
+    def _drop_first_turn(self) -> None:
+
+        # removes the first turn and the line break which separated it from the next one
+        self.text.delete("1.0", f"turn{self.first + 1} + 1c")
+        self.text.mark_unset(f"turn{self.first}")
+        self.first += 1
+        self._rendered -= 1
+
+    def _top_turn(self) -> int:
+
+        # the turn at the top of the widget; the rendered window is small, so its marks are simply scanned
+        top = self.text.index("@0,0")
+        turn = self.first
+        for index in range(self.first + 1, self.first + self._rendered):
+            if not self.text.compare(f"turn{index}", "<=", top):
+                break
+            turn = index
+        return turn
+
+    def _turn_start(self, index : int) -> str:
+
+        # where the speaker of a turn starts, after the line break separating it from the previous turn
+        return f"turn{index}" if index == self.first else f"turn{index} + 1c"
+
+    def _view_anchor(self) -> tuple[int, int] | None:
+
+        # the turn at the top of the view, and how many characters of it are above the view
+        if self._rendered == 0:
+            return None
+        turn = self._top_turn()
+        return turn, len(self.text.get(self._turn_start(turn), "@0,0"))
+
+    def _move_at_edge(self, direction : int) -> None:
+
+        # called before scrolling: when the view is already at an edge of the window, the window is moved by half
+        # its size, keeping the view on the same text, so the scroll carries on into the next turns
+        top, bottom = (float(fraction) for fraction in self.text.yview())
+        if direction < 0 and top <= 0.0 and self.first > 0:
+            self._render(max(self.first - self.window_size // 2, 0))
+        elif direction > 0 and bottom >= 1.0 and self.first + self._rendered < len(self.store):
+            anchor = self._view_anchor()
+            last_first = max(len(self.store) - self.window_size, 0)
+            self._render(min(self.first + self.window_size // 2, last_first, anchor[0] if anchor else last_first))
+
+    def _update_follow(self) -> None:
+
+        # the view follows the conversation again once the end of the last turn can be seen
+        self.follow = self.first + self._rendered >= len(self.store) and float(self.text.yview()[1]) >= 1.0
+        self._update_scrollbar()
+
+    def _move_to(self, fraction : float) -> None:
+
+        # a position in the whole session, as given by the scrollbar: the window is only moved when the position
+        # isn't rendered, then the widget is scrolled to it
+        total = len(self.store)
+        if fraction >= 1.0 or total == 0:
+            return self._follow()
+
+        position = max(fraction, 0.0) * total
+        if not self.first <= position < self.first + self._rendered:
+            self.follow = False
+            self._render(min(max(int(position) - self.window_size // 2, 0), max(total - self.window_size, 0)))
+        self.text.yview_moveto((position - self.first) / max(self._rendered, 1))
+        self._update_follow()
+
+    def _follow(self) -> None:
+
+        self.follow = True
+        self._render(max(len(self.store) - self.window_size, 0))
+
+    def _render(self, first : int) -> None:
+
+        # only redraws the window, so its cost doesn't depend on the length of the session; unless the view follows
+        # the conversation, it's kept on the same text when that text is still rendered
+        anchor = None if self.follow else self._view_anchor()
+
+        def render():
+            marks = [mark for mark in self.text.mark_names() if mark.startswith("turn")]
+            if marks:
+                self.text.mark_unset(*marks)
+            self.text.delete("1.0", tk.END)
+            self.first = first
+            self._rendered = 0
+            for index in range(first, min(first + self.window_size, len(self.store))):
+                self._insert_turn(index)
+
+        self._edit(render)
+        if self.follow:
+            self.text.see(tk.END)
+        elif anchor is not None and self.first <= anchor[0] < self.first + self._rendered:
+            self.text.yview(f"{self._turn_start(anchor[0])} + {anchor[1]} chars")
+        self._update_scrollbar()
+
+    def _update_scrollbar(self) -> None:
+        self._on_text_scroll(*self.text.yview())
+
+    def _on_text_scroll(self, top, bottom) -> None:
+
+        # the widget reports its view of the rendered turns; the scrollbar shows it within the whole session
+        total = len(self.store)
+        if total == 0 or self._rendered == 0:
+            self.scrollbar.set(0, 1)
+        else:
+            self.scrollbar.set((self.first + float(top) * self._rendered) / total,
+                               (self.first + float(bottom) * self._rendered) / total)
+
+    def _on_wheel(self, event) -> None:
+
+        # runs before the widget's own binding, which then scrolls it
+        self._move_at_edge(-1 if event.num == 4 or event.delta > 0 else 1)
+        self.text.after_idle(self._update_follow)
+
+
+def _benchmark_view(root : tk.Tk, turns : int, virtualised : bool, samples : int = 100) -> dict:
+
+    # fills a transcript with `turns` turns, then times appending a turn and scrolling to a random position
+    text = tk.Text(root, height=10, width=80)
+    scrollbar = ttk.Scrollbar(root, orient=tk.VERTICAL)
+    message = "The quick brown fox jumps over the lazy dog, then asks Zero what time it is. "
+
+    if virtualised:
+        view = TranscriptView(text, scrollbar)
+        for index in range(turns):
+            view.store.append("User" if index % 2 == 0 else "Zero", message)
+        view._follow()
+        append = lambda: view.add_turn("User", message)
+        scroll = lambda: view.yview("moveto", random.random())
+    else:
+        text.insert(tk.END, "".join(f"User: {message}\n" for _ in range(turns)))
+        append = lambda: (text.insert(tk.END, f"User: {message}\n"), text.see(tk.END))
+        scroll = lambda: text.yview("moveto", random.random())
+
+    results = {}
+    for name, action in [("append", append), ("scroll", scroll)]:
+        start = time.perf_counter()
+        for _ in range(samples):
+            action()
+            root.update_idletasks() # includes the layout of the widget in the measure
+        results[f"{name}_ms"] = 1000 * (time.perf_counter() - start) / samples
+
+    text.destroy()
+    scrollbar.destroy()
+    return results
+
+
+def _check_view(root : tk.Tk) -> list[str]:
+
+    # edits and scrolls a small transcript in a real Text widget, checking after each step that the widget holds
+    # exactly the rendered turns and that every turn mark sits where its turn starts
+    text = tk.Text(root, height=5, width=40, wrap=tk.WORD)
+    scrollbar = ttk.Scrollbar(root, orient=tk.VERTICAL)
+    text.pack(side=tk.LEFT)
+    scrollbar.pack(side=tk.LEFT, fill=tk.Y)
+    view = TranscriptView(text, scrollbar, window_size=4)
+    message = "The quick brown fox jumps over the lazy dog, then asks Zero what time it is. " * 2
+    problems = []
+
+    def check(step : str) -> None:
+        root.update()
+        last = view.first + view._rendered
+        expected = "\n".join(f"{turn.speaker}: {turn.text.lstrip()}" for turn in view.store[view.first:last])
+        if text.get("1.0", "end-1c") != expected:
+            problems.append(f"{step}: the widget doesn't hold turns {view.first} to {last - 1}")
+        marks = sorted(mark for mark in text.mark_names() if mark.startswith("turn"))
+        if marks != sorted(f"turn{index}" for index in range(view.first, last)):
+            problems.append(f"{step}: unexpected marks {marks}")
+            return
+        for index in range(view.first, last):
+            start, speaker = view._turn_start(index), f"{view.store[index].speaker}: "
+            if text.get(start, f"{start} + {len(speaker)} chars") != speaker:
+                problems.append(f"{step}: the mark of turn {index} isn't at its start")
+
+    def scroll_until(lines : int, condition, limit : int = 500) -> None:
+        for _ in range(limit):
+            if condition():
+                return
+            view.scroll(lines)
+            root.update()
+        problems.append(f"scrolling by {lines} never reached the expected position")
+
+    for index in range(10):
+        view.add_turn("User" if index % 2 == 0 else "Zero", f"{index} {message}")
+    check("turns dropped from the top")
+    if view.first != 6:
+        problems.append(f"the window starts at turn {view.first} instead of 6")
+
+    view.set_text(9, "9 replaced")
+    check("last turn replaced")
+    view.append_text(9, " and streamed")
+    check("last turn streamed")
+    answer = view.add_turn("Zero", "")
+    for token in ["Streamed", " answer", " " + message]:
+        view.append_text(answer, token)
+    check("answer streamed into an empty turn")
+
+    first = view.first
+    view.scroll(-1)
+    root.update()
+    if view.first != first or view.follow:
+        problems.append("scrolling up by a line moved the window or kept following")
+    view.set_text(view.first + 1, "replaced while scrolled up")
+    check("turn replaced inside the window")
+
+    scroll_until(-1, lambda: view.first == 0 and float(text.yview()[0]) <= 0.0)
+    check("scrolled to the first turn")
+    view.add_turn("User", "added while scrolled up")
+    check("turn added while scrolled up")
+
+    scroll_until(1, lambda: view.follow)
+    check("scrolled back to the end")
+    if view.first + view._rendered != len(view.store):
+        problems.append("following the conversation without its last turn rendered")
+
+    view.yview("moveto", 0.0)
+    check("moved to the start")
+    view.yview("moveto", 1.0)
+    check("moved to the end")
+
+    text.destroy()
+    scrollbar.destroy()
+    return problems
+
+
+# measures the append and scroll latency of the virtualised transcript against a plain Text widget holding
+# every turn, from 10 to 100,000 turns; --check checks the bookkeeping of the turn marks instead
+if __name__ == "__main__":
+
+    root = tk.Tk()
+
+    if "--check" in sys.argv:
+        problems = _check_view(root)
+        print("\n".join(problems) if problems else "The transcript view is consistent.")
+        root.destroy()
+        sys.exit(1 if problems else 0)
+
+    root.withdraw()
+
+    print(f"{'turns':>8} | {'virtualised append':>18} {'scroll':>8} | {'plain Text append':>17} {'scroll':>8}")
+    for turns in [10, 100, 1000, 10000, 100000]:
+        virtualised = _benchmark_view(root, turns, True)
+        plain = _benchmark_view(root, turns, False)
+        print(f"{turns:>8} | {virtualised['append_ms']:>15.3f} ms {virtualised['scroll_ms']:>5.3f} ms | "
+              f"{plain['append_ms']:>14.3f} ms {plain['scroll_ms']:>5.3f} ms")
+
+    root.destroy()
@@ -0,0 +1,236 @@
+from __future__ import annotations
+from config.config import ZeroConfig
+from utils.stt import STT_ENGINES, VoskSTTEngine
+from utils.lazy import LazyModule
+from collections import deque
+import audioop
+import json
+import os
+import sys
+import time
+import wave
+
+sr = LazyModule("speech_recognition")
+
+
+class WakeWordDetector:
+
+    """
+    Spots the wake word ("Zero") in a continuous audio stream. Audio is decoded by a Vosk recogniser restricted to
+    a two-phrase grammar (the wake word or anything else), which is far cheaper than free speech recognition.
+
+    In CPU budget mode, chunks quieter than the microphone's energy threshold aren't decoded at all, so silence
+    only costs an RMS computation per chunk. A few chunks before the sound starts are kept, so the beginning of
+    the word isn't lost, and decoding goes on for a short while after it stops.
+
+    Parameters:
+
+        wake_word (str) : the word to be spotted
+        engine (utils.stt.VoskSTTEngine) : the engine providing the Vosk model
+        budget_mode (bool) : whether quiet chunks are skipped
+        hangover (float) : seconds of quiet audio still decoded after a sound, in budget mode
+        detections (int) : number of times the wake word was heard
+        audio_seconds (float) : seconds of audio processed
+        decoded_seconds (float) : seconds of audio decoded by the recogniser
+        cpu_seconds (float) : CPU time spent processing the audio
+
+    Public methods:
+
+        process(chunk, sample_rate, sample_width, energy_threshold) -> bool : processes a chunk, telling whether
+                                                                             the wake word was heard
+        reset() -> None : forgets the audio processed so far
+        stats() -> dict : returns the detector counters and its CPU usage
+    """
+
+    def __init__(self, wake_word : str = ZeroConfig.WAKE_WORD, engine : VoskSTTEngine = STT_ENGINES["vosk"],
+                 budget_mode : bool = ZeroConfig.WAKE_WORD_CPU_BUDGET, hangover : float = 0.5):
+
+        self.wake_word = wake_word.lower()
+        self.engine = engine
+        self.budget_mode = budget_mode
+        self.hangover = hangover
+
+        self.detections = 0
+        self.audio_seconds = 0.0
+        self.decoded_seconds = 0.0
+        self.cpu_seconds = 0.0
+
+        self._recognizer = None
+        self._pre_roll = deque(maxlen=3)
+        self._quiet_seconds = float("inf")
+
+    def process(self, chunk : bytes, sample_rate : int, sample_width : int, energy_threshold : float = 0) -> bool:
+
+        """
+        Processes a chunk of audio.
+
+        Parameters:
+
+        chunk : raw mono PCM audio
+        sample_rate : the sample rate of the audio
+        sample_width : the number of bytes per sample
+        energy_threshold : the energy below which a chunk is considered quiet, in budget mode
+
+        Returned value:
+        True if the wake word was heard. Raises sr.RequestError if Vosk or its model is missing.
+        """
+
+        start = time.thread_time()
+        duration = len(chunk) / (sample_rate * sample_width)
+        self.audio_seconds += duration
+
+        try:
+            if self.budget_mode:
+                if audioop.rms(chunk, sample_width) < energy_threshold:
+                    self._quiet_seconds += duration
+                    if self._quiet_seconds > self.hangover:
+                        self._pre_roll.append(chunk)
+                        if self._recognizer is not None and self._quiet_seconds - duration <= self.hangover:
+                            self._recognizer.Reset() # the sound is over; nothing to decode until the next one
+                        return False
+                else:
+                    self._quiet_seconds = 0.0
+
+            chunks = [*self._pre_roll, chunk]
+            self._pre_roll.clear()
+            return any(self._decode(piece, sample_rate, sample_width) for piece in chunks)
+        finally:
+            self.cpu_seconds += time.thread_time() - start
+
+    def reset(self) -> None:
+
+        """
+        Forgets the audio processed so far, e.g. after the command following the wake word was captured.
+
+        Parameters:
+            None
+
+        Returned value:
+            None
+        """
+
+        self._pre_roll.clear()
+        self._quiet_seconds = float("inf")
+        if self._recognizer is not None:
+            self._recognizer.Reset()
+
+    def stats(self) -> dict:
+
+        """
+        Returns the detector counters.
+
+        Parameters:
+            None
+
+        Returned value:
+            A dictionary with the number of detections, the share of the audio which was decoded, and the CPU
+            usage (CPU time over audio time, as a percentage of one core)
+        """
+
+        return {
+            "detections": self.detections,
+            "audio_seconds": self.audio_seconds,
+            "decoded_ratio": self.decoded_seconds / self.audio_seconds if self.audio_seconds else 0.0,
+            "cpu_percent": 100 * self.cpu_seconds / self.audio_seconds if self.audio_seconds else 0.0,
+        }
+
+    # ===================================== private methods ===================================== #
+
+    def _decode(self, chunk : bytes, sample_rate : int, sample_width : int) -> bool:
+
+        if self._recognizer is None:
+            self._recognizer = self.engine.create_recognizer([self.wake_word, "[unk]"])
+
+        self.decoded_seconds += len(chunk) / (sample_rate * sample_width)
+        if sample_rate != self.engine.sample_rate or sample_width != 2:
+            chunk = sr.AudioData(chunk, sample_rate, sample_width).get_raw_data(convert_rate=self.engine.sample_rate,
+                                                                                 convert_width=2)
+
+        if self._recognizer.AcceptWaveform(chunk):
+            heard = json.loads(self._recognizer.Result()).get("text", "")
+        else:
+            heard = json.loads(self._recognizer.PartialResult()).get("partial", "")
+
+        if self.wake_word in heard.split():
+            self.detections += 1
+            self._recognizer.Reset()
+            return True
+        return False
+
+
+def benchmark(directory : str, budget_mode : bool = ZeroConfig.WAKE_WORD_CPU_BUDGET, chunk_size : int = 1024) -> dict:
+
+    """
+    Runs the detector over a directory of recorded fixtures. Each fixture `name.wav` needs a `name.txt` file with
+    the time (in seconds) at which the wake word ends, or "none" if the fixture doesn't contain it. The first
+    second of each fixture is used to calibrate the energy threshold, as the microphone listener does.
+
+    Parameters:
+
+    directory : the directory of fixtures
+    budget_mode : whether the detector skips quiet chunks
+    chunk_size : the number of frames per chunk, as read from the microphone
+
+    Returned value:
+    A dictionary with the number of detections, misses and false alarms, the mean detection latency in
+    milliseconds (from the end of the word), and the CPU usage on the fixtures without the wake word (idle)
+    """
+
+    detections = misses = false_alarms = 0
+    latencies = []
+    idle_cpu = idle_audio = 0.0
+
+    for filename in sorted(os.listdir(directory)):
+        name, extension = os.path.splitext(filename)
+        annotation = os.path.join(directory, name + ".txt")
+        if extension.lower() != ".wav" or not os.path.exists(annotation):
+            continue
+
+        with open(annotation, encoding="utf-8") as file:
+            text = file.read().strip().lower()
+        word_end = None if text == "none" else float(text)
+
+        recognizer = sr.Recognizer()
+        with sr.AudioFile(os.path.join(directory, filename)) as source:
+            recognizer.adjust_for_ambient_noise(source, duration=1)
+        detector = WakeWordDetector(budget_mode=budget_mode)
+
+        detected_at = None
+        with wave.open(os.path.join(directory, filename)) as fixture:
+            rate, width = fixture.getframerate(), fixture.getsampwidth()
+            position = 0.0
+            while chunk := fixture.readframes(chunk_size):
+                if fixture.getnchannels() > 1:
+                    chunk = audioop.tomono(chunk, width, 0.5, 0.5)
+                position += chunk_size / rate
+                if detector.process(chunk, rate, width, recognizer.energy_threshold) and detected_at is None:
+                    detected_at = position
+
+        if word_end is None:
+            false_alarms += detected_at is not None
+            idle_cpu += detector.cpu_seconds
+            idle_audio += detector.audio_seconds
+        elif detected_at is None:
+            misses += 1
+        else:
+            detections += 1
+            latencies.append(detected_at - word_end)
+
+    return {
+        "detections": detections,
+        "misses": misses,
+        "false_alarms": false_alarms,
+        "mean_latency_ms": 1000 * sum(latencies) / len(latencies) if latencies else None,
+        "idle_cpu_percent": 100 * idle_cpu / idle_audio if idle_audio else None,
+    }
+
+
+# measures the detector on recorded fixtures, with and without the CPU budget mode
+if __name__ == "__main__":
+
+    if len(sys.argv) < 2:
+        print("Usage: python -m utils.wakeword <fixtures directory>")
+        sys.exit(1)
+
+    for budget_mode in [False, True]:
+        print(f"budget_mode={budget_mode}: {benchmark(sys.argv[1], budget_mode)}")